@@ -12,6 +12,9 @@ from service_framework import (
 )
 from service_framework.diagnostics import Logger
 
+from .lib.worker.ring_metrics import RingBufferMetrics
+from .lib.worker.worker_metrics import WorkerMetrics
+
 
 def get_monorepo_root_dir(*paths: str) -> str:
     current_file = Path(__file__)
@@ -45,6 +48,18 @@ class PredictorEnv(DefaultEnv):
         # default="btc_usdt,eth_usdt,sol_usdt,trump_usdt,xrp_usdt",
         description="Comma-separated list of symbols",
     )
+    STORAGE_BASE_DIR_RAW: str = Field(
+        default=get_monorepo_root_dir("storage", "internal-bridge"),
+        description="Base directory of the raw trade and order book logs of every platform",
+    )
+    STORAGE_BASE_DIR_WINDOWS: str = Field(
+        default=get_monorepo_root_dir("storage", "py-predictor"),
+        description="Base directory for the windows DB and the window worker state files",
+    )
+    WINDOW_SIZES_MS: str = Field(
+        default="30000",
+        description="Comma-separated list of window sizes in milliseconds",
+    )
 
     @property
     def binance_symbols_list(self) -> list[str]:
@@ -54,10 +69,21 @@ class PredictorEnv(DefaultEnv):
     def kraken_symbols_list(self) -> list[str]:
         return [symbol.strip() for symbol in self.KRAKEN_SYMBOLS.split(",")]
 
+    @property
+    def platform_symbols_list(self) -> list[tuple[str, str]]:
+        return [("binance", symbol) for symbol in self.binance_symbols_list if symbol] + [
+            ("kraken", symbol) for symbol in self.kraken_symbols_list if symbol
+        ]
+
+    @property
+    def window_sizes_ms_list(self) -> list[int]:
+        return [int(size) for size in self.WINDOW_SIZES_MS.split(",")]
+
 
 @dataclass
 class PredictorMetrics:
-    pass
+    ring_buffer: RingBufferMetrics
+    worker: WorkerMetrics
 
 
 @dataclass
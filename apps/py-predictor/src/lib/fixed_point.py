@@ -0,0 +1,87 @@
+"""
+Bulk parsing of the decimal strings exchanges send for prices and quantities.
+
+Values are parsed to float64 (one NumPy call for a batch) or to int64 ticks - the value
+scaled by 10**decimals of its symbol. Ticks are exact while the scaled value stays below
+2**53, integer arithmetic on them (order book totals) then has no rounding drift.
+
+Small batches take a plain Python loop, NumPy's per-call overhead only pays off from
+VECTORIZE_MIN_VALUES values. Order book updates mostly repeat the few hundred prices near
+the touch, the loop looks their ticks up in a cache instead of parsing them again.
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+VECTORIZE_MIN_VALUES = 64
+PRICE_CACHE_SIZE = 2**16
+"""Price strings remembered per price precision before the cache starts over"""
+
+
+@dataclass(frozen=True)
+class Scale:
+    price_decimals: int = 10
+    quantity_decimals: int = 8
+
+    @property
+    def price_scale(self) -> int:
+        return 10**self.price_decimals
+
+    @property
+    def quantity_scale(self) -> int:
+        return 10**self.quantity_decimals
+
+
+DEFAULT_SCALE = Scale()
+"""BTC at 10 price decimals is ~1e15 ticks, still exact"""
+
+_price_ticks: dict[int, dict[str, int]] = {}
+"""price decimals -> price string -> ticks"""
+
+
+def parse_floats(values: Sequence[str]) -> np.ndarray:
+    """float64 array of decimal strings"""
+    if len(values) < VECTORIZE_MIN_VALUES:
+        return np.fromiter(map(float, values), dtype=np.float64, count=len(values))
+    return np.array(values, dtype=np.float64)
+
+
+def to_ticks(values: np.ndarray, decimals: int) -> np.ndarray:
+    """int64 ticks of float values"""
+    return np.rint(values * float(10**decimals)).astype(np.int64)
+
+
+def parse_ticks(values: Sequence[str], decimals: int) -> np.ndarray:
+    return to_ticks(parse_floats(values), decimals)
+
+
+def parse_levels(levels: Sequence[tuple[str, str]], scale: Scale) -> tuple[list[int], list[int]]:
+    """
+    (price ticks, quantity ticks) of (price, quantity) string pairs. A quantity that is not
+    zero stays at least one tick, a zero quantity removes its order book level.
+    """
+    if len(levels) < VECTORIZE_MIN_VALUES:
+        price_scale, quantity_scale = scale.price_scale, scale.quantity_scale
+        cache = _price_ticks.setdefault(scale.price_decimals, {})
+        if len(cache) >= PRICE_CACHE_SIZE:
+            cache.clear()
+
+        price_ticks: list[int] = []
+        for price, _ in levels:
+            ticks = cache.get(price)
+            if ticks is None:
+                ticks = cache[price] = round(float(price) * price_scale)
+            price_ticks.append(ticks)
+        quantity_ticks: list[int] = []
+        for _, quantity in levels:
+            value = float(quantity)
+            ticks = round(value * quantity_scale)
+            quantity_ticks.append(ticks if ticks or value == 0 else 1)
+        return (price_ticks, quantity_ticks)
+
+    parsed = np.array(levels, dtype=np.float64).reshape(-1, 2)
+    quantities = to_ticks(parsed[:, 1], scale.quantity_decimals)
+    quantities[(quantities == 0) & (parsed[:, 1] != 0)] = 1
+    return (to_ticks(parsed[:, 0], scale.price_decimals).tolist(), quantities.tolist())
@@ -0,0 +1,27 @@
+"""
+Small state files kept as JSON across runs (ring usage, series costs). A missing or
+unreadable file loads as empty, saving replaces the file atomically.
+"""
+
+import os
+
+import msgspec
+
+
+def load_json_state[T](path: str, decoder: msgspec.json.Decoder[T], empty: T) -> T:
+    if not os.path.exists(path):
+        return empty
+    try:
+        with open(path, "rb") as f:
+            return decoder.decode(f.read())
+    except (OSError, msgspec.DecodeError) as error:
+        print(f"[MAIN] Ignoring state file {path}: {error}")
+        return empty
+
+
+def save_json_state(path: str, state: object) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(msgspec.json.encode(state))
+    os.replace(tmp_path, path)
@@ -0,0 +1,202 @@
+"""
+Mergeable quantile sketch with relative accuracy (DDSketch style) serialized to bytes.
+
+A positive value v is counted in bucket ceil(log(v) / log(GAMMA)), so every value of a
+bucket is within RELATIVE_ACCURACY of the bucket's representative value. Merging adds the
+counts of equal buckets - merging the sketches of windows gives exactly the sketch of the
+trades of all of them. Values <= 0 are only counted. Past MAX_BUCKETS the lowest buckets
+are collapsed into one, which only costs accuracy at the low quantiles.
+
+Layout: HEADER (version, zero_count, bucket_count), int32 bucket indexes (ascending),
+uint32 counts.
+
+Sketches of a few values (1s windows) are built and merged in plain Python, NumPy's
+per-call overhead only pays off from VECTORIZE_MIN_SIZE values or buckets.
+"""
+
+import math
+import struct
+from collections.abc import Iterable
+
+import numpy as np
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+VERSION = 1
+"""Bumped with RELATIVE_ACCURACY, sketches of different versions do not merge"""
+
+MAX_BUCKETS = 512
+"""Covers ~4 decades at RELATIVE_ACCURACY, enough for trade sizes in a window"""
+HEADER = struct.Struct("<BIH")
+MAX_SERIALIZED_SIZE = HEADER.size + MAX_BUCKETS * 8
+
+VECTORIZE_MIN_SIZE = 64
+
+
+def bucket_indexes(values: np.ndarray) -> np.ndarray:
+    """Bucket of every (positive) value"""
+    return np.ceil(np.log(values) / LOG_GAMMA).astype(np.int32)
+
+
+def bucket_value(index: int) -> float:
+    """Representative value of a bucket, within RELATIVE_ACCURACY of all its values"""
+    return 2.0 * GAMMA**index / (GAMMA + 1.0)
+
+
+def serialize(zero_count: int, indexes: np.ndarray, counts: np.ndarray) -> bytes:
+    """indexes must be ascending and unique"""
+    excess = len(indexes) - MAX_BUCKETS
+    if excess > 0:
+        collapsed = int(counts[: excess + 1].sum())
+        indexes = indexes[excess:]
+        counts = counts[excess:].copy()
+        counts[0] = collapsed
+
+    return (
+        HEADER.pack(VERSION, zero_count, len(indexes))
+        + indexes.astype("<i4").tobytes()
+        + counts.astype("<u4").tobytes()
+    )
+
+
+def _serialize_buckets(zero_count: int, buckets: dict[int, int]) -> bytes:
+    if len(buckets) > MAX_BUCKETS:
+        indexes = np.fromiter(sorted(buckets), dtype=np.int32, count=len(buckets))
+        counts = np.fromiter((buckets[i] for i in indexes.tolist()), dtype=np.uint64)
+        return serialize(zero_count, indexes, counts)
+
+    indexes = sorted(buckets)
+    k = len(indexes)
+    return HEADER.pack(VERSION, zero_count, k) + struct.pack(
+        f"<{k}i{k}I", *indexes, *[buckets[i] for i in indexes]
+    )
+
+
+def _deserialize_buckets(sketch: bytes) -> tuple[int, dict[int, int]]:
+    version, zero_count, k = HEADER.unpack_from(sketch)
+    if version != VERSION:
+        raise ValueError(f"quantile sketch version {version}, expected {VERSION}")
+    fields = struct.unpack_from(f"<{k}i{k}I", sketch, HEADER.size)
+    return (zero_count, dict(zip(fields[:k], fields[k:], strict=True)))
+
+
+def deserialize(sketch: bytes) -> tuple[int, np.ndarray, np.ndarray]:
+    """returns (zero_count, indexes, counts)"""
+    version, zero_count, bucket_count = HEADER.unpack_from(sketch)
+    if version != VERSION:
+        raise ValueError(f"quantile sketch version {version}, expected {VERSION}")
+
+    offset = HEADER.size
+    indexes = np.frombuffer(sketch, dtype="<i4", count=bucket_count, offset=offset)
+    offset += 4 * bucket_count
+    counts = np.frombuffer(sketch, dtype="<u4", count=bucket_count, offset=offset)
+    return (zero_count, indexes, counts)
+
+
+def from_values(values: np.ndarray) -> bytes | None:
+    """None for no values"""
+    if len(values) == 0:
+        return None
+
+    if len(values) < VECTORIZE_MIN_SIZE:
+        zero_count = 0
+        buckets: dict[int, int] = {}
+        for value in values.tolist():
+            if value > 0.0:
+                index = math.ceil(math.log(value) / LOG_GAMMA)
+                buckets[index] = buckets.get(index, 0) + 1
+            else:
+                zero_count += 1
+        return _serialize_buckets(zero_count, buckets)
+
+    positive = values > 0.0
+    indexes, counts = np.unique(bucket_indexes(values[positive]), return_counts=True)
+    return serialize(len(values) - int(np.count_nonzero(positive)), indexes, counts)
+
+
+def from_segments(values: np.ndarray, starts: np.ndarray) -> list[bytes]:
+    """
+    One sketch per segment [starts[k], starts[k + 1]) of values (segments are non-empty,
+    the last one ends with values), bucketed in one pass over all of them.
+    """
+    n = len(values)
+    ends = np.append(starts[1:], n)
+    positive = values > 0.0
+    zero_counts = (ends - starts) - np.add.reduceat(positive.astype(np.int64), starts)
+
+    # Sort (segment, bucket) pairs packed into one int64, the bucket offset keeps it >= 0
+    segments = np.repeat(np.arange(len(starts), dtype=np.int64), ends - starts)[positive]
+    buckets = bucket_indexes(values[positive]).astype(np.int64) + 2**31
+    pairs, counts = np.unique((segments << 32) | buckets, return_counts=True)
+
+    pair_segments = pairs >> 32
+    pair_buckets = (pairs & 0xFFFFFFFF) - 2**31
+    bounds = np.searchsorted(pair_segments, np.arange(len(starts) + 1), side="left")
+
+    return [
+        serialize(zero_count, pair_buckets[lo:hi], counts[lo:hi])
+        for zero_count, lo, hi in zip(
+            zero_counts.tolist(), bounds[:-1].tolist(), bounds[1:].tolist(), strict=True
+        )
+    ]
+
+
+def merge(a: bytes | None, b: bytes | None) -> bytes | None:
+    """Sketch of the values of both, either may be None (no values)"""
+    return merge_many((a, b))
+
+
+def merge_many(sketches: Iterable[bytes | None]) -> bytes | None:
+    """Sketch of the values of all, cheaper than merging them one by one"""
+    present = [sketch for sketch in sketches if sketch is not None]
+    if len(present) <= 1:
+        return present[0] if present else None
+
+    if sum(map(len, present)) < HEADER.size * len(present) + VECTORIZE_MIN_SIZE * 8:
+        zero_count = 0
+        merged: dict[int, int] = {}
+        for sketch in present:
+            sketch_zero_count, buckets = _deserialize_buckets(sketch)
+            zero_count += sketch_zero_count
+            for index, bucket_count in buckets.items():
+                merged[index] = merged.get(index, 0) + bucket_count
+        return _serialize_buckets(zero_count, merged)
+
+    parts = [deserialize(sketch) for sketch in present]
+    indexes, inverse = np.unique(
+        np.concatenate([indexes for _, indexes, _ in parts]), return_inverse=True
+    )
+    counts = np.bincount(
+        inverse, weights=np.concatenate([counts for _, _, counts in parts]), minlength=len(indexes)
+    )
+    return serialize(sum(zero for zero, _, _ in parts), indexes, counts.astype(np.uint64))
+
+
+def count(sketch: bytes | None) -> int:
+    if sketch is None:
+        return 0
+    zero_count, _indexes, counts = deserialize(sketch)
+    return zero_count + int(counts.sum())
+
+
+def quantile(sketch: bytes | None, q: float) -> float | None:
+    """
+    Value at quantile q (0..1) within RELATIVE_ACCURACY, values <= 0 are reported as 0.0.
+    None for an empty sketch.
+    """
+    if sketch is None:
+        return None
+    zero_count, indexes, counts = deserialize(sketch)
+    total = zero_count + int(counts.sum())
+    if total == 0:
+        return None
+
+    rank = q * (total - 1)
+    if rank < zero_count:
+        return 0.0
+
+    cumulative = np.cumsum(counts, dtype=np.int64)
+    bucket = int(np.searchsorted(cumulative, rank - zero_count, side="right"))
+    return bucket_value(int(indexes[min(bucket, len(indexes) - 1)]))
@@ -29,6 +29,10 @@ class RocksdbLog:
     def _secondary_dir(self) -> str:
         return join(self._base_dir, self._sub_index + "_secondary")
 
+    def sidecar_path(self, name: str) -> str:
+        """File kept next to the log by readers, e.g. its time index"""
+        return join(self._base_dir, f"{self._sub_index}_{name}")
+
     def _get_or_create_log(self) -> RocksDb:
         if self._log is not None:
             return self._log
@@ -65,9 +69,13 @@ class RocksdbLog:
     def try_catch_up_with_primary(self) -> None:
         return self._get_or_create_log().try_catch_up_with_primary()
 
-    def put(self, key: bytes, value: bytes) -> None:
+    def put(self, key: bytes | memoryview, value: bytes | memoryview) -> None:
         return self._get_or_create_log().put(key, value)
 
+    def put_batch(self, items: list[tuple[bytes | memoryview, bytes | memoryview]]) -> None:
+        """Write all pairs atomically as one RocksDB write batch"""
+        return self._get_or_create_log().put_batch(items)
+
     def iterate_from(
         self, start_key: bytes | None = None, batch_size: int | None = None
     ) -> SegmentedLogIterator:
@@ -0,0 +1,36 @@
+import numpy as np
+
+from . import fixed_point
+from .fixed_point import Scale
+
+
+def test_parse_levels_small_and_vectorized_batches_agree(monkeypatch):
+    monkeypatch.setattr(fixed_point, "PRICE_CACHE_SIZE", 50)
+    scale = Scale(price_decimals=1, quantity_decimals=8)
+    levels = [(f"{65000 + i / 10:.1f}", f"{i / 3:.8f}") for i in range(200)]
+
+    small = [fixed_point.parse_levels(levels[i : i + 10], scale) for i in range(0, 200, 10)]
+    cached = [fixed_point.parse_levels(levels[i : i + 10], scale) for i in range(150, 200, 10)]
+    prices, quantities = fixed_point.parse_levels(levels, scale)
+
+    assert [p for batch, _ in small for p in batch] == prices
+    assert [p for batch, _ in cached for p in batch] == prices[150:]
+    assert [q for _, batch in small for q in batch] == quantities
+    assert prices[:2] == [650000, 650001]
+    assert quantities[3] == 100_000_000
+
+
+def test_parse_levels_keeps_quantities_below_a_tick():
+    scale = Scale(price_decimals=1, quantity_decimals=8)
+    levels = [("100.0", "0.000000001"), ("100.1", "0"), ("100.2", "0.00000000")]
+
+    assert fixed_point.parse_levels(levels, scale)[1] == [1, 0, 0]
+    assert fixed_point.parse_levels(levels * 30, scale)[1] == [1, 0, 0] * 30
+
+
+def test_parse_floats():
+    values = [f"{i * 0.25}" for i in range(100)]
+
+    assert np.array_equal(fixed_point.parse_floats(values), np.arange(100) * 0.25)
+    assert np.array_equal(fixed_point.parse_floats(values[:3]), [0.0, 0.25, 0.5])
+    assert fixed_point.parse_ticks(["0.1", "12.34567"], 4).tolist() == [1000, 123457]
@@ -0,0 +1,37 @@
+import numpy as np
+
+from . import quantile_sketch
+
+
+def test_quantile_within_relative_accuracy():
+    rng = np.random.default_rng(3)
+    values = rng.lognormal(mean=0.0, sigma=1.0, size=20_000)
+
+    sketch = quantile_sketch.from_values(values)
+
+    assert sketch is not None
+    assert len(sketch) <= quantile_sketch.MAX_SERIALIZED_SIZE
+    assert quantile_sketch.count(sketch) == len(values)
+    for q in (0.01, 0.25, 0.5, 0.9, 0.99):
+        expected = np.quantile(values, q, method="lower")
+        actual = quantile_sketch.quantile(sketch, q)
+        assert abs(actual - expected) <= 2 * quantile_sketch.RELATIVE_ACCURACY * expected, q
+
+
+def test_merge_and_segments_match_sketch_of_all_values():
+    rng = np.random.default_rng(5)
+    values = np.concatenate([rng.uniform(99.0, 101.0, 500), [0.0, -1.0], rng.uniform(1, 3, 40)])
+    starts = np.array([0, 100, 499, 501])
+
+    segments = quantile_sketch.from_segments(values, starts)
+    ends = [*starts[1:], len(values)]
+    assert segments == [
+        quantile_sketch.from_values(values[start:end]) for start, end in zip(starts, ends)
+    ]
+
+    merged = None
+    for sketch in segments:
+        merged = quantile_sketch.merge(merged, sketch)
+    assert merged == quantile_sketch.from_values(values)
+    assert quantile_sketch.quantile(merged, 0.0) == 0.0
+    assert quantile_sketch.from_values(values[:0]) is None
@@ -0,0 +1,74 @@
+import msgspec
+
+from . import time_index
+
+
+class MemoryLogIterator:
+    def __init__(self, log: "MemoryLog", items: list[tuple[bytes, bytes]], batch_size: int):
+        self.log = log
+        self.items = items
+        self.batch_size = batch_size
+
+    def has_next(self) -> bool:
+        return len(self.items) > 0
+
+    def next_batch(self) -> list[tuple[bytes, bytes]]:
+        batch, self.items = self.items[: self.batch_size], self.items[self.batch_size :]
+        self.log.scanned += len(batch)
+        return batch
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryLog:
+    """The part of RocksdbLog the time index reads"""
+
+    def __init__(self):
+        self.items: list[tuple[bytes, bytes]] = []
+        self.scanned = 0
+
+    def append(self, record_id: int, time_ms: int) -> None:
+        value = msgspec.json.encode({"time": time_ms, "price": "1.0"})
+        self.items.append((time_index.id_to_key(record_id), value))
+
+    def iterate_from(self, start_key: bytes | None, batch_size: int) -> MemoryLogIterator:
+        items = [item for item in self.items if start_key is None or item[0] >= start_key]
+        return MemoryLogIterator(self, items, batch_size)
+
+
+def brute_force_first_key_after(log: MemoryLog, time_ms: int) -> bytes | None:
+    for key, value in log.items:
+        if msgspec.json.decode(value)["time"] > time_ms:
+            return key
+    return None
+
+
+def test_find_first_key_after(tmp_path, monkeypatch):
+    monkeypatch.setattr(time_index, "INDEX_EVERY_RECORDS", 100)
+    monkeypatch.setattr(time_index, "SCAN_BATCH_SIZE", 10)
+    log = MemoryLog()
+    for i in range(5000):
+        # Mostly ascending with some records a little out of order
+        log.append(1000 + i, 1_000_000 + i * 50 - (120 if i % 17 == 0 else 0))
+
+    index = time_index.load(str(tmp_path / "btc_usdt_time_index"))
+    assert time_index.update(index, log) >= 50
+    assert time_index.update(index, log) == 0
+
+    for time_ms in [0, 1_000_000, 1_003_333, 1_100_010, 1_249_900]:
+        log.scanned = 0
+        key = time_index.find_first_key_after(log, time_ms, index)
+        assert key == brute_force_first_key_after(log, time_ms), time_ms
+        assert log.scanned <= 110  # Within an entry's records
+
+    after_all = time_index.find_first_key_after(log, 2_000_000, index)
+    assert after_all == time_index.id_to_key(6000)
+
+    # Appends are indexed from the last entry, the file round trips
+    for i in range(5000, 5500):
+        log.append(1000 + i, 1_000_000 + i * 50)
+    assert time_index.update(index, log) > 0
+    reloaded = time_index.load(index.path)
+    assert (reloaded.entries == index.entries).all()
+    assert time_index.find_first_key_after(log, 1_260_000, reloaded) == time_index.id_to_key(6201)
@@ -0,0 +1,151 @@
+"""
+Sparse time -> key index of a raw log (JSON records with a `time` field under 8 byte
+big-endian id keys), kept as a sidecar file next to the log's secondary.
+
+Entry (time, id) means every record before id has a time <= `time` (a running max, so
+records slightly out of order are still found). Entries are added every INDEX_EVERY_RECORDS
+records or INDEX_INTERVAL_MS of event time. A seek is a binary search over the entries and
+a forward scan of at most INDEX_EVERY_RECORDS records that only decodes `time`.
+
+Indexing an existing log scans it once, later updates only scan what was appended since
+the last entry. The file is rewritten atomically on update, workers serving the same log may
+race but only ever replace it with a complete index.
+"""
+
+import os
+from dataclasses import dataclass
+
+import msgspec
+import numpy as np
+
+from .rocks_db_log import RocksdbLog
+
+INDEX_EVERY_RECORDS = 4096
+INDEX_INTERVAL_MS = 60_000
+SCAN_BATCH_SIZE = 1024
+
+ENTRY_DTYPE = np.dtype([("time", "<i8"), ("id", "<i8")])
+TIME_NONE = np.iinfo(np.int64).min
+"""time of the first entry, no records before it"""
+
+
+class TimeRecord(msgspec.Struct):
+    time: int
+
+
+time_record_decoder = msgspec.json.Decoder(type=TimeRecord)
+
+
+@dataclass
+class TimeIndex:
+    path: str
+    entries: np.ndarray
+    """ENTRY_DTYPE, ascending id and time"""
+
+
+def id_to_key(record_id: int) -> bytes:
+    return record_id.to_bytes(8, byteorder="big", signed=True)
+
+
+def key_to_id(key: bytes) -> int:
+    return int.from_bytes(key, byteorder="big", signed=True)
+
+
+def get_index_path(storage: RocksdbLog) -> str:
+    return storage.sidecar_path("time_index")
+
+
+def load(path: str) -> TimeIndex:
+    if not os.path.exists(path):
+        return TimeIndex(path, np.empty(0, dtype=ENTRY_DTYPE))
+    with open(path, "rb") as f:
+        data = f.read()
+    usable = len(data) - len(data) % ENTRY_DTYPE.itemsize
+    return TimeIndex(path, np.frombuffer(data[:usable], dtype=ENTRY_DTYPE).copy())
+
+
+def save(index: TimeIndex) -> None:
+    os.makedirs(os.path.dirname(index.path) or ".", exist_ok=True)
+    tmp_path = f"{index.path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(index.entries.tobytes())
+    os.replace(tmp_path, index.path)
+
+
+def update(index: TimeIndex, storage: RocksdbLog) -> int:
+    """
+    Index the records appended since the last entry, returns the number of new entries
+    """
+    entries: list[tuple[int, int]] = []
+    if len(index.entries) > 0:
+        last_time, last_id = index.entries[-1].tolist()
+        start_key: bytes | None = id_to_key(last_id)
+        max_time = last_time
+    else:
+        last_time = last_id = None
+        start_key = None
+        max_time = TIME_NONE
+
+    since_entry = 0
+    iterator = storage.iterate_from(start_key, SCAN_BATCH_SIZE)
+    try:
+        while iterator.has_next():
+            for key, value in iterator.next_batch():
+                record_id = key_to_id(key)
+                if record_id != last_id and (
+                    last_id is None
+                    or since_entry >= INDEX_EVERY_RECORDS
+                    or (last_time != TIME_NONE and max_time - last_time >= INDEX_INTERVAL_MS)
+                ):
+                    entries.append((max_time, record_id))
+                    last_time, last_id = max_time, record_id
+                    since_entry = 0
+
+                max_time = max(max_time, time_record_decoder.decode(value).time)
+                since_entry += 1
+    finally:
+        iterator.close()
+
+    if entries:
+        index.entries = np.concatenate((index.entries, np.array(entries, dtype=ENTRY_DTYPE)))
+        save(index)
+    return len(entries)
+
+
+def seek_key(index: TimeIndex, time_ms: int) -> bytes | None:
+    """
+    Key to scan from for the records with a time > time_ms, every record before it has a
+    time <= time_ms. None for the start of the log.
+    """
+    i = int(np.searchsorted(index.entries["time"], time_ms, side="right")) - 1
+    if i < 0:
+        return None
+    return id_to_key(int(index.entries["id"][i]))
+
+
+def find_first_key_after(
+    storage: RocksdbLog, time_ms: int, index: TimeIndex | None = None
+) -> bytes | None:
+    """
+    First key whose record has a time > time_ms (the key after the last one if there is
+    none), None if the log is empty. The index is loaded and brought up to date if not
+    given.
+    """
+    if index is None:
+        index = load(get_index_path(storage))
+        update(index, storage)
+
+    last_key: bytes | None = None
+    iterator = storage.iterate_from(seek_key(index, time_ms), SCAN_BATCH_SIZE)
+    try:
+        while iterator.has_next():
+            for key, value in iterator.next_batch():
+                if time_record_decoder.decode(value).time > time_ms:
+                    return key
+                last_key = key
+    finally:
+        iterator.close()
+
+    if last_key is None:
+        return None
+    return id_to_key(key_to_id(last_key) + 1)
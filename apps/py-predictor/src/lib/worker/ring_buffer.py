@@ -1,22 +1,45 @@
+import hashlib
 import struct
-from multiprocessing import shared_memory
+from collections.abc import Sequence
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
 
 from . import shared_bytes
 
+# ca 10k trade windows can fit 1024KB/1MB
+BUF_SIZE = 2**22  # 4MB
+MAX_RECORD_SIZE = (2**12) * 4
+"""
+Size of the overflow tail after the data - records never wrap so a record starting right
+before the end spills into it. Records larger than this are rejected by write/write_many.
+"""
+
+
+def validate_size(buf_size: int, max_record_size: int) -> None:
+    if buf_size <= 0 or buf_size & (buf_size - 1) != 0:
+        raise ValueError(f"Ring buffer size must be a power of two, got {buf_size}")
+    if max_record_size <= 0 or max_record_size > buf_size // 2:
+        raise ValueError(
+            f"Max record size must be positive and at most half of the ring buffer size,"
+            f" got {max_record_size} for {buf_size}"
+        )
 
-def init(shm_data_name: str | None, shm_index_name: str | None):
-    # ca 10k trade windows can fit 1024KB/1MB
-    buf_size = 2**22  # 4MB
+
+def init(
+    shm_data_name: str | None,
+    shm_index_name: str | None,
+    buf_size: int = BUF_SIZE,
+    max_record_size: int = MAX_RECORD_SIZE,
+):
+    validate_size(buf_size, max_record_size)
     mask = buf_size - 1
     shm_data = (
-        shared_memory.SharedMemory(
-            create=True, size=buf_size + ((2**12) * 4)
-        )  # 4 fs page sizes, can fit about 40 trade windows
+        shared_memory.SharedMemory(create=True, size=buf_size + max_record_size)
         if shm_data_name is None
         else shared_memory.SharedMemory(name=shm_data_name)
     )
     shm_index = (
-        shared_memory.SharedMemory(create=True, size=24)
+        shared_memory.SharedMemory(create=True, size=INDEX_SEGMENT_SIZE)
         if shm_index_name is None
         else shared_memory.SharedMemory(name=shm_index_name)
     )
@@ -24,6 +47,95 @@ def init(shm_data_name: str | None, shm_index_name: str | None):
     return (shm_data, shm_index, buf_size, mask)
 
 
+def segment_names(ring_id: str) -> tuple[str, str]:
+    """
+    Deterministic (data, index) segment names for a ring id.
+
+    Hashed because macOS limits shared memory names to 31 characters.
+    """
+    digest = hashlib.blake2b(ring_id.encode(), digest_size=8).hexdigest()
+    return (f"krb_{digest}_d", f"krb_{digest}_i")
+
+
+def open_named(ring_id: str, buf_size: int = BUF_SIZE, max_record_size: int = MAX_RECORD_SIZE):
+    """
+    Create the named segments for ring_id or attach to the ones left behind by a
+    previous (crashed) coordinator. Segments with an unknown header are recreated.
+    Attached segments keep the size they were created with.
+
+    Named segments are not tracked by the resource tracker - they outlive the process
+    that created them and have to be removed with `unlink`.
+
+    returns (shm_data, shm_index, buf_size, mask, resumed)
+    """
+    shm_data_name, shm_index_name = segment_names(ring_id)
+
+    try:
+        shm_data, shm_index, buf_size, mask = attach(shm_data_name, shm_index_name)
+        return (shm_data, shm_index, buf_size, mask, True)
+    except (FileNotFoundError, ValueError):
+        _unlink_name(shm_data_name)
+        _unlink_name(shm_index_name)
+
+    validate_size(buf_size, max_record_size)
+    shm_data = shared_memory.SharedMemory(
+        name=shm_data_name, create=True, size=buf_size + max_record_size
+    )
+    _untrack(shm_data)
+    shm_index = shared_memory.SharedMemory(
+        name=shm_index_name, create=True, size=INDEX_SEGMENT_SIZE
+    )
+    _untrack(shm_index)
+
+    struct.pack_into(
+        HEADER_FMT, shm_index.buf, HEADER_OFFSET, HEADER_MAGIC, HEADER_VERSION, 0, buf_size, 0
+    )
+
+    return (shm_data, shm_index, buf_size, buf_size - 1, False)
+
+
+def attach(shm_data_name: str, shm_index_name: str):
+    """
+    Attach to segments created by `open_named`, raises ValueError on an unknown header.
+
+    returns (shm_data, shm_index, buf_size, mask)
+    """
+    shm_index = shared_memory.SharedMemory(name=shm_index_name)
+    _untrack(shm_index)
+    header = read_header(shm_index.buf) if shm_index.size >= INDEX_SEGMENT_SIZE else None
+    if header is None:
+        shm_index.close()
+        raise ValueError(f"Ring buffer {shm_index_name} has no valid header")
+
+    try:
+        shm_data = shared_memory.SharedMemory(name=shm_data_name)
+    except FileNotFoundError:
+        shm_index.close()
+        raise
+    _untrack(shm_data)
+
+    return (shm_data, shm_index, header.buf_size, header.buf_size - 1)
+
+
+def unlink(shm: shared_memory.SharedMemory) -> None:
+    """Close and remove a segment opened with `open_named`/`attach`"""
+    shm.close()
+    # unlink() unregisters from the resource tracker, register first to keep it balanced
+    resource_tracker.register(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    shm.unlink()
+
+
+def _untrack(shm: shared_memory.SharedMemory) -> None:
+    resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+
+
+def _unlink_name(name: str) -> None:
+    try:
+        unlink(shared_memory.SharedMemory(name=name))
+    except FileNotFoundError:
+        pass
+
+
 def write(data_buf, index_buf, mask: int, key: bytes, value: bytes):
     r_from_offset, end_marker, w_to_offset = read_index(index_buf)
 
@@ -33,6 +145,8 @@ def write(data_buf, index_buf, mask: int, key: bytes, value: bytes):
             return False  # Full
 
     msg = shared_bytes.pack(key, value)
+    if len(msg) > len(data_buf) - mask - 1:
+        raise ValueError(f"Record of {len(msg)} bytes does not fit the overflow tail")
     w_to_offset_new = w_to_offset + len(msg)
 
     if end_marker > 0:
@@ -54,23 +168,150 @@ def write(data_buf, index_buf, mask: int, key: bytes, value: bytes):
     return True
 
 
+def write_many(data_buf, index_buf, mask: int, records: Sequence[tuple[bytes, bytes]]) -> int:
+    """
+    Write as many records (in order) as fit and publish the write offset once.
+
+    returns the number of records written from the start of records, 0 if full
+    """
+    r_from_offset, end_marker, w_to_offset = read_index(index_buf)
+
+    offset = w_to_offset
+    wrapped_end_marker: int | None = None
+    written = 0
+    max_record_size = len(data_buf) - mask - 1
+
+    for key, value in records:
+        if end_marker > 0 and offset >= r_from_offset:
+            break  # Full
+
+        record_size = shared_bytes.packed_size(key, value)
+        if record_size > max_record_size:
+            if written > 0:
+                break  # Publish what fits, the next call raises
+            raise ValueError(f"Record of {record_size} bytes does not fit the overflow tail")
+        offset_new = offset + record_size
+
+        if end_marker > 0 and offset_new > r_from_offset:
+            break  # Full
+
+        shared_bytes.pack_into(data_buf, offset, key, value)
+        written += 1
+
+        if offset_new > mask:
+            # Record ended in the overflow tail, continue from the start behind the reader
+            end_marker = offset_new
+            wrapped_end_marker = offset_new
+            offset = offset_new & mask
+        else:
+            offset = offset_new
+
+    if written > 0:
+        write_offset_w(index_buf=index_buf, w_to_offset=offset, end_marker=wrapped_end_marker)
+
+    return written
+
+
 def read(data_buf, index_buf, mask: int):
+    peeked = peek(data_buf, index_buf, mask)
+    if peeked is None:
+        return None  # Empty
+
+    offset, key_view, value_view = peeked
+    key_bytes = bytes(key_view)
+    value_bytes = bytes(value_view)
+
+    commit(index_buf, mask, offset)
+
+    return (key_bytes, value_bytes)
+
+
+def peek(data_buf, index_buf, mask: int) -> tuple[int, memoryview, memoryview] | None:
+    """
+    Zero-copy read of the next record without moving the read offset.
+
+    returns (offset, key_view, value_view) where the views point into data_buf.
+    The views MUST be released (or at least no longer used) before `commit(offset)`
+    is called, after that the writer is free to overwrite the bytes behind them.
+    """
     r_from_offset, end_marker, w_to_offset = read_index(index_buf)
 
     # Cannot read from where the writer has not writeen yet
     if (r_from_offset == w_to_offset) and (end_marker == -1 or end_marker == 0):
         return None  # Empty
 
-    offset, key_bytes, value_bytes = shared_bytes.unpack(data_buf, r_from_offset)
-    next_r_from_offset = offset & mask
+    return shared_bytes.unpack_view(data_buf, r_from_offset)
+
+
+def is_empty(index_buf) -> bool:
+    r_from_offset, end_marker, w_to_offset = read_index(index_buf)
+    return (r_from_offset == w_to_offset) and (end_marker == -1 or end_marker == 0)
+
+
+def commit(index_buf, mask: int, offset: int) -> None:
+    """
+    Move the read offset past a record returned by `peek`.
 
+    offset is the unmasked end of the record, when it is past the mask the record
+    ended in the overflow tail and the reader wrapped back to the start.
+    """
     write_offset_r(
         index_buf=index_buf,
-        r_from_offset=next_r_from_offset,
-        reset_marker=r_from_offset >= next_r_from_offset,
+        r_from_offset=offset & mask,
+        reset_marker=offset > mask,
     )
 
-    return (key_bytes, value_bytes)
+
+def peek_many(
+    data_buf, index_buf, mask: int, max_records: int, max_bytes: int
+) -> tuple[int, list[tuple[memoryview, memoryview]]] | None:
+    """
+    Zero-copy read of up to max_records records (stops after crossing max_bytes)
+    without moving the read offset. Same view rules as `peek`.
+
+    returns (offset, [(key_view, value_view), ...]) where offset is passed to `commit`
+    """
+    r_from_offset, end_marker, w_to_offset = read_index(index_buf)
+
+    offset = r_from_offset
+    wrapped = False
+    size = 0
+    records: list[tuple[memoryview, memoryview]] = []
+
+    while len(records) < max_records and size < max_bytes:
+        # Writer is ahead on the same lap (or the reader already wrapped within this batch)
+        if offset == w_to_offset and (wrapped or end_marker == -1 or end_marker == 0):
+            break  # Empty
+
+        offset_new, key_view, value_view = shared_bytes.unpack_view(data_buf, offset)
+        records.append((key_view, value_view))
+        size += offset_new - offset
+
+        if offset_new > mask:
+            wrapped = True
+        offset = offset_new & mask
+
+    if not records:
+        return None
+
+    # Same convention as a single record: past the mask means the reader wrapped
+    return (offset + (mask + 1 if wrapped else 0), records)
+
+
+def drain(
+    data_buf, index_buf, mask: int, max_records: int, max_bytes: int
+) -> list[tuple[bytes, bytes]]:
+    """Copying variant of `peek_many` + `commit`, returns [] if empty"""
+    peeked = peek_many(data_buf, index_buf, mask, max_records, max_bytes)
+    if peeked is None:
+        return []
+
+    offset, views = peeked
+    records = [(bytes(key_view), bytes(value_view)) for key_view, value_view in views]
+
+    commit(index_buf, mask, offset)
+
+    return records
 
 
 INDEX_FMT = "<IiIIiI"
@@ -79,6 +320,107 @@ PS! DO NOT CHANGE THIS! HELL WILL BREAK LOOSE AND CROSS THREAD LOCKING HAS TO BE
 """
 INDEX_SIZE = struct.calcsize(INDEX_FMT)
 
+# Single byte flags after the index, each written by one side only (see ring_signal)
+READER_PARKED_OFFSET = INDEX_SIZE
+WRITER_PARKED_OFFSET = INDEX_SIZE + 1
+
+# Header of named segments (see open_named), lets a restarted coordinator re-attach
+HEADER_FMT = "<4sHBxII"
+"""(magic, version, stop_requested, buf_size, producer_pid)"""
+HEADER_OFFSET = 32
+HEADER_MAGIC = b"KRRB"
+HEADER_VERSION = 2
+STOP_REQUESTED_OFFSET = HEADER_OFFSET + 6
+PRODUCER_PID_OFFSET = HEADER_OFFSET + 12
+
+# Producer stats, written by the producer only and sampled by the consumer for metrics
+STATS_FMT = "<QQQQ"
+"""(records_written, full_stalls, stall_ns, last_publish_ns)"""
+STATS_OFFSET = HEADER_OFFSET + struct.calcsize(HEADER_FMT)
+INDEX_SEGMENT_SIZE = STATS_OFFSET + struct.calcsize(STATS_FMT)
+
+
+@dataclass
+class RingHeader:
+    buf_size: int
+    producer_pid: int
+    stop_requested: bool
+
+
+def read_header(index_buf) -> RingHeader | None:
+    """returns None when the segment was not created by `open_named`"""
+    magic, version, stop_requested, buf_size, producer_pid = struct.unpack_from(
+        HEADER_FMT, index_buf, HEADER_OFFSET
+    )
+    if magic != HEADER_MAGIC or version != HEADER_VERSION:
+        return None
+
+    return RingHeader(
+        buf_size=buf_size, producer_pid=producer_pid, stop_requested=stop_requested == 1
+    )
+
+
+def set_producer_pid(index_buf, pid: int) -> None:
+    struct.pack_into("<I", index_buf, PRODUCER_PID_OFFSET, pid)
+
+
+def request_stop(index_buf) -> None:
+    index_buf[STOP_REQUESTED_OFFSET] = 1
+
+
+def is_stop_requested(index_buf) -> bool:
+    return index_buf[STOP_REQUESTED_OFFSET] == 1
+
+
+def reset(index_buf) -> None:
+    """Empty the ring and clear flags/producer/stats for a new producer, keeps the header"""
+    index_buf[:HEADER_OFFSET] = bytes(HEADER_OFFSET)
+    index_buf[STOP_REQUESTED_OFFSET] = 0
+    set_producer_pid(index_buf, 0)
+    struct.pack_into(STATS_FMT, index_buf, STATS_OFFSET, 0, 0, 0, 0)
+
+
+@dataclass
+class RingStats:
+    records_written: int
+    full_stalls: int
+    """times the producer found the ring full"""
+    stall_ns: int
+    """total time the producer waited for space"""
+    last_publish_ns: int
+    """time.monotonic_ns() of the last publish"""
+
+
+def read_stats(index_buf) -> RingStats:
+    records_written, full_stalls, stall_ns, last_publish_ns = struct.unpack_from(
+        STATS_FMT, index_buf, STATS_OFFSET
+    )
+    return RingStats(
+        records_written=records_written,
+        full_stalls=full_stalls,
+        stall_ns=stall_ns,
+        last_publish_ns=last_publish_ns,
+    )
+
+
+def add_written(index_buf, records: int, publish_ns: int) -> None:
+    (records_written,) = struct.unpack_from("<Q", index_buf, STATS_OFFSET)
+    struct.pack_into("<Q", index_buf, STATS_OFFSET, records_written + records)
+    struct.pack_into("<Q", index_buf, STATS_OFFSET + 24, publish_ns)
+
+
+def add_stall(index_buf, stall_ns: int) -> None:
+    full_stalls, total_stall_ns = struct.unpack_from("<QQ", index_buf, STATS_OFFSET + 8)
+    struct.pack_into("<QQ", index_buf, STATS_OFFSET + 8, full_stalls + 1, total_stall_ns + stall_ns)
+
+
+def bytes_used(index_buf) -> int:
+    r_from_offset, end_marker, w_to_offset = read_index(index_buf)
+    if end_marker > 0:
+        # Writer wrapped, reader has not: [r, end) + [0, w)
+        return end_marker - r_from_offset + w_to_offset
+    return w_to_offset - r_from_offset
+
 
 def read_index(index_buf) -> tuple[int, int, int]:
     r"""
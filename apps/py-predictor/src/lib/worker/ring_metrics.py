@@ -0,0 +1,135 @@
+"""
+Prometheus metrics for ring buffers, labeled by ring id.
+
+Producer side counters live in the ring's index segment (see ring_buffer.read_stats),
+the consumer samples them on every read and publishes the deltas.
+"""
+
+import time
+from dataclasses import dataclass, field
+
+from prometheus_client import Counter, Gauge, Histogram
+from service_framework import MetricsContext
+
+from . import ring_buffer
+
+PUBLISH_AGE_BUCKETS = [0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5]
+
+
+@dataclass
+class RingSample:
+    stats: ring_buffer.RingStats
+    high_watermark: int = 0
+
+
+@dataclass
+class RingBufferMetrics:
+    capacity_bytes: Gauge
+    bytes_used: Gauge
+    high_watermark_bytes: Gauge
+    records_written: Counter
+    records_read: Counter
+    full_stalls: Counter
+    stall_seconds: Counter
+    publish_age_seconds: Histogram
+    samples: dict[str, RingSample] = field(default_factory=dict)
+
+
+def create_ring_buffer_metrics(metrics_context: MetricsContext) -> RingBufferMetrics:
+    labels = ["ring"]
+    return RingBufferMetrics(
+        capacity_bytes=metrics_context.create_gauge(
+            "ring_buffer_capacity_bytes", "Data capacity of the ring buffer", labels
+        ),
+        bytes_used=metrics_context.create_gauge(
+            "ring_buffer_bytes_used", "Published bytes not yet read", labels
+        ),
+        high_watermark_bytes=metrics_context.create_gauge(
+            "ring_buffer_high_watermark_bytes", "Highest bytes_used seen by the consumer", labels
+        ),
+        records_written=metrics_context.create_counter(
+            "ring_buffer_records_written_total", "Records published by the producer", labels
+        ),
+        records_read=metrics_context.create_counter(
+            "ring_buffer_records_read_total", "Records committed by the consumer", labels
+        ),
+        full_stalls=metrics_context.create_counter(
+            "ring_buffer_full_stalls_total", "Times the producer found the ring full", labels
+        ),
+        stall_seconds=metrics_context.create_counter(
+            "ring_buffer_stall_seconds_total", "Time the producer waited for space", labels
+        ),
+        publish_age_seconds=metrics_context.create_histogram(
+            "ring_buffer_publish_age_seconds",
+            "Time since the producer's last publish when the consumer peeked a batch, a lower"
+            " bound of how long the batch waited in the ring",
+            labels,
+            PUBLISH_AGE_BUCKETS,
+        ),
+    )
+
+
+def get_publish_age_ns(index_buf) -> int | None:
+    """Time since the producer's last publish, call right after peeking a batch"""
+    last_publish_ns = ring_buffer.read_stats(index_buf).last_publish_ns
+    if last_publish_ns == 0:
+        return None
+    return max(0, time.monotonic_ns() - last_publish_ns)
+
+
+def observe_read(
+    metrics: RingBufferMetrics,
+    ring_id: str,
+    index_buf,
+    buf_size: int,
+    records: int,
+    publish_age_ns: int | None = None,
+) -> None:
+    """
+    Call before committing a batch of records read from the ring.
+
+    publish_age_ns
+        get_publish_age_ns when the batch was peeked
+    """
+    stats = ring_buffer.read_stats(index_buf)
+    used = ring_buffer.bytes_used(index_buf)
+
+    sample = metrics.samples.get(ring_id)
+    if sample is None:
+        sample = RingSample(stats=ring_buffer.RingStats(0, 0, 0, 0))
+        metrics.samples[ring_id] = sample
+        metrics.capacity_bytes.labels(ring_id).set(buf_size)
+
+    previous = sample.stats
+    # Counters restart from 0 when the ring is reset for a new producer
+    if stats.records_written < previous.records_written:
+        previous = ring_buffer.RingStats(0, 0, 0, 0)
+
+    sample.high_watermark = max(sample.high_watermark, used)
+    sample.stats = stats
+
+    metrics.bytes_used.labels(ring_id).set(used)
+    metrics.high_watermark_bytes.labels(ring_id).set(sample.high_watermark)
+    metrics.records_written.labels(ring_id).inc(stats.records_written - previous.records_written)
+    metrics.records_read.labels(ring_id).inc(records)
+    metrics.full_stalls.labels(ring_id).inc(stats.full_stalls - previous.full_stalls)
+    metrics.stall_seconds.labels(ring_id).inc((stats.stall_ns - previous.stall_ns) / 1e9)
+
+    if publish_age_ns is not None:
+        metrics.publish_age_seconds.labels(ring_id).observe(publish_age_ns / 1e9)
+
+
+def forget_ring(metrics: RingBufferMetrics, ring_id: str) -> None:
+    """Stop exporting the series of a removed ring"""
+    metrics.samples.pop(ring_id, None)
+    for metric in [
+        metrics.capacity_bytes,
+        metrics.bytes_used,
+        metrics.high_watermark_bytes,
+        metrics.records_written,
+        metrics.records_read,
+        metrics.full_stalls,
+        metrics.stall_seconds,
+        metrics.publish_age_seconds,
+    ]:
+        metric.remove(ring_id)
@@ -0,0 +1,112 @@
+"""
+Wakeups between the ring buffer producer (worker) and consumer (main process).
+
+A side that has nothing to do raises its parked flag in the index segment, re-checks the
+ring and then waits on a pipe. The other side only writes to the pipe when it sees the flag
+raised, so the hot path costs a single byte read per publish/commit.
+
+The flags are not fenced, a wakeup can (rarely) be missed so waits always have a timeout.
+
+Once the worker is started the main process closes its copies of the worker's pipe ends
+(`close_child_ends`), so a side that exits shows as EOF on the other side's receiver. A
+forked worker also inherits the pipes of the workers started before it, so EOF is only a
+hint and does not replace the timeout.
+"""
+
+import os
+import select
+import time
+from dataclasses import dataclass
+from multiprocessing import Pipe
+from multiprocessing.connection import Connection
+
+from .ring_buffer import READER_PARKED_OFFSET, WRITER_PARKED_OFFSET
+
+WAKEUP_TIMEOUT_S = 0.5
+
+
+@dataclass
+class RingChannels:
+    not_empty_receiver: Connection
+    """main process waits on this for the worker to publish"""
+    not_empty_sender: Connection
+    not_full_receiver: Connection
+    """worker waits on this for the main process to commit"""
+    not_full_sender: Connection
+
+
+def create_channels() -> RingChannels:
+    not_empty_receiver, not_empty_sender = Pipe(duplex=False)
+    not_full_receiver, not_full_sender = Pipe(duplex=False)
+
+    for conn in (not_empty_receiver, not_empty_sender, not_full_receiver, not_full_sender):
+        os.set_blocking(conn.fileno(), False)
+
+    return RingChannels(
+        not_empty_receiver=not_empty_receiver,
+        not_empty_sender=not_empty_sender,
+        not_full_receiver=not_full_receiver,
+        not_full_sender=not_full_sender,
+    )
+
+
+def close_child_ends(channels: RingChannels) -> None:
+    """Close the main process' copies of the ends passed to the worker, after its start"""
+    channels.not_empty_sender.close()
+    channels.not_full_receiver.close()
+
+
+def close_channels(channels: RingChannels) -> None:
+    channels.not_empty_receiver.close()
+    channels.not_empty_sender.close()
+    channels.not_full_receiver.close()
+    channels.not_full_sender.close()
+
+
+def notify(sender: Connection) -> None:
+    try:
+        os.write(sender.fileno(), b"\x01")
+    except (BlockingIOError, BrokenPipeError):
+        pass  # Pipe already holds pending wakeups or the other side is gone
+
+
+def clear(receiver: Connection) -> bool:
+    """Consume pending wakeups, returns False if the sending side is closed"""
+    try:
+        while True:
+            if not os.read(receiver.fileno(), 4096):
+                return False
+    except BlockingIOError:
+        return True
+
+
+def wait(receiver: Connection, timeout: float = WAKEUP_TIMEOUT_S) -> None:
+    """Blocking wait for a wakeup (or timeout), for use outside of an event loop"""
+    readable, _, _ = select.select([receiver.fileno()], [], [], timeout)
+    if readable and not clear(receiver):
+        # Sender is gone, the pipe stays readable forever - fall back to polling
+        time.sleep(timeout)
+
+
+def park_reader(index_buf) -> None:
+    index_buf[READER_PARKED_OFFSET] = 1
+
+
+def unpark_reader(index_buf) -> None:
+    index_buf[READER_PARKED_OFFSET] = 0
+
+
+def is_reader_parked(index_buf) -> bool:
+    return index_buf[READER_PARKED_OFFSET] == 1
+
+
+def park_writer(index_buf) -> None:
+    index_buf[WRITER_PARKED_OFFSET] = 1
+
+
+def unpark_writer(index_buf) -> None:
+    index_buf[WRITER_PARKED_OFFSET] = 0
+
+
+def is_writer_parked(index_buf) -> bool:
+    return index_buf[WRITER_PARKED_OFFSET] == 1
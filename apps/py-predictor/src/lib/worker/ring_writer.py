@@ -0,0 +1,180 @@
+"""
+Producer side of a ring buffer with backpressure.
+
+Records are packed by the caller once and queued in a local spill queue, `try_flush`
+publishes as much as fits without waiting. When the ring is full the writer spins for a
+short while (the consumer usually commits within microseconds) and then parks on the
+not-full wakeup (see ring_signal). `flush` blocks the thread, `make_room`/`run_flusher` wait
+inside the asyncio loop so the worker keeps reading its sockets while the ring is full.
+Several tasks may wait at once, they share one reader of the wakeup pipe and the parked flag
+stays raised until the last of them is done.
+"""
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import Callable
+from multiprocessing.connection import Connection
+
+from . import ring_buffer, ring_signal
+
+IsStopped = Callable[[], bool]
+
+SPIN_S = 0.0002
+"""How long to retry a full ring before parking"""
+
+MAX_SPILL = 16384
+"""Records queued locally before callers have to wait for the consumer"""
+
+
+class RingWriter:
+    def __init__(
+        self,
+        data_buf,
+        index_buf,
+        mask: int,
+        not_empty_sender: Connection,
+        not_full_receiver: Connection,
+        max_spill: int = MAX_SPILL,
+        spin_s: float = SPIN_S,
+    ):
+        self.data_buf = data_buf
+        self.index_buf = index_buf
+        self.mask = mask
+        self.not_empty_sender = not_empty_sender
+        self.not_full_receiver = not_full_receiver
+        self.max_spill = max_spill
+        self.spin_s = spin_s
+        self.spill: deque[tuple[bytes, bytes]] = deque()
+        self._stall_start_ns = 0
+        self._spilled = asyncio.Event()
+        self._parked = 0
+        """callers parked on the not-full wakeup"""
+        self._not_full: asyncio.Future[bool] | None = None
+        """woken by the next wakeup, True unless the coordinator is gone"""
+
+    def __len__(self) -> int:
+        return len(self.spill)
+
+    def append(self, key: bytes, value: bytes) -> None:
+        self.spill.append((key, value))
+        self._spilled.set()
+
+    def is_over_limit(self) -> bool:
+        return len(self.spill) >= self.max_spill
+
+    def try_flush(self) -> bool:
+        """Publish as much of the spill as fits without waiting, True when it is empty"""
+        if not self.spill:
+            return True
+
+        written = ring_buffer.write_many(self.data_buf, self.index_buf, self.mask, self.spill)
+        now_ns = time.monotonic_ns()
+
+        if written > 0:
+            if self._stall_start_ns > 0:
+                ring_buffer.add_stall(self.index_buf, now_ns - self._stall_start_ns)
+                self._stall_start_ns = 0
+            ring_buffer.add_written(self.index_buf, written, now_ns)
+
+            for _ in range(written):
+                self.spill.popleft()
+
+            if ring_signal.is_reader_parked(self.index_buf):
+                ring_signal.notify(self.not_empty_sender)
+
+        if self.spill and self._stall_start_ns == 0:
+            self._stall_start_ns = now_ns  # Ring is full
+
+        return not self.spill
+
+    def _spin(self, until: int) -> bool:
+        """Retry for spin_s, True once the spill is down to until records"""
+        deadline = time.perf_counter() + self.spin_s
+        while time.perf_counter() < deadline:
+            self.try_flush()
+            if len(self.spill) <= until:
+                return True
+        return False
+
+    def _park(self, until: int) -> bool:
+        """
+        Raise the parked flag and retry once so a commit racing with the park is not missed.
+        The caller waits on not_full_receiver (if this returns False) and has to unpark.
+        """
+        self._parked += 1
+        ring_signal.park_writer(self.index_buf)
+        self.try_flush()
+        return len(self.spill) <= until
+
+    def _unpark(self) -> None:
+        """Lower the parked flag once no other caller is parked"""
+        self._parked -= 1
+        if self._parked == 0:
+            ring_signal.unpark_writer(self.index_buf)
+
+    def flush(self, is_stopped: IsStopped) -> None:
+        """Blocking: publish the whole spill (or until stopped)"""
+        while not self.try_flush() and not is_stopped():
+            if self._spin(0):
+                break
+            if not self._park(0):
+                ring_signal.wait(self.not_full_receiver)
+            self._unpark()
+
+    def _watch_not_full(self, loop: asyncio.AbstractEventLoop) -> asyncio.Future[bool]:
+        """The future of the next wakeup, one pipe reader for all waiting tasks"""
+        if self._not_full is not None and self._not_full.get_loop() is loop:
+            return self._not_full
+
+        fd = self.not_full_receiver.fileno()
+        woken: asyncio.Future[bool] = loop.create_future()
+
+        def on_readable() -> None:
+            loop.remove_reader(fd)
+            self._not_full = None
+            if not woken.done():
+                woken.set_result(ring_signal.clear(self.not_full_receiver))
+
+        loop.add_reader(fd, on_readable)
+        self._not_full = woken
+        return woken
+
+    async def wait_not_full(self) -> None:
+        woken = self._watch_not_full(asyncio.get_running_loop())
+        try:
+            # Shielded, a waiter timing out leaves the reader to the others
+            alive = await asyncio.wait_for(asyncio.shield(woken), ring_signal.WAKEUP_TIMEOUT_S)
+        except TimeoutError:
+            return
+
+        if not alive:
+            # Coordinator is gone, the pipe stays readable - fall back to polling
+            await asyncio.sleep(ring_signal.WAKEUP_TIMEOUT_S)
+
+    async def _flush_async(self, until: int, is_stopped: IsStopped) -> None:
+        while len(self.spill) > until and not is_stopped():
+            self.try_flush()
+            if len(self.spill) <= until or self._spin(until):
+                break
+            try:
+                if not self._park(until):
+                    await self.wait_not_full()
+            finally:
+                self._unpark()
+
+    async def make_room(self, is_stopped: IsStopped) -> None:
+        """Wait without blocking the event loop until the spill is below max_spill"""
+        await self._flush_async(self.max_spill - 1, is_stopped)
+
+    async def run_flusher(self, is_stopped: IsStopped) -> None:
+        """Task publishing spilled records while the ring is full, until stopped"""
+        while not is_stopped():
+            if not self.spill:
+                self._spilled.clear()
+                try:
+                    await asyncio.wait_for(self._spilled.wait(), ring_signal.WAKEUP_TIMEOUT_S)
+                except TimeoutError:
+                    pass
+                continue
+            await self._flush_async(0, is_stopped)
@@ -3,19 +3,23 @@ import struct
 HEADER_SIZE = 8
 
 
-# def pack(buf, offset: int, key: bytes, value: bytes):
-#     key_len = len(key)
-#     value_len = len(value)
-#     header = struct.pack("<II", key_len, value_len)
+def pack_into(buf, offset: int, key: bytes, value: bytes) -> int:
+    """Pack key and value with header directly into buf, returns the offset after the record"""
+    key_len = len(key)
+    value_len = len(value)
+    struct.pack_into("<II", buf, offset, key_len, value_len)
 
-#     buf[offset : offset + HEADER_SIZE] = header
-#     offset += HEADER_SIZE
-#     buf[offset : offset + key_len] = key
-#     offset += key_len
-#     buf[offset : offset + value_len] = value
-#     offset += value_len
+    offset += HEADER_SIZE
+    buf[offset : offset + key_len] = key
+    offset += key_len
+    buf[offset : offset + value_len] = value
+    offset += value_len
+
+    return offset
 
-#     return offset
+
+def packed_size(key: bytes, value: bytes) -> int:
+    return HEADER_SIZE + len(key) + len(value)
 
 
 def pack(key: bytes, value: bytes) -> bytes:
@@ -35,3 +39,17 @@ def unpack(buf, offset: int):
     offset += json_len
 
     return (offset, key_bytes, value_bytes)
+
+
+def unpack_view(buf: memoryview, offset: int) -> tuple[int, memoryview, memoryview]:
+    """
+    Same as unpack but returns memoryview slices into buf instead of copies.
+    The views are only valid until the reader offset is moved past them.
+    """
+    key_len, value_len = struct.unpack_from("<II", buf, offset)
+
+    offset += HEADER_SIZE
+    key_end = offset + key_len
+    value_end = key_end + value_len
+
+    return (value_end, buf[offset:key_end], buf[key_end:value_end])
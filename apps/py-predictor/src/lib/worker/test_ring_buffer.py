@@ -1,3 +1,7 @@
+import os
+
+import pytest
+
 from . import ring_buffer
 
 """
@@ -184,3 +188,210 @@ def test_ring_buffer_operations():
     index = ring_buffer.read_index(index_buf)
     assert result == (key6, value6)
     assert index == (33, -1, 33)
+
+
+def test_ring_buffer_peek_commit():
+    mask = 63
+    data_buf = memoryview(bytearray(128))
+    index_buf = bytearray(32)
+
+    """
+    Peek from empty buffer
+    """
+    assert ring_buffer.peek(data_buf, index_buf, mask) is None
+    assert ring_buffer.is_empty(index_buf) is True
+
+    key1 = b"12345678"
+    value1 = b"1234567812345678"
+    key2 = b"abcdefgh"
+    value2 = b"abcdefghabcdefgh"
+    assert ring_buffer.write(data_buf, index_buf, mask, key1, value1) is True
+    assert ring_buffer.write(data_buf, index_buf, mask, key2, value2) is True
+
+    """
+    Peek returns views and does not move the read offset
+    """
+    peeked = ring_buffer.peek(data_buf, index_buf, mask)
+    assert peeked is not None
+    offset, key_view, value_view = peeked
+    assert isinstance(key_view, memoryview)
+    assert (bytes(key_view), bytes(value_view)) == (key1, value1)
+    assert offset == 32
+    assert ring_buffer.read_index(index_buf) == (0, 64, 0)
+
+    again = ring_buffer.peek(data_buf, index_buf, mask)
+    assert again is not None
+    assert bytes(again[1]) == key1
+
+    """
+    Buffer is full until the reader commits
+    """
+    assert ring_buffer.write(data_buf, index_buf, mask, b"x", b"y") is False
+    ring_buffer.commit(index_buf, mask, offset)
+    assert ring_buffer.read_index(index_buf) == (32, 64, 0)
+
+    """
+    Commit of a record ending in the overflow tail wraps the reader
+    """
+    peeked = ring_buffer.peek(data_buf, index_buf, mask)
+    assert peeked is not None
+    offset, key_view, value_view = peeked
+    assert (bytes(key_view), bytes(value_view)) == (key2, value2)
+    assert offset == 64
+    ring_buffer.commit(index_buf, mask, offset)
+    assert ring_buffer.read_index(index_buf) == (0, -1, 0)
+    assert ring_buffer.is_empty(index_buf) is True
+    assert ring_buffer.peek(data_buf, index_buf, mask) is None
+
+
+def test_ring_buffer_write_many_drain():
+    mask = 63
+    data_buf = memoryview(bytearray(128))
+    index_buf = bytearray(32)
+
+    assert ring_buffer.drain(data_buf, index_buf, mask, 10, 1024) == []
+
+    """
+    Write three 32 byte records, only the first two fit (second one ends at the mask)
+    """
+    records = [
+        (b"12345678", b"1234567812345678"),
+        (b"abcdefgh", b"abcdefghabcdefgh"),
+        (b"ijklmnop", b"ijklmnopijklmnop"),
+    ]
+    written = ring_buffer.write_many(data_buf, index_buf, mask, records)
+    assert written == 2
+    assert ring_buffer.read_index(index_buf) == (0, 64, 0)
+
+    assert ring_buffer.write_many(data_buf, index_buf, mask, records[2:]) == 0
+
+    """
+    Drain respects max_records and wraps the reader
+    """
+    assert ring_buffer.drain(data_buf, index_buf, mask, 1, 1024) == records[:1]
+    assert ring_buffer.read_index(index_buf) == (32, 64, 0)
+
+    assert ring_buffer.drain(data_buf, index_buf, mask, 10, 1024) == records[1:2]
+    assert ring_buffer.read_index(index_buf) == (0, -1, 0)
+
+    """
+    A batch can wrap in the middle and continue behind the reader
+    """
+    r = [(b"aaaaaaaa", b"bbbbbbbbbbbbbbbbbbbbbbbb")]  # 40 bytes
+    assert ring_buffer.write_many(data_buf, index_buf, mask, r) == 1
+    assert ring_buffer.drain(data_buf, index_buf, mask, 10, 1024) == r
+    assert ring_buffer.read_index(index_buf) == (40, -1, 40)
+
+    records = [
+        (b"cccccccc", b"dddddddddddddddddddddddd"),  # 40 -> 80 (16)
+        (b"eeeeeeee", b"ffffffff"),  # 16 -> 40
+        (b"x", b"y"),  # would pass the reader
+    ]
+    assert ring_buffer.write_many(data_buf, index_buf, mask, records) == 2
+    assert ring_buffer.read_index(index_buf) == (40, 80, 40)
+
+    peeked = ring_buffer.peek_many(data_buf, index_buf, mask, 10, 1024)
+    assert peeked is not None
+    offset, views = peeked
+    assert [(bytes(k), bytes(v)) for k, v in views] == records[:2]
+    assert offset == 40 + 64  # wrapped
+
+    ring_buffer.commit(index_buf, mask, offset)
+    assert ring_buffer.read_index(index_buf) == (40, -1, 40)
+    assert ring_buffer.is_empty(index_buf) is True
+
+    """
+    max_bytes stops the batch once crossed
+    """
+    records = [(b"k", b"v" * 7)] * 4  # 16 bytes each
+    assert ring_buffer.write_many(data_buf, index_buf, mask, records) == 4
+    assert len(ring_buffer.drain(data_buf, index_buf, mask, 10, 17)) == 2
+    assert len(ring_buffer.drain(data_buf, index_buf, mask, 10, 1024)) == 2
+    assert ring_buffer.is_empty(index_buf) is True
+
+
+def test_ring_buffer_open_named_resume():
+    ring_id = f"test-{os.getpid()}-open-named"
+
+    shm_data, shm_index, buf_size, mask, resumed = ring_buffer.open_named(ring_id)
+    try:
+        assert resumed is False
+        assert mask == buf_size - 1
+        ring_buffer.set_producer_pid(shm_index.buf, 1234)
+        assert ring_buffer.write(shm_data.buf, shm_index.buf, mask, b"12345678", b"value")
+
+        """
+        A restarted coordinator finds the header, the producer and the buffered record
+        """
+        data2, index2, buf_size2, mask2, resumed2 = ring_buffer.open_named(ring_id)
+        assert resumed2 is True
+        assert buf_size2 == buf_size
+        header = ring_buffer.read_header(index2.buf)
+        assert header == ring_buffer.RingHeader(
+            buf_size=buf_size, producer_pid=1234, stop_requested=False
+        )
+
+        ring_buffer.request_stop(index2.buf)
+        assert ring_buffer.is_stop_requested(shm_index.buf)
+        assert ring_buffer.read(data2.buf, index2.buf, mask2) == (b"12345678", b"value")
+
+        ring_buffer.reset(index2.buf)
+        assert ring_buffer.read_header(shm_index.buf) == ring_buffer.RingHeader(
+            buf_size=buf_size, producer_pid=0, stop_requested=False
+        )
+        assert ring_buffer.is_empty(shm_index.buf)
+        data2.close()
+        index2.close()
+    finally:
+        ring_buffer.unlink(shm_data)
+        ring_buffer.unlink(shm_index)
+
+    shm_data, shm_index, _, _, resumed = ring_buffer.open_named(ring_id)
+    assert resumed is False
+    ring_buffer.unlink(shm_data)
+    ring_buffer.unlink(shm_index)
+
+
+def test_ring_buffer_stats():
+    mask = 63
+    data_buf = bytearray(128)
+    index_buf = bytearray(ring_buffer.INDEX_SEGMENT_SIZE)
+
+    written = ring_buffer.write_many(
+        data_buf, index_buf, mask, [(b"12345678", b"1234567812345678")] * 2
+    )
+    ring_buffer.add_written(index_buf, written, publish_ns=10)
+    ring_buffer.add_stall(index_buf, stall_ns=5)
+    ring_buffer.add_stall(index_buf, stall_ns=7)
+
+    assert ring_buffer.read_stats(index_buf) == ring_buffer.RingStats(
+        records_written=2, full_stalls=2, stall_ns=12, last_publish_ns=10
+    )
+    assert ring_buffer.bytes_used(index_buf) == 64  # Writer wrapped exactly at the end
+
+    ring_buffer.read(data_buf, index_buf, mask)
+    assert ring_buffer.bytes_used(index_buf) == 32
+    ring_buffer.read(data_buf, index_buf, mask)
+    assert ring_buffer.bytes_used(index_buf) == 0
+
+
+def test_ring_buffer_record_size_validation():
+    mask = 63
+    data_buf = bytearray(64 + 16)  # 16 byte overflow tail
+    index_buf = bytearray(ring_buffer.INDEX_SEGMENT_SIZE)
+
+    with pytest.raises(ValueError):
+        ring_buffer.write(data_buf, index_buf, mask, b"12345678", b"12345678")
+
+    """
+    The records that fit are published before the oversized one is rejected
+    """
+    records = [(b"1234", b"1234"), (b"12345678", b"12345678")]
+    assert ring_buffer.write_many(data_buf, index_buf, mask, records) == 1
+    with pytest.raises(ValueError):
+        ring_buffer.write_many(data_buf, index_buf, mask, records[1:])
+
+    with pytest.raises(ValueError):
+        ring_buffer.validate_size(100, 16)
+    with pytest.raises(ValueError):
+        ring_buffer.validate_size(64, 64)
@@ -0,0 +1,41 @@
+from service_framework import MetricsConfig, create_metrics_context
+
+from . import ring_buffer, ring_metrics
+
+
+def test_ring_metrics_observe_read():
+    metrics_context = create_metrics_context(
+        MetricsConfig(env_context=None, enable_default_metrics=False, prefix="test")
+    )
+    metrics = ring_metrics.create_ring_buffer_metrics(metrics_context)
+    registry = metrics_context.get_registry()
+
+    mask = 63
+    data_buf = bytearray(128)
+    index_buf = bytearray(ring_buffer.INDEX_SEGMENT_SIZE)
+
+    ring_buffer.write(data_buf, index_buf, mask, b"12345678", b"1234567812345678")
+    ring_buffer.add_written(index_buf, 1, publish_ns=1)
+    ring_buffer.add_stall(index_buf, stall_ns=2_000_000_000)
+
+    publish_age_ns = ring_metrics.get_publish_age_ns(index_buf)
+    ring_metrics.observe_read(metrics, "ring-a", index_buf, mask + 1, 1, publish_age_ns)
+    ring_buffer.read(data_buf, index_buf, mask)
+    ring_metrics.observe_read(metrics, "ring-a", index_buf, mask + 1, records=0)
+
+    def value(name: str) -> float | None:
+        return registry.get_sample_value(name, {"ring": "ring-a"})
+
+    assert value("test_ring_buffer_capacity_bytes") == 64
+    assert value("test_ring_buffer_bytes_used") == 0
+    assert value("test_ring_buffer_high_watermark_bytes") == 32
+    assert value("test_ring_buffer_records_written_total") == 1
+    assert value("test_ring_buffer_records_read_total") == 1
+    assert value("test_ring_buffer_full_stalls_total") == 1
+    assert value("test_ring_buffer_stall_seconds_total") == 2
+    assert value("test_ring_buffer_publish_age_seconds_count") == 1
+
+    ring_metrics.forget_ring(metrics, "ring-a")
+    assert value("test_ring_buffer_bytes_used") is None
+    assert value("test_ring_buffer_records_read_total") is None
+    assert value("test_ring_buffer_publish_age_seconds_count") is None
@@ -0,0 +1,17 @@
+from multiprocessing import Process
+
+from . import ring_signal
+
+
+def test_exited_worker_shows_as_eof():
+    channels = ring_signal.create_channels()
+    try:
+        proc = Process(target=ring_signal.notify, args=(channels.not_empty_sender,))
+        proc.start()
+        ring_signal.close_child_ends(channels)
+        proc.join()
+
+        # The wakeup is read first, then the closed pipe
+        assert not ring_signal.clear(channels.not_empty_receiver)
+    finally:
+        ring_signal.close_channels(channels)
@@ -0,0 +1,94 @@
+import asyncio
+
+from . import ring_buffer, ring_signal
+from .ring_writer import RingWriter
+
+KEY = b"12345678"
+VALUE = b"1234567812345678"  # 32 bytes packed, 2 records fill the ring
+
+
+def create_writer(max_spill: int = 4):
+    mask = 63
+    data_buf = bytearray(128)
+    index_buf = bytearray(ring_buffer.INDEX_SEGMENT_SIZE)
+    channels = ring_signal.create_channels()
+    writer = RingWriter(
+        data_buf=data_buf,
+        index_buf=index_buf,
+        mask=mask,
+        not_empty_sender=channels.not_empty_sender,
+        not_full_receiver=channels.not_full_receiver,
+        max_spill=max_spill,
+        spin_s=0,
+    )
+    return writer, channels
+
+
+def test_ring_writer_spills_when_full():
+    writer, channels = create_writer()
+    try:
+        for _ in range(3):
+            writer.append(KEY, VALUE)
+
+        assert writer.try_flush() is False
+        assert len(writer) == 1
+        assert ring_buffer.read_stats(writer.index_buf).records_written == 2
+
+        assert ring_buffer.read(writer.data_buf, writer.index_buf, writer.mask) == (KEY, VALUE)
+        assert writer.try_flush() is True
+        assert len(writer) == 0
+
+        stats = ring_buffer.read_stats(writer.index_buf)
+        assert stats.records_written == 3
+        assert stats.full_stalls == 1
+    finally:
+        ring_signal.close_channels(channels)
+
+
+async def test_ring_writer_make_room_waits_for_consumer():
+    writer, channels = create_writer(max_spill=2)
+    try:
+        for _ in range(4):
+            writer.append(KEY, VALUE)
+        writer.try_flush()
+        assert writer.is_over_limit()
+
+        def consume():
+            ring_buffer.read(writer.data_buf, writer.index_buf, writer.mask)
+            assert ring_signal.is_writer_parked(writer.index_buf)
+            ring_signal.notify(channels.not_full_sender)
+
+        asyncio.get_running_loop().call_later(0.01, consume)
+        await asyncio.wait_for(writer.make_room(lambda: False), timeout=0.4)
+
+        assert len(writer) == 1
+        assert not ring_signal.is_writer_parked(writer.index_buf)
+    finally:
+        ring_signal.close_channels(channels)
+
+
+async def test_ring_writer_wakes_every_waiting_task():
+    writer, channels = create_writer(max_spill=2)
+    try:
+        for _ in range(4):
+            writer.append(KEY, VALUE)
+        writer.try_flush()
+
+        def consume():
+            for _ in range(2):
+                ring_buffer.read(writer.data_buf, writer.index_buf, writer.mask)
+            ring_signal.notify(channels.not_full_sender)
+
+        # The flusher and a socket task making room both park on the same pipe
+        asyncio.get_running_loop().call_later(0.01, consume)
+        await asyncio.wait_for(
+            asyncio.gather(
+                writer.run_flusher(lambda: len(writer) == 0), writer.make_room(lambda: False)
+            ),
+            timeout=0.3,
+        )
+
+        assert len(writer) == 0
+        assert not ring_signal.is_writer_parked(writer.index_buf)
+    finally:
+        ring_signal.close_channels(channels)
@@ -0,0 +1,24 @@
+"""Prometheus metrics for supervised worker processes, labeled by worker id."""
+
+from dataclasses import dataclass
+
+from prometheus_client import Counter
+from service_framework import MetricsContext
+
+
+@dataclass
+class WorkerMetrics:
+    crashes: Counter
+    restarts: Counter
+
+
+def create_worker_metrics(metrics_context: MetricsContext) -> WorkerMetrics:
+    labels = ["worker"]
+    return WorkerMetrics(
+        crashes=metrics_context.create_counter(
+            "worker_crashes_total", "Worker processes that exited abnormally", labels
+        ),
+        restarts=metrics_context.create_counter(
+            "worker_restarts_total", "Worker processes restarted by the supervisor", labels
+        ),
+    )
@@ -1,9 +1,11 @@
 import asyncio
+import os
 
 from service_framework import (
     MetricsConfig,
     ProcessLifecycleContext,
     create_diagnostic_context,
+    create_http_server,
     create_metrics_context,
     start_process_lifecycle,
 )
@@ -19,8 +21,13 @@ async def start(
     metrics_context = create_metrics_context(metrics_config)
 
     from .context import PredictorMetrics
+    from .lib.worker.ring_metrics import create_ring_buffer_metrics
+    from .lib.worker.worker_metrics import create_worker_metrics
 
-    metrics = PredictorMetrics()
+    metrics = PredictorMetrics(
+        ring_buffer=create_ring_buffer_metrics(metrics_context),
+        worker=create_worker_metrics(metrics_context),
+    )
 
     context = PredictorContext(
         env=env_context,
@@ -45,11 +52,35 @@ async def start(
 
     context.diagnostic.logger.info("Service started successfully!")
 
+    from .lib.rocks_db_log import RocksdbLog
+    from .workers.window_workers.window_workers import run_all_window_workers
+
+    http_server = create_http_server(context)
+    server_task = asyncio.create_task(http_server.start_server())
+    storage_base_dir = env_context.STORAGE_BASE_DIR_WINDOWS
+    storage = RocksdbLog(base_dir=storage_base_dir, db_name="windows", writable=True)
+
+    def is_shutting_down() -> bool:
+        # The HTTP server returns on SIGINT/SIGTERM
+        return lifecycle_context.is_shutting_down() or server_task.done()
+
     try:
-        pass
-        # await run_tasks
+        await run_all_window_workers(
+            storage=storage,
+            platform_symbols=env_context.platform_symbols_list,
+            window_sizes_ms=env_context.window_sizes_ms_list,
+            raw_storage_base_dir=env_context.STORAGE_BASE_DIR_RAW,
+            is_shutting_down=is_shutting_down,
+            metrics=metrics.ring_buffer,
+            ring_usage_path=os.path.join(storage_base_dir, "ring_usage.json"),
+            series_costs_path=os.path.join(storage_base_dir, "series_costs.json"),
+            worker_metrics=metrics.worker,
+        )
     except asyncio.CancelledError:
         context.diagnostic.logger.info("Task was cancelled")
+    finally:
+        storage.close()
+        server_task.cancel()
 
     context.diagnostic.logger.info("Service passed out, initiating shutdown!")
     await asyncio.sleep(2)
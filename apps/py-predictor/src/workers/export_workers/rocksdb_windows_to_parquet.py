@@ -4,7 +4,12 @@ import polars as pl
 
 from src.lib import date
 from src.lib.rocks_db_log import RocksdbLog
-from src.workers.window_workers.messages import WindowKeyParts, WindowKind, unpack_window_key
+from src.workers.window_workers.messages import (
+    WindowKeyParts,
+    WindowKind,
+    is_checkpoint_key,
+    unpack_window_key,
+)
 from src.workers.window_workers.order.messages import OrderBookAccumulator, ob_acc_decoder
 from src.workers.window_workers.trade.messages import (
     TradeWindowAggregate,
@@ -75,6 +80,8 @@ def export_to_parquet(db_path: str, out_dir: str, batch_size: int = 500_000):
         rocksdb_batch = it.next_batch()
 
         for key_bytes, value_bytes in rocksdb_batch:
+            if is_checkpoint_key(key_bytes):
+                continue
             i = i + 1
             key = unpack_window_key(key_bytes)
             w_start = (key.window_end_ms // _window_size_ms) * _window_size_ms
@@ -0,0 +1,69 @@
+"""
+Time shards for backfilling the trade windows of one symbol on several cores.
+
+The history from the checkpoint to the end of the raw log is split at boundaries aligned to
+the largest window size, into ranges of about the same number of trades (time index entries
+are a proxy for it). Every shard is a worker owning the windows that start in its range (see
+trade_window_worker.Shard), the last one continues live. Boundary windows are computed by
+the shard they start in from the trades on both sides of the boundary, so the log returns
+and gaps across it come out as if one worker computed them.
+"""
+
+import numpy as np
+
+from src.lib import time_index
+from src.lib.rocks_db_log import RocksdbLog
+
+MIN_SHARD_SPAN_MS = 6 * 60 * 60 * 1000
+"""Shorter backfills are not worth a worker per shard"""
+
+
+def split_history(
+    entry_times: np.ndarray, start_ms: int, end_ms: int, shards: int, alignment_ms: int
+) -> list[int]:
+    """
+    Up to shards - 1 boundaries strictly inside (start_ms, end_ms), ascending, at equal
+    counts of the index entry_times or at equal times if there are too few entries
+    """
+    times = entry_times[(entry_times > start_ms) & (entry_times < end_ms)]
+    if len(times) >= shards:
+        candidates = times[(np.arange(1, shards) * len(times)) // shards]
+    else:
+        candidates = start_ms + (np.arange(1, shards) * (end_ms - start_ms)) // shards
+
+    boundaries = {(int(t) // alignment_ms) * alignment_ms for t in candidates.tolist()}
+    return sorted(b for b in boundaries if start_ms < b < end_ms)
+
+
+def read_first_time(storage: RocksdbLog) -> int | None:
+    iterator = storage.iterate_from(None, 1)
+    try:
+        if iterator.has_next():
+            for _key, value in iterator.next_batch():
+                return time_index.time_record_decoder.decode(value).time
+    finally:
+        iterator.close()
+    return None
+
+
+def find_shard_boundaries(
+    storage: RocksdbLog, checkpoint_ms: int | None, max_shards: int, alignment_ms: int
+) -> list[int]:
+    """
+    Boundaries splitting the backfill of storage after checkpoint_ms into up to max_shards,
+    one per MIN_SHARD_SPAN_MS at most. Empty if it is not worth splitting.
+    """
+    start_ms = checkpoint_ms if checkpoint_ms else read_first_time(storage)
+    if start_ms is None:
+        return []
+
+    index = time_index.load(time_index.get_index_path(storage))
+    time_index.update(index, storage)
+    if len(index.entries) == 0:
+        return []
+    end_ms = int(index.entries["time"][-1])
+
+    shards = min(max_shards, (end_ms - start_ms) // MIN_SHARD_SPAN_MS)
+    if shards <= 1:
+        return []
+    return split_history(index.entries["time"], start_ms, end_ms, shards, alignment_ms)
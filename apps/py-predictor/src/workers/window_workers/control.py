@@ -0,0 +1,49 @@
+"""
+Control API of a running window coordinator (see run_all_window_workers).
+
+Series are (platform, symbol, window_size_ms) and run for both window kinds. Adding series
+spawns new workers for just them, which backfill from storage from their checkpoint while
+the other workers keep streaming. Removing series retires the workers serving them, a
+worker that also served other series is replaced by one for the rest.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+
+
+@dataclass
+class AddSeries:
+    platform: str
+    symbol: str
+    window_sizes_ms: list[int]
+    result: asyncio.Future[list[str]] = field(default_factory=asyncio.Future)
+    """ids of the started workers"""
+
+
+@dataclass
+class RemoveSeries:
+    platform: str
+    symbol: str
+    window_sizes_ms: list[int]
+    result: asyncio.Future[list[str]] = field(default_factory=asyncio.Future)
+    """ids of the retired workers"""
+
+
+ControlCommand = AddSeries | RemoveSeries
+
+
+class WindowWorkersControl:
+    def __init__(self):
+        self.commands: asyncio.Queue[ControlCommand] = asyncio.Queue()
+
+    async def add_series(self, platform: str, symbol: str, window_sizes_ms: list[int]) -> list[str]:
+        command = AddSeries(platform, symbol, window_sizes_ms)
+        await self.commands.put(command)
+        return await command.result
+
+    async def remove_series(
+        self, platform: str, symbol: str, window_sizes_ms: list[int]
+    ) -> list[str]:
+        command = RemoveSeries(platform, symbol, window_sizes_ms)
+        await self.commands.put(command)
+        return await command.result
@@ -65,3 +65,21 @@ def unpack_window_key(key_bytes: bytes) -> WindowKeyParts:
         window_size_ms=winms,
         platform=Platform(plat),
     )
+
+
+CHECKPOINT_KEY_PREFIX = bytes(8)
+"""
+Checkpoint rows are window keys with window_end_ms=0, they sort before every window and
+hold the latest window_end_ms of their series as CHECKPOINT_VALUE_FMT (0 for a series
+that had no windows when it was scanned for).
+"""
+CHECKPOINT_VALUE_FMT = struct.Struct(">Q")
+
+
+def pack_checkpoint_key(series_key_bytes: bytes) -> bytes:
+    """series_key_bytes is a window key without its leading window_end_ms"""
+    return CHECKPOINT_KEY_PREFIX + series_key_bytes
+
+
+def is_checkpoint_key(key_bytes: bytes) -> bool:
+    return key_bytes[:8] == CHECKPOINT_KEY_PREFIX
@@ -65,4 +65,8 @@ class OrderBookAccumulator(msgspec.Struct):
 
 
 ob_acc_encoder = msgspec.msgpack.Encoder()
+"""
+Accumulators cross the worker ring in their stored format, the coordinator writes them to
+the windows DB (read by the exporters) as they are
+"""
 ob_acc_decoder = msgspec.msgpack.Decoder(type=OrderBookAccumulator)
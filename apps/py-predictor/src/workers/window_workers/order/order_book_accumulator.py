@@ -1,36 +1,37 @@
+import msgspec
+
 from src.workers.window_workers.order.messages import OrderBookAccumulator
 
 from .order_book_manager import OrderBookManager
 
 
-def ob_acc_update_tick(
-    acc: "OrderBookAccumulator",
-    mgr: "OrderBookManager",
-    t_prev_ms: int,
-    t_curr_ms: int,
-    *,
-    prev_mid: float | None,
-    prev_spread: float | None,
-    time_weighted: bool = True,
-) -> tuple[float | None, float | None]:
+class BookTick(msgspec.Struct, frozen=True):
     """
-    Update OrderBookAccumulator using the live data in OrderBookManager for one tick.
-    Returns (mid, spread) of the *current* tick for chaining into the next call.
+    Instantaneous stats of a book after one record, computed once and shared by the
+    accumulators of every window size
     """
-    # ---- weight (dt or 1) ----
-    w = max(0, t_curr_ms - t_prev_ms)
-    if not time_weighted or w == 0:
-        w = 1.0
 
-    # ---- pull instantaneous book stats ----
-    bb = mgr.bids.best()
-    ba = mgr.asks.best()
+    bb: float | None
+    bq0: float
+    """best bid and its size (0 if the side is empty)"""
+    ba: float | None
+    aq0: float
+    mid: float | None
+    spread: float | None
+    """only set if the inside market is sane (ba >= bb)"""
+    micro: float | None
+    tot_b: float | None
+    tot_a: float | None
+    """total depth per side, None if empty"""
+
+
+def book_tick(mgr: "OrderBookManager") -> BookTick:
+    best_bid = mgr.bids.best_level()
+    best_ask = mgr.asks.best_level()
 
     # best-level sizes (0 if side empty)
-    bq0 = float(mgr.bids.get(bb)) if bb else 0.0  # type: ignore
-    aq0 = float(mgr.asks.get(ba)) if ba else 0.0  # type: ignore
-    bb = float(bb) if bb else None
-    ba = float(ba) if ba else None
+    bb, bq0 = best_bid if best_bid else (None, 0.0)
+    ba, aq0 = best_ask if best_ask else (None, 0.0)
 
     # mid / spread (only valid if inside market is sane)
     mid = spread = None
@@ -44,6 +45,43 @@ def ob_acc_update_tick(
     if ba is not None and bb is not None and mid is not None and denom_best > 0.0:
         micro = (ba * bq0 + bb * aq0) / denom_best  # ba weighted by bid size; bb by ask size
 
+    tot_a = mgr.asks.total_volume()
+    tot_b = mgr.bids.total_volume()
+
+    return BookTick(
+        bb=bb,
+        bq0=bq0,
+        ba=ba,
+        aq0=aq0,
+        mid=mid,
+        spread=spread,
+        micro=micro,
+        tot_b=tot_b if tot_b else None,
+        tot_a=tot_a if tot_a else None,
+    )
+
+
+def ob_acc_update_tick(
+    acc: "OrderBookAccumulator",
+    tick: BookTick,
+    t_prev_ms: int,
+    t_curr_ms: int,
+    *,
+    prev_mid: float | None,
+    prev_spread: float | None,
+    time_weighted: bool = True,
+) -> tuple[float | None, float | None]:
+    """
+    Update OrderBookAccumulator with the book stats of one tick (see book_tick).
+    Returns (mid, spread) of the *current* tick for chaining into the next call.
+    """
+    # ---- weight (dt or 1) ----
+    w = max(0, t_curr_ms - t_prev_ms)
+    if not time_weighted or w == 0:
+        w = 1.0
+
+    mid, spread, micro = tick.mid, tick.spread, tick.micro
+
     # ---- accumulate mergeable stats ----
     acc.sw += w
     if mid is not None:
@@ -58,11 +96,7 @@ def ob_acc_update_tick(
             acc.spread_max = spread
 
     # imbalance using *total* depth
-    tot_a = mgr.asks.total_volume()
-    tot_b = mgr.bids.total_volume()
-    tot_a = float(tot_a) if tot_a else None
-    tot_b = float(tot_b) if tot_b else None
-
+    tot_a, tot_b = tick.tot_a, tick.tot_b
     if tot_a is not None and tot_b is not None:
         imb = None
         denom_tot = tot_b + tot_a
@@ -74,8 +108,8 @@ def ob_acc_update_tick(
             acc.sw_imb += w * imb
 
     # best-level size TWAPs (useful microstructure signal)
-    acc.sw_bid_best_sz += w * bq0
-    acc.sw_ask_best_sz += w * aq0
+    acc.sw_bid_best_sz += w * tick.bq0
+    acc.sw_ask_best_sz += w * tick.aq0
 
     # weighted variance of mid (mergeable Welford)
     if mid is not None:
@@ -112,25 +146,19 @@ def ob_acc_update_tick(
 
 def ob_acc_close(
     acc: "OrderBookAccumulator",
-    mgr: "OrderBookManager",
+    tick: BookTick,
     *,
     last_mid: float | None = None,
     last_spread: float | None = None,
 ) -> None:
     """
-    Populate close_* fields on the accumulator using the current OrderBookManager state.
+    Populate close_* fields on the accumulator using the current book stats (see book_tick).
     - Uses last_mid/last_spread if provided (from your last obacc_update_tick call).
     - Otherwise derives mid/spread from best bid/ask if the book is sane (ba >= bb).
     """
-    # Best prices
-    bb_d = mgr.bids.best()
-    ba_d = mgr.asks.best()
-    acc.close_bb = float(bb_d) if bb_d is not None else None
-    acc.close_ba = float(ba_d) if ba_d is not None else None
-
-    # Best sizes (0.0 if side empty)
-    acc.close_bq0 = float(mgr.bids.get(bb_d)) if bb_d is not None else 0.0  # type: ignore[arg-type]
-    acc.close_aq0 = float(mgr.asks.get(ba_d)) if ba_d is not None else 0.0  # type: ignore[arg-type]
+    # Best prices and sizes (0.0 if side empty)
+    acc.close_bb, acc.close_bq0 = tick.bb, tick.bq0
+    acc.close_ba, acc.close_aq0 = tick.ba, tick.aq0
 
     # Mid / spread (prefer the last tick's values if available)
     close_mid = last_mid
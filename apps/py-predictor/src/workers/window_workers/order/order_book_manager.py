@@ -1,39 +1,47 @@
 from __future__ import annotations
 
+import math
 from bisect import bisect_left, insort
-from collections.abc import Iterable
+from collections.abc import Sequence
 from decimal import Decimal
 
+from src.lib.fixed_point import DEFAULT_SCALE, Scale, parse_levels
+
 from .messages import OrderBook
 
 
 class _SideBook:
     """
     Sorted (ascending) by price with O(1) best(), and O(1) totals via rolling aggregates.
+
+    Prices and volumes are integer ticks of the book's Scale (see src.lib.fixed_point), so
+    the rolling totals stay exact like Decimal without its cost.
     """
 
-    __slots__ = ("prices", "volumes", "side", "total_qty", "total_notional")
+    __slots__ = ("prices", "volumes", "side", "scale", "total_qty", "total_notional")
 
-    def __init__(self, side: str):
+    def __init__(self, side: str, scale: Scale = DEFAULT_SCALE):
         assert side in ("bid", "ask")
-        self.prices: list[Decimal] = []
-        self.volumes: dict[Decimal, Decimal] = {}
+        self.prices: list[int] = []
+        self.volumes: dict[int, int] = {}
         self.side = side
-        self.total_qty: Decimal = Decimal(0)
-        self.total_notional: Decimal = Decimal(0)
+        self.scale = scale
+        self.total_qty: int = 0
+        self.total_notional: int = 0
+        """Σ price ticks * volume ticks"""
 
     # --- internals ---
-    def _add_level(self, price: Decimal, vol: Decimal) -> None:
+    def _add_level(self, price: int, vol: int) -> None:
         """Adjust aggregates when adding a *new* level (price not present before)."""
         self.total_qty += vol
         self.total_notional += price * vol
 
-    def _remove_level(self, price: Decimal, vol: Decimal) -> None:
+    def _remove_level(self, price: int, vol: int) -> None:
         """Adjust aggregates when removing an existing level."""
         self.total_qty -= vol
         self.total_notional -= price * vol
 
-    def _update_level(self, price: Decimal, old: Decimal, new: Decimal) -> None:
+    def _update_level(self, price: int, old: int, new: int) -> None:
         """Adjust aggregates when volume at an existing price changes."""
         delta = new - old
         if delta:
@@ -44,30 +52,53 @@ class _SideBook:
     def clear(self) -> None:
         self.prices.clear()
         self.volumes.clear()
-        self.total_qty = Decimal(0)
-        self.total_notional = Decimal(0)
+        self.total_qty = 0
+        self.total_notional = 0
 
-    def set_snapshot(self, levels: Iterable[tuple[str | Decimal, str | Decimal]]) -> None:
+    def set_snapshot(self, levels: Sequence[tuple[str, str]]) -> None:
         """Replace with snapshot levels (price, volume)."""
         self.clear()
-        tmp = []
-        for p, v in levels:
-            price = p if isinstance(p, Decimal) else Decimal(p)
-            vol = v if isinstance(v, Decimal) else Decimal(v)
-            if vol != 0:
-                tmp.append((price, vol))
-        tmp.sort(key=lambda x: x[0])
+        prices, vols = parse_levels(levels, self.scale)
+        tmp = sorted((p, v) for p, v in zip(prices, vols, strict=True) if v != 0)
         self.prices = [p for p, _ in tmp]
         self.volumes = {p: v for p, v in tmp}
         # compute aggregates once
-        self.total_qty = sum((v for _, v in tmp), Decimal(0))
-        self.total_notional = sum((p * v for p, v in tmp), Decimal(0))
-
-    def apply_level(self, p: str | Decimal, v: str | Decimal) -> None:
-        """Insert/update/remove a single level."""
-        price = p if isinstance(p, Decimal) else Decimal(p)
-        vol = v if isinstance(v, Decimal) else Decimal(v)
+        self.total_qty = sum(v for _, v in tmp)
+        self.total_notional = sum(p * v for p, v in tmp)
 
+    def apply_levels(self, levels: Sequence[tuple[str, str]]) -> None:
+        """
+        Insert/update/remove levels (price, volume), parsed in one pass. Same as
+        apply_ticks for each, inlined with the aggregates summed once per update.
+        """
+        prices, vols = parse_levels(levels, self.scale)
+        book, volumes = self.prices, self.volumes
+        qty_delta = notional_delta = 0
+        for price, vol in zip(prices, vols, strict=True):
+            existing = volumes.get(price)
+            if vol == 0:
+                if existing is not None:
+                    del volumes[price]
+                    del book[bisect_left(book, price)]
+                    qty_delta -= existing
+                    notional_delta -= price * existing
+            elif existing is not None:
+                volumes[price] = vol
+                qty_delta += vol - existing
+                notional_delta += price * (vol - existing)
+            else:
+                volumes[price] = vol
+                if not book or price > book[-1]:
+                    book.append(price)
+                else:
+                    insort(book, price)
+                qty_delta += vol
+                notional_delta += price * vol
+        self.total_qty += qty_delta
+        self.total_notional += notional_delta
+
+    def apply_ticks(self, price: int, vol: int) -> None:
+        """Insert/update/remove a single level given in ticks."""
         existing = self.volumes.get(price)
 
         if vol == 0:
@@ -101,49 +132,471 @@ class _SideBook:
 
     def enforce_depth(self, depth: int) -> None:
         """Trim worst prices if we exceed the allowed depth."""
-        while len(self.prices) > depth:
-            if self.side == "bid":
-                worst_price = self.prices[0]
-                self.prices.pop(0)
-            else:
-                worst_price = self.prices[-1]
-                self.prices.pop()
+        excess = len(self.prices) - depth
+        if excess <= 0:
+            return
+        # One slice delete, popping the lowest bids one by one moves the list every time
+        if self.side == "bid":
+            trimmed = self.prices[:excess]
+            del self.prices[:excess]
+        else:
+            trimmed = self.prices[depth:]
+            del self.prices[depth:]
+        for worst_price in trimmed:
             vol = self.volumes.pop(worst_price, None)
             if vol is not None:
                 self._remove_level(worst_price, vol)
 
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def best(self) -> int | None:
+        """Best price in ticks"""
+        if not self.prices:
+            return None
+        return self.prices[-1] if self.side == "bid" else self.prices[0]
+
+    def best_level(self) -> tuple[float, float] | None:
+        """(price, volume) of the best level"""
+        price = self.best()
+        if price is None:
+            return None
+        return (price / self.scale.price_scale, self.volumes[price] / self.scale.quantity_scale)
+
+    def get(self, price: int) -> int | None:
+        return self.volumes.get(price)
+
+    def as_sorted_levels(self, reverse: bool = False) -> list[tuple[float, float]]:
+        price_scale, quantity_scale = self.scale.price_scale, self.scale.quantity_scale
+        prices = reversed(self.prices) if reverse else self.prices
+        return [(p / price_scale, self.volumes[p] / quantity_scale) for p in prices]
+
+    # --- O(1) aggregates ---
+    def total_volume(self) -> float:
+        return self.total_qty / self.scale.quantity_scale
+
+    def total_notional_value(self) -> float:
+        return self.total_notional / (self.scale.price_scale * self.scale.quantity_scale)
+
+    def vwap(self) -> float | None:
+        if not self.total_qty:
+            return None
+        return self.total_notional / (self.total_qty * self.scale.price_scale)
+
+
+class _DecimalSideBook:
+    """
+    _SideBook on Decimal prices and volumes, the engine before integer ticks. Exact at any
+    precision without a Scale, but several times slower per update (see
+    test/benchmark_order_book.py). best() and get() take and return Decimal, the accessors
+    shared with the other engines return floats.
+    """
+
+    __slots__ = ("prices", "volumes", "side", "total_qty", "total_notional")
+
+    def __init__(self, side: str, scale: Scale = DEFAULT_SCALE):
+        assert side in ("bid", "ask")
+        self.prices: list[Decimal] = []
+        self.volumes: dict[Decimal, Decimal] = {}
+        self.side = side
+        self.total_qty: Decimal = Decimal(0)
+        self.total_notional: Decimal = Decimal(0)
+
+    # --- API ---
+    def clear(self) -> None:
+        self.prices.clear()
+        self.volumes.clear()
+        self.total_qty = Decimal(0)
+        self.total_notional = Decimal(0)
+
+    def set_snapshot(self, levels: Sequence[tuple[str, str]]) -> None:
+        """Replace with snapshot levels (price, volume)."""
+        self.clear()
+        tmp = []
+        for p, v in levels:
+            vol = Decimal(v)
+            if vol != 0:
+                tmp.append((Decimal(p), vol))
+        tmp.sort(key=lambda x: x[0])
+        self.prices = [p for p, _ in tmp]
+        self.volumes = {p: v for p, v in tmp}
+        # compute aggregates once
+        self.total_qty = sum((v for _, v in tmp), Decimal(0))
+        self.total_notional = sum((p * v for p, v in tmp), Decimal(0))
+
+    def apply_levels(self, levels: Sequence[tuple[str, str]]) -> None:
+        """Insert/update/remove levels (price, volume)."""
+        for p, v in levels:
+            self.apply_level(p, v)
+
+    def apply_level(self, p: str | Decimal, v: str | Decimal) -> None:
+        """Insert/update/remove a single level."""
+        price = p if isinstance(p, Decimal) else Decimal(p)
+        vol = v if isinstance(v, Decimal) else Decimal(v)
+
+        existing = self.volumes.get(price)
+
+        if vol == 0:
+            if existing is not None:
+                del self.volumes[price]
+                del self.prices[bisect_left(self.prices, price)]
+                self.total_qty -= existing
+                self.total_notional -= price * existing
+            return
+
+        self.volumes[price] = vol
+        if existing is not None:
+            self.total_qty += vol - existing
+            self.total_notional += price * (vol - existing)
+            return
+
+        if not self.prices or price > self.prices[-1]:
+            self.prices.append(price)
+        else:
+            insort(self.prices, price)
+        self.total_qty += vol
+        self.total_notional += price * vol
+
+    def enforce_depth(self, depth: int) -> None:
+        """Trim worst prices if we exceed the allowed depth."""
+        excess = len(self.prices) - depth
+        if excess <= 0:
+            return
+        if self.side == "bid":
+            trimmed = self.prices[:excess]
+            del self.prices[:excess]
+        else:
+            trimmed = self.prices[depth:]
+            del self.prices[depth:]
+        for worst_price in trimmed:
+            vol = self.volumes.pop(worst_price)
+            self.total_qty -= vol
+            self.total_notional -= worst_price * vol
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
     def best(self) -> Decimal | None:
         if not self.prices:
             return None
         return self.prices[-1] if self.side == "bid" else self.prices[0]
 
+    def best_level(self) -> tuple[float, float] | None:
+        """(price, volume) of the best level"""
+        price = self.best()
+        if price is None:
+            return None
+        return (float(price), float(self.volumes[price]))
+
     def get(self, price: Decimal) -> Decimal | None:
         return self.volumes.get(price)
 
-    def as_sorted_levels(self, reverse: bool = False):
+    def as_sorted_levels(self, reverse: bool = False) -> list[tuple[float, float]]:
+        prices = reversed(self.prices) if reverse else self.prices
+        return [(float(p), float(self.volumes[p])) for p in prices]
+
+    # --- O(1) aggregates ---
+    def total_volume(self) -> float:
+        return float(self.total_qty)
+
+    def total_notional_value(self) -> float:
+        return float(self.total_notional)
+
+    def vwap(self) -> float | None:
+        return float(self.total_notional / self.total_qty) if self.total_qty else None
+
+
+LADDER_MIN_SLOTS = 1024
+LADDER_MAX_SLOTS = 2**20
+"""Price steps a ladder spans at most, levels further from the best are not kept"""
+
+
+class _LadderSideBook:
+    """
+    _SideBook on a price ladder: a circular array with the volume ticks of every price step
+    (the gcd of the prices seen) between the lowest and highest level, a level's slot is
+    (price // step) & mask. Setting or clearing a level is O(1) without moving others, the
+    lowest and highest levels are tracked incrementally and only walk over empty slots when
+    cleared, so trimming to depth is O(1) amortized. The array doubles once the levels span
+    more slots than it has. Suits books updated near the touch, as_sorted_levels walks the
+    whole span.
+    """
+
+    __slots__ = (
+        "side",
+        "scale",
+        "step",
+        "slots",
+        "mask",
+        "lo",
+        "hi",
+        "count",
+        "total_qty",
+        "total_notional",
+    )
+
+    def __init__(self, side: str, scale: Scale = DEFAULT_SCALE):
+        assert side in ("bid", "ask")
+        self.side = side
+        self.scale = scale
+        self.step = 0
+        """price ticks per slot, 0 before the first level"""
+        self.slots: list[int] = [0] * LADDER_MIN_SLOTS
+        self.mask = LADDER_MIN_SLOTS - 1
+        self.lo = 0
+        self.hi = 0
+        """lowest and highest level (price // step) while count > 0"""
+        self.count = 0
+        self.total_qty: int = 0
+        self.total_notional: int = 0
+        """Σ price ticks * volume ticks"""
+
+    # --- internals ---
+    def _walk(self, level: int, direction: int) -> int:
+        """Nearest level holding volume from level (exclusive) in direction"""
+        slots, mask = self.slots, self.mask
+        level += direction
+        while slots[level & mask] == 0:
+            level += direction
+        return level
+
+    def _live_levels(self) -> list[tuple[int, int]]:
+        """(price, volume) ascending"""
+        if self.count == 0:
+            return []
+        slots, mask, step = self.slots, self.mask, self.step
+        return [
+            (level * step, slots[level & mask])
+            for level in range(self.lo, self.hi + 1)
+            if slots[level & mask]
+        ]
+
+    def _rebuild(self, step: int, span: int) -> None:
+        """Re-slot the levels for another step or a span beyond the array"""
+        levels = self._live_levels()
+        size = LADDER_MIN_SLOTS
+        while size < span:
+            size *= 2
+        self.slots = [0] * size
+        self.mask = size - 1
+        self.step = step
+        mask = self.mask
+        for price, vol in levels:
+            self.slots[(price // step) & mask] = vol
+        if levels:
+            self.lo = levels[0][0] // step
+            self.hi = levels[-1][0] // step
+
+    def _clear_worst(self) -> None:
+        level = self.lo if self.side == "bid" else self.hi
+        slot = level & self.mask
+        vol = self.slots[slot]
+        self.slots[slot] = 0
+        self.total_qty -= vol
+        self.total_notional -= level * self.step * vol
+        self.count -= 1
+        if self.count == 0:
+            return
+        if self.side == "bid":
+            self.lo = self._walk(level, 1)
+        else:
+            self.hi = self._walk(level, -1)
+
+    def _make_room(self, price: int) -> bool:
+        """
+        Fit price on the ladder, re-slotting or growing it. False for a level too far
+        beyond the worst one, or off the grid and too many of the finer steps from the best
+        one, to keep.
+        """
+        if self.step == 0 or price % self.step:
+            step = math.gcd(self.step, price)
+            span = 0
+            if self.count:
+                # A finer step multiplies the span, check it before re-slotting
+                ratio = self.step // step
+                level = price // step
+                if self.side == "bid":
+                    best = max(self.hi * ratio, level)
+                else:
+                    best = min(self.lo * ratio, level)
+                if abs(level - best) >= LADDER_MAX_SLOTS:
+                    return False
+                while (
+                    self.count
+                    and max(self.hi * ratio, level) - min(self.lo * ratio, level)
+                    >= LADDER_MAX_SLOTS
+                ):
+                    self._clear_worst()
+                if self.count:
+                    span = (self.hi - self.lo) * ratio + 1
+            self._rebuild(step, span)
+
+        level = price // self.step
+        if self.count == 0:
+            return True
+        span = max(self.hi, level) - min(self.lo, level) + 1
+        if span > LADDER_MAX_SLOTS:
+            is_worse = level < self.lo if self.side == "bid" else level > self.hi
+            if is_worse:
+                return False
+            while self.count and max(self.hi, level) - min(self.lo, level) >= LADDER_MAX_SLOTS:
+                self._clear_worst()
+            if self.count == 0:
+                return True
+            span = max(self.hi, level) - min(self.lo, level) + 1
+        if span > len(self.slots):
+            self._rebuild(self.step, span)
+        return True
+
+    # --- API ---
+    def clear(self) -> None:
+        """Empty, keeping the step and array for the next snapshot"""
+        if self.count:
+            for level in range(self.lo, self.hi + 1):
+                self.slots[level & self.mask] = 0
+        self.count = 0
+        self.total_qty = 0
+        self.total_notional = 0
+
+    def set_snapshot(self, levels: Sequence[tuple[str, str]]) -> None:
+        self.clear()
+        prices, vols = parse_levels(levels, self.scale)
+        step = math.gcd(self.step, *prices)
+        if step != self.step:
+            self._rebuild(step, 0)
+        for price, vol in zip(prices, vols, strict=True):
+            self.apply_ticks(price, vol)
+
+    def apply_levels(self, levels: Sequence[tuple[str, str]]) -> None:
+        """Insert/update/remove levels (price, volume), parsed in one pass."""
+        prices, vols = parse_levels(levels, self.scale)
+        for price, vol in zip(prices, vols, strict=True):
+            self.apply_ticks(price, vol)
+
+    def apply_ticks(self, price: int, vol: int) -> None:
+        """Insert/update/remove a single level given in ticks."""
+        step = self.step
+        if step and not price % step:
+            level = price // step
+            count, lo, hi, mask = self.count, self.lo, self.hi, self.mask
+            if count and hi - mask <= level <= lo + mask:
+                # Within the array, the common case
+                slots = self.slots
+                slot = level & mask
+                existing = slots[slot]
+                if vol == existing:
+                    return
+                slots[slot] = vol
+                delta = vol - existing
+                self.total_qty += delta
+                self.total_notional += price * delta
+                if existing == 0:
+                    self.count = count + 1
+                    if level < lo:
+                        self.lo = level
+                    elif level > hi:
+                        self.hi = level
+                elif vol == 0:
+                    self.count = count - 1
+                    if count == 1:
+                        return
+                    if level == lo:
+                        self.lo = self._walk(level, 1)
+                    elif level == hi:
+                        self.hi = self._walk(level, -1)
+                return
+        if vol == 0:
+            return  # Off the ladder or outside the span of the levels, so not present
+
+        if not self._make_room(price):
+            return
+        level = price // self.step
+        self.slots[level & self.mask] = vol
+        self.total_qty += vol
+        self.total_notional += price * vol
+        if self.count == 0:
+            self.lo = self.hi = level
+        else:
+            self.lo = min(self.lo, level)
+            self.hi = max(self.hi, level)
+        self.count += 1
+
+    def enforce_depth(self, depth: int) -> None:
+        """Trim worst prices if we exceed the allowed depth."""
+        while self.count > depth:
+            self._clear_worst()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def best(self) -> int | None:
+        """Best price in ticks"""
+        if self.count == 0:
+            return None
+        return (self.hi if self.side == "bid" else self.lo) * self.step
+
+    def best_level(self) -> tuple[float, float] | None:
+        """(price, volume) of the best level"""
+        if self.count == 0:
+            return None
+        level = self.hi if self.side == "bid" else self.lo
+        return (
+            level * self.step / self.scale.price_scale,
+            self.slots[level & self.mask] / self.scale.quantity_scale,
+        )
+
+    def get(self, price: int) -> int | None:
+        if self.count == 0 or price % self.step:
+            return None
+        level = price // self.step
+        if not self.lo <= level <= self.hi:
+            return None
+        return self.slots[level & self.mask] or None
+
+    def as_sorted_levels(self, reverse: bool = False) -> list[tuple[float, float]]:
+        price_scale, quantity_scale = self.scale.price_scale, self.scale.quantity_scale
+        levels = self._live_levels()
         if reverse:
-            return [(p, self.volumes[p]) for p in reversed(self.prices)]
-        return [(p, self.volumes[p]) for p in self.prices]
+            levels.reverse()
+        return [(p / price_scale, v / quantity_scale) for p, v in levels]
 
     # --- O(1) aggregates ---
-    def total_volume(self) -> Decimal:
-        return self.total_qty
+    def total_volume(self) -> float:
+        return self.total_qty / self.scale.quantity_scale
+
+    def total_notional_value(self) -> float:
+        return self.total_notional / (self.scale.price_scale * self.scale.quantity_scale)
+
+    def vwap(self) -> float | None:
+        if not self.total_qty:
+            return None
+        return self.total_notional / (self.total_qty * self.scale.price_scale)
 
-    def total_notional_value(self) -> Decimal:
-        return self.total_notional
 
-    def vwap(self) -> Decimal | None:
-        return (self.total_notional / self.total_qty) if self.total_qty else None
+SideBook = _SideBook | _LadderSideBook | _DecimalSideBook
 
 
 class OrderBookManager:
-    """Maintains the live order book state based on snapshots and updates, efficiently."""
+    """
+    Maintains the live order book state based on snapshots and updates, efficiently.
+
+    Prices and volumes are kept as integer ticks of scale by default (see _SideBook).
+    Whatever the engine, levels(), best_level() and the totals of a side are floats. A
+    quantity below one tick is kept as one tick, only a zero quantity removes a level.
+
+    ladder
+        keep both sides on a price ladder (see _LadderSideBook) instead of sorted lists
+    decimal
+        keep both sides in Decimal (see _DecimalSideBook), for precisions beyond a Scale
+    """
 
     __slots__ = ("bids", "asks", "has_snapshot", "bid_depth", "ask_depth", "last_timestamp")
 
-    def __init__(self):
-        self.bids = _SideBook("bid")
-        self.asks = _SideBook("ask")
+    def __init__(self, scale: Scale = DEFAULT_SCALE, ladder: bool = False, decimal: bool = False):
+        assert not (ladder and decimal)
+        side_book = _LadderSideBook if ladder else _DecimalSideBook if decimal else _SideBook
+        self.bids: SideBook = side_book("bid", scale)
+        self.asks: SideBook = side_book("ask", scale)
         self.has_snapshot = False
         self.bid_depth: int = 0  # snapshot depth per side
         self.ask_depth: int = 0
@@ -164,8 +617,8 @@ class OrderBookManager:
         self.asks.set_snapshot(record.asks)
         self.has_snapshot = True
         self.last_timestamp = record.time
-        self.bid_depth = len(self.bids.prices)
-        self.ask_depth = len(self.asks.prices)
+        self.bid_depth = len(self.bids)
+        self.ask_depth = len(self.asks)
 
     def _apply_update(self, record: OrderBook):
         """Apply incremental updates."""
@@ -175,10 +628,8 @@ class OrderBookManager:
         self.last_timestamp = record.time
 
         # Apply bid/ask deltas
-        for p, v in record.bids:
-            self.bids.apply_level(p, v)
-        for p, v in record.asks:
-            self.asks.apply_level(p, v)
+        self.bids.apply_levels(record.bids)
+        self.asks.apply_levels(record.asks)
 
         # Enforce snapshot depth per side
         if self.bid_depth:
@@ -209,6 +660,6 @@ class OrderBookManager:
 
     # --- Accessors ---
 
-    def levels(self, side: str, reverse: bool = False) -> list[tuple[Decimal, Decimal]]:
+    def levels(self, side: str, reverse: bool = False) -> list[tuple[float, float]]:
         sb = self.bids if side == "bid" else self.asks
         return sb.as_sorted_levels(reverse=reverse)
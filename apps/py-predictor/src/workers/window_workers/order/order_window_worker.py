@@ -1,42 +1,66 @@
 import asyncio
-import time
-from collections.abc import Callable
-from dataclasses import dataclass
-from multiprocessing import Process
-from multiprocessing.shared_memory import SharedMemory
+import os
+from collections.abc import Awaitable, Callable
+from multiprocessing.connection import Connection
 from multiprocessing.synchronize import Event as EventType
 
 import zmq.asyncio
 
+from src.lib import time_index
+from src.lib.fixed_point import DEFAULT_SCALE, Scale
 from src.lib.rocks_db_log import RocksdbLog
 from src.lib.worker import ring_buffer
+from src.lib.worker.ring_writer import RingWriter
 from src.lib.zeromq_subscriber import consume_order_books_consistently
 
 from ..messages import Platform, WindowKeyParts, WindowKind, pack_window_key
 from .messages import OrderBook, OrderBookAccumulator, ob_acc_encoder, order_decoder
-from .order_book_accumulator import OrderBookManager, ob_acc_close, ob_acc_reset, ob_acc_update_tick
+from .order_book_accumulator import (
+    BookTick,
+    book_tick,
+    ob_acc_close,
+    ob_acc_reset,
+    ob_acc_update_tick,
+)
+from .order_book_manager import OrderBookManager
 
 EmitWindow = Callable[[str, int, tuple[int, bytes] | None], None]
+FlushWindows = Callable[[], Awaitable[None]]
 IsStopped = Callable[[], bool]
 
+WRITE_BATCH_SIZE = 256
+"""Windows collected before they are published to the ring buffer in one write_many"""
+
 
 def run(
     shm_data_name: str,
     shm_index_name: str,
+    not_empty_sender: Connection,
+    not_full_receiver: Connection,
     rocksdb_path: str,
     platform_str: str,
     symbols: list[str],
     window_sizes_ms: list[int],
     checkpoint_ms: dict[str, int | None],
     shutdown_event: EventType | None = None,
+    symbol_scales: dict[str, Scale] | None = None,
+    ladder_symbols: list[str] | None = None,
 ):
-    shm_data, shm_index, size, mask = ring_buffer.init(
+    """
+    symbol_scales
+        fixed-point scale of the order book prices and quantities per symbol, DEFAULT_SCALE
+        for the others
+    ladder_symbols
+        symbols whose books are kept on a price ladder, for deep books updated near the touch
+    """
+    shm_data, shm_index, size, mask = ring_buffer.attach(
         shm_data_name=shm_data_name, shm_index_name=shm_index_name
     )
     data_buf = shm_data.buf
     index_buf = shm_index.buf
     if data_buf is None or index_buf is None:
         raise RuntimeError("Shared buffer does not exist")
+    ring_buffer.set_producer_pid(index_buf, os.getpid())
 
     platform = Platform[platform_str]
 
@@ -45,20 +69,39 @@ def run(
     worker_id = f"{platform_str}-order-{symbols_str}-{window_sizes_str}"
 
     storages: dict[str, RocksdbLog] = {}
-    window_handlers: dict[str, list[WindowHandler]] = {}
+    book_windows: dict[str, OrderBookWindows] = {}
 
     for symbol in symbols:
         storage = RocksdbLog(base_dir=rocksdb_path, db_name=symbol, writable=False)
         storage.init()
         storages[symbol] = storage
-        window_handlers[symbol] = [
-            WindowHandler(window_size_ms=window_size_ms) for window_size_ms in window_sizes_ms
-        ]
+        book_windows[symbol] = OrderBookWindows(
+            window_sizes_ms=window_sizes_ms,
+            scale=(symbol_scales or {}).get(symbol, DEFAULT_SCALE),
+            ladder=symbol in (ladder_symbols or []),
+        )
 
     def is_stopped() -> bool:
+        # The stop flag reaches workers re-attached by a restarted coordinator
+        if ring_buffer.is_stop_requested(index_buf):
+            return True
         return shutdown_event is not None and shutdown_event.is_set()
 
     count = 0
+    live = False
+    writer = RingWriter(
+        data_buf=data_buf,
+        index_buf=index_buf,
+        mask=mask,
+        not_empty_sender=not_empty_sender,
+        not_full_receiver=not_full_receiver,
+    )
+
+    async def flush_windows():
+        # Keep reading the sockets while the ring is full, only wait once the spill is full
+        writer.try_flush()
+        if writer.is_over_limit():
+            await writer.make_room(is_stopped)
 
     def emit_window(symbol: str, window_size_ms: int, win: tuple[int, bytes] | None):
         nonlocal count
@@ -66,39 +109,42 @@ def run(
             return
 
         count = count + 1
-        written = False
-
-        while not written and not is_stopped():
-            written = ring_buffer.write(
-                data_buf=data_buf,
-                index_buf=index_buf,
-                mask=mask,
-                key=pack_window_key(
-                    WindowKeyParts(
-                        window_end_ms=win[0],
-                        symbol=symbol,
-                        kind=WindowKind.order,
-                        window_size_ms=window_size_ms,
-                        platform=platform,
-                    )
-                ),
-                value=win[1],
-            )
-            if written is False:
-                time.sleep(0.01)
+        writer.append(
+            pack_window_key(
+                WindowKeyParts(
+                    window_end_ms=win[0],
+                    symbol=symbol,
+                    kind=WindowKind.order,
+                    window_size_ms=window_size_ms,
+                    platform=platform,
+                )
+            ),
+            win[1],
+        )
+
+        if len(writer) >= WRITE_BATCH_SIZE:
+            writer.try_flush()
+        if not live and writer.is_over_limit():
+            # Catch-up from storage has nothing else to do, wait for the coordinator
+            writer.flush(is_stopped)
 
         if count % 10000 == 0:
             print(f"[worker {worker_id}] write window {count}")
 
     async def run_all_from_socket():
+        nonlocal live
+        live = True
         zmq_context = zmq.asyncio.Context()
         tasks = [
+            writer.run_flusher(is_stopped),
+        ] + [
             run_from_socket(
                 platform=platform_str,
                 symbol=symbol,
                 storage=storages[symbol],
-                window_handlers=window_handlers[symbol],
+                book_windows=book_windows[symbol],
                 emit_window=lambda s, ws, win, sym=symbol: emit_window(sym, ws, win),
+                flush_windows=flush_windows,
                 is_stopped=is_stopped,
                 checkpoint_ms=checkpoint_ms.get(symbol),
                 worker_id=worker_id,
@@ -117,14 +163,15 @@ def run(
                 break
             run_from_storage(
                 storage=storages[symbol],
-                window_handlers=window_handlers[symbol],
+                book_windows=book_windows[symbol],
                 emit_window=lambda ws, win, s=symbol: emit_window(s, ws, win),
                 checkpoint_ms=checkpoint_ms.get(symbol),
                 is_stopped=is_stopped,
                 worker_id=worker_id,
             )
-            for handler in window_handlers[symbol]:
-                emit_window(symbol, handler.win_ms, handler.flush())
+            for window_size_ms, win in book_windows[symbol].flush():
+                emit_window(symbol, window_size_ms, win)
+            writer.flush(is_stopped)
 
         if not is_stopped():
             asyncio.run(run_all_from_socket())
@@ -132,76 +179,17 @@ def run(
         print(f"[worker {worker_id}] done")
         for storage in storages.values():
             storage.close()
+        ring_buffer.set_producer_pid(index_buf, 0)
         shm_data.close()
         shm_index.close()
 
 
-def find_first_key_after_checkpoint(storage: RocksdbLog, checkpoint_ms: int) -> bytes | None:
-    forward_iter = storage.iterate_from(None, 1)
-    reverse_iter = storage.iterate_from_end(None, 1)
-
-    try:
-        if not forward_iter.has_next() or not reverse_iter.has_next():
-            return None
-
-        first_batch = forward_iter.next_batch()
-        last_batch = reverse_iter.next_batch()
-
-        if not first_batch or not last_batch:
-            return None
-
-        low_key = int.from_bytes(first_batch[0][0], byteorder="big", signed=True)
-        high_key = int.from_bytes(last_batch[0][0], byteorder="big", signed=True)
-
-        first_order = order_decoder.decode(first_batch[0][1])
-        if first_order.time > checkpoint_ms:
-            return None
-
-        last_order = order_decoder.decode(last_batch[0][1])
-        if last_order.time <= checkpoint_ms:
-            return last_batch[0][0]
-
-    finally:
-        forward_iter.close()
-        reverse_iter.close()
-
-    result_key: bytes | None = None
-
-    while low_key <= high_key:
-        mid_key = (low_key + high_key) // 2
-        mid_key_bytes = mid_key.to_bytes(8, byteorder="big", signed=True)
-
-        mid_iter = storage.iterate_from(mid_key_bytes, 1)
-        try:
-            if not mid_iter.has_next():
-                high_key = mid_key - 1
-                continue
-
-            batch = mid_iter.next_batch()
-            if not batch:
-                high_key = mid_key - 1
-                continue
-
-            key_bytes, value_bytes = batch[0]
-            order = order_decoder.decode(value_bytes)
-
-            if order.time > checkpoint_ms:
-                result_key = key_bytes
-                high_key = mid_key - 1
-            else:
-                low_key = mid_key + 1
-        finally:
-            mid_iter.close()
-
-    return result_key
-
-
 EmitWindowInternal = Callable[[int, tuple[int, bytes] | None], None]
 
 
 def run_from_storage(
     storage: RocksdbLog,
-    window_handlers: list["WindowHandler"],
+    book_windows: "OrderBookWindows",
     emit_window: EmitWindowInternal,
     checkpoint_ms: int | None,
     is_stopped: IsStopped = lambda: False,
@@ -211,9 +199,9 @@ def run_from_storage(
 
     start_key: bytes | None = None
     if checkpoint_ms > 0:
-        start_key = find_first_key_after_checkpoint(storage, checkpoint_ms)
+        start_key = time_index.find_first_key_after(storage, checkpoint_ms)
         if start_key is not None:
-            print(f"[worker {worker_id}] binary search found start key, skipping to checkpoint")
+            print(f"[worker {worker_id}] time index found start key, skipping to checkpoint")
 
     iter = storage.iterate_from(start_key, 1_000)
 
@@ -226,8 +214,8 @@ def run_from_storage(
                     break
 
                 order = order_decoder.decode(value_bytes)
-                for window_handler in window_handlers:
-                    emit_window(window_handler.win_ms, window_handler.handle(order))
+                for window_size_ms, win in book_windows.handle(order):
+                    emit_window(window_size_ms, win)
     finally:
         iter.close()
 
@@ -236,8 +224,9 @@ async def run_from_socket(
     platform: str,
     symbol: str,
     storage: RocksdbLog,
-    window_handlers: list["WindowHandler"],
+    book_windows: "OrderBookWindows",
     emit_window: EmitWindow,
+    flush_windows: FlushWindows,
     is_stopped: IsStopped,
     checkpoint_ms: int | None = None,
     worker_id: str = "",
@@ -270,11 +259,12 @@ async def run_from_socket(
                     asks=order_with_id.asks,
                 )
 
-                for window_handler in window_handlers:
-                    emit_window(symbol, window_handler.win_ms, window_handler.handle(order))
+                for window_size_ms, win in book_windows.handle(order):
+                    emit_window(symbol, window_size_ms, win)
 
                 print(f"[worker {worker_id}] socket {symbol} processed {event_count} orders")
 
+            await flush_windows()
             await asyncio.sleep(0)
 
         print(
@@ -284,28 +274,62 @@ async def run_from_socket(
         print(f"[worker {worker_id}] run_from_socket failed for {symbol}: {e}")
 
 
+class OrderBookWindows:
+    """
+    Order book windows of every size of one symbol. Each record is applied once to the
+    symbol's book and the resulting BookTick is fanned out to the WindowHandler of each size.
+    """
+
+    def __init__(
+        self, window_sizes_ms: list[int], scale: Scale = DEFAULT_SCALE, ladder: bool = False
+    ):
+        self.mgr = OrderBookManager(scale, ladder)
+        self.handlers = [WindowHandler(window_size_ms) for window_size_ms in window_sizes_ms]
+        self.tick: BookTick | None = None
+        """Stats of the book after the last record, once it has a snapshot"""
+
+    def handle(self, order_book: OrderBook) -> list[tuple[int, tuple[int, bytes]]]:
+        """Finished windows as (window_size_ms, (window_end_ms, encoded accumulator))"""
+        self.mgr.apply_one(order_book)
+        if not self.mgr.has_snapshot:
+            return []
+
+        tick = self.tick = book_tick(self.mgr)
+        finished: list[tuple[int, tuple[int, bytes]]] = []
+        for handler in self.handlers:
+            win = handler.handle(order_book.time, tick)
+            if win is not None:
+                finished.append((handler.win_ms, win))
+        return finished
+
+    def flush(self) -> list[tuple[int, tuple[int, bytes]]]:
+        finished: list[tuple[int, tuple[int, bytes]]] = []
+        if self.tick is None:
+            return finished
+        for handler in self.handlers:
+            win = handler.flush(self.tick)
+            if win is not None:
+                finished.append((handler.win_ms, win))
+        return finished
+
+
 class WindowHandler:
+    """Order book windows of one size, fed the book stats of every record (see OrderBookWindows)"""
+
     def __init__(self, window_size_ms: int):
         self.win_ms = window_size_ms
         self.win_start: int | None = None
-        self.mgr = OrderBookManager()
         self.acc = OrderBookAccumulator()
         self.prev_t = None
         self.prev_mid = None
         self.prev_spread = None
 
-    def handle(self, order_book: OrderBook) -> tuple[int, bytes] | None:
-        record_time_ms = order_book.time
+    def handle(self, record_time_ms: int, tick: BookTick) -> tuple[int, bytes] | None:
         window_start_incl = (record_time_ms // self.win_ms) * self.win_ms
 
         if self.win_start is not None and window_start_incl < self.win_start:
             return None
 
-        self.mgr.apply_one(order_book)
-
-        if not self.mgr.has_snapshot:
-            return None
-
         result = None
 
         if self.win_start is None or window_start_incl == self.win_start:
@@ -315,7 +339,7 @@ class WindowHandler:
         elif window_start_incl > self.win_start:
             ob_acc_close(
                 self.acc,
-                self.mgr,
+                tick,
                 last_mid=self.prev_mid,
                 last_spread=self.prev_spread,
             )
@@ -333,7 +357,7 @@ class WindowHandler:
 
         mid, spread = ob_acc_update_tick(
             self.acc,
-            self.mgr,
+            tick,
             self.prev_t or self.win_start,
             record_time_ms,
             prev_mid=self.prev_mid,
@@ -346,12 +370,12 @@ class WindowHandler:
 
         return result
 
-    def flush(self) -> tuple[int, bytes] | None:
+    def flush(self, tick: BookTick) -> tuple[int, bytes] | None:
         result = None
         if self.win_start:
             ob_acc_close(
                 self.acc,
-                self.mgr,
+                tick,
                 last_mid=self.prev_mid,
                 last_spread=self.prev_spread,
             )
@@ -362,102 +386,3 @@ class WindowHandler:
             )
 
         return result
-
-
-if __name__ == "__main__":
-    import asyncio
-
-    @dataclass
-    class WorkerProcess:
-        id: str
-        proc: Process
-        shm_data: SharedMemory
-        shm_index: SharedMemory
-        mask: int
-        reads: int
-        done: bool
-
-    async def read_worker_loop(workers: list[WorkerProcess]):
-        storage = RocksdbLog(
-            base_dir="/Users/e/taltech/loputoo/start/storage/py-predictor/dev",
-            db_name="windows",
-            writable=True,
-        )
-        reads = 0
-
-        start = time.time()
-        while True:
-            read = False
-
-            for worker in workers:
-                tup = ring_buffer.read(
-                    data_buf=worker.shm_data.buf, index_buf=worker.shm_index.buf, mask=worker.mask
-                )
-                if tup is None:
-                    continue
-                read = True
-                worker.reads = worker.reads + 1
-                reads = reads + 1
-
-                key_bytes, value_bytes = tup
-
-                storage.put(key=key_bytes, value=value_bytes)
-
-                if reads % 10000 == 0:
-                    print(f"[MAIN] pipe {reads} rows to RocksDb in {time.time() - start}s")
-
-            if not read:
-                await asyncio.sleep(0.1)
-
-    async def run_all():
-        workers: list[WorkerProcess] = []
-
-        for platform, symbol in [
-            ("binance", "eth_usdt"),
-            ("binance", "xrp_usdt"),
-            ("binance", "btc_usdt"),
-            ("binance", "trump_usdt"),
-        ]:
-            # for platform, symbol in [("binance", "eth_usdt")]:
-            worker_name = f"worker-order_book-window-{platform}-{symbol}"
-            shm_data, shm_index, size, mask = ring_buffer.init(
-                shm_data_name=None, shm_index_name=None
-            )
-            p = Process(
-                target=run,
-                args=(
-                    shm_data.name,
-                    shm_index.name,
-                    f"/Users/e/taltech/loputoo/start/storage/internal-bridge/{platform}/unified/order_book",
-                    platform,
-                    symbol,
-                    1000,
-                ),
-                name=worker_name,
-            )
-
-            workers.append(
-                WorkerProcess(
-                    id=worker_name,
-                    proc=p,
-                    shm_data=shm_data,
-                    shm_index=shm_index,
-                    mask=mask,
-                    reads=0,
-                    done=False,
-                )
-            )
-
-        for w in workers:
-            w.proc.start()
-
-        await read_worker_loop(workers)
-
-        for w in workers:
-            w.proc.join()
-            w.shm_data.close()
-            w.shm_data.unlink()
-            w.shm_index.close()
-            w.shm_index.unlink()
-
-    asyncio.run(run_all())
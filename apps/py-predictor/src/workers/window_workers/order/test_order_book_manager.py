@@ -0,0 +1,87 @@
+import random
+
+from .messages import OrderBook
+from .order_book_manager import LADDER_MAX_SLOTS, OrderBookManager
+
+
+def make_order_book(type_: str, bids: list, asks: list) -> OrderBook:
+    return OrderBook(type=type_, symbol="btc_usdt", bids=bids, asks=asks, time=1, platform="kraken")
+
+
+def test_order_book_totals_stay_exact():
+    mgr = OrderBookManager()
+    mgr.apply_one(
+        make_order_book(
+            "snapshot", [("99.9", "0.1"), ("100.0", "0.2")], [("100.1", "0.3"), ("100.3", "0.4")]
+        )
+    )
+    for _ in range(1000):
+        mgr.apply_one(make_order_book("update", [("99.9", "0.7")], []))
+        mgr.apply_one(make_order_book("update", [("99.9", "0.1")], []))
+    mgr.apply_one(make_order_book("update", [("100.0", "0")], [("100.2", "1.5")]))
+
+    assert mgr.bids.best_level() == (99.9, 0.1)
+    assert mgr.asks.best_level() == (100.1, 0.3)
+    assert mgr.bids.total_volume() == 0.1
+    assert mgr.asks.total_volume() == 1.8  # 100.3 trimmed to the snapshot depth
+    assert mgr.levels("ask", reverse=True) == [(100.2, 1.5), (100.1, 0.3)]
+
+
+def test_book_engines_match():
+    rng = random.Random(7)
+    books = [OrderBookManager(), OrderBookManager(ladder=True), OrderBookManager(decimal=True)]
+
+    def levels(center: int, spread: int) -> list[tuple[str, str]]:
+        return [
+            (f"{(center + rng.randint(-spread, spread)) / 100:.2f}", f"{rng.choice([0, 1, 2.5])}")
+            for _ in range(rng.randint(1, 20))
+        ]
+
+    snapshot = make_order_book(
+        "snapshot",
+        [(f"{(10_000 - i * 5) / 100:.2f}", "1") for i in range(1, 50)],
+        [(f"{(10_000 + i * 5) / 100:.2f}", "1") for i in range(50)],
+    )
+    for book in books:
+        book.apply_one(snapshot)
+
+    for i in range(2000):
+        center = 10_000 + rng.randint(-300, 300)
+        # Off the 0.05 grid of the snapshot, then far from the touch
+        spread = 2000 if i % 500 == 499 else 200
+        update = make_order_book(
+            "update", levels(center - 100, spread), levels(center + 100, spread)
+        )
+        for book in books:
+            book.apply_one(update)
+
+        sorted_book, ladder_book, decimal_book = books
+        for side in ("bid", "ask"):
+            assert ladder_book.levels(side) == sorted_book.levels(side)
+            assert decimal_book.levels(side) == sorted_book.levels(side)
+        assert ladder_book.bids.best_level() == sorted_book.bids.best_level()
+        assert ladder_book.asks.total_qty == sorted_book.asks.total_qty
+        assert ladder_book.bids.total_notional == sorted_book.bids.total_notional
+        assert decimal_book.asks.total_volume() == sorted_book.asks.total_volume()
+
+
+def test_ladder_book_keeps_its_span_on_a_finer_price():
+    book = OrderBookManager(ladder=True)
+    book.apply_one(make_order_book("snapshot", [("100.00", "1"), ("110.00", "1")], []))
+
+    # 1e-8 steps put the new level 1e9 slots from the best bid, too far to keep
+    book.apply_one(make_order_book("update", [("100.00000001", "1")], []))
+    assert book.levels("bid") == [(100.0, 1.0), (110.0, 1.0)]
+
+    # Near the best it is kept, the levels too far at the finer step are trimmed
+    book.apply_one(make_order_book("update", [("109.99999999", "1")], []))
+    assert book.levels("bid") == [(109.99999999, 1.0), (110.0, 1.0)]
+    assert len(book.bids.slots) <= LADDER_MAX_SLOTS
+
+
+def test_only_a_zero_quantity_removes_a_level():
+    for book in [OrderBookManager(), OrderBookManager(ladder=True)]:
+        book.apply_one(make_order_book("snapshot", [("100.0", "1"), ("99.0", "1")], []))
+        book.apply_one(make_order_book("update", [("100.0", "0.000000001"), ("99.0", "0")], []))
+
+        assert book.levels("bid") == [(100.0, 1e-8)]
@@ -0,0 +1,51 @@
+import random
+
+from .messages import OrderBook, ob_acc_decoder
+from .order_window_worker import OrderBookWindows
+
+
+def make_order_books(count: int) -> list[OrderBook]:
+    rng = random.Random(3)
+    books = [
+        OrderBook(
+            type="snapshot",
+            symbol="btc_usdt",
+            bids=[("99.9", "1"), ("100.0", "2")],
+            asks=[("100.1", "3"), ("100.2", "4")],
+            time=0,
+            platform="binance",
+        )
+    ]
+    for i in range(1, count):
+        side = [(f"{rng.randint(990, 1000) / 10:.1f}", f"{rng.choice([0, 1, 2])}")]
+        books.append(
+            OrderBook(
+                type="update",
+                symbol="btc_usdt",
+                bids=side if i % 2 else [],
+                asks=[] if i % 2 else [(f"{float(side[0][0]) + 1.1:.1f}", side[0][1])],
+                time=i * 170,
+                platform="binance",
+            )
+        )
+    return books
+
+
+def test_shared_book_fans_out_to_every_window_size():
+    shared = OrderBookWindows([1000, 3000])
+    separate = [OrderBookWindows([1000]), OrderBookWindows([3000])]
+
+    shared_windows: list[tuple[int, tuple[int, bytes]]] = []
+    separate_windows: list[tuple[int, tuple[int, bytes]]] = []
+    for order_book in make_order_books(200):
+        shared_windows += shared.handle(order_book)
+        for windows in separate:
+            separate_windows += windows.handle(order_book)
+
+    assert sorted(shared_windows) == sorted(separate_windows)
+
+    updates = {1000: 0, 3000: 0}
+    for window_size_ms, (window_end_ms, encoded) in shared_windows:
+        if window_end_ms <= 33_000:
+            updates[window_size_ms] += ob_acc_decoder.decode(encoded).n_updates
+    assert updates[1000] == updates[3000] > 0
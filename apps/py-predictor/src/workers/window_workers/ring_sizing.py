@@ -0,0 +1,107 @@
+"""
+Ring buffer size per worker, estimated from its config and grown from the usage seen in
+earlier runs (persisted as JSON next to the windows DB).
+"""
+
+from typing import get_args
+
+import msgspec
+
+from src.lib import quantile_sketch
+from src.lib.worker import ring_buffer, shared_bytes
+
+from .messages import WINDOW_KEY_FMT, WindowKind
+from .order.messages import OrderBookAccumulator, ob_acc_encoder
+from .trade.messages import TradeWindowAggregate, trade_window_aggregate_encoder
+
+RING_MIN_SIZE = 2**20  # 1MB
+RING_MAX_SIZE = 2**27  # 128MB
+
+BURST_WINDOWS = 1024
+"""
+Windows per series (symbol x window size) a ring should hold while the consumer is busy,
+catch-up from storage emits windows much faster than live data.
+"""
+
+
+class RingUsage(msgspec.Struct):
+    buf_size: int
+    high_watermark: int
+    """highest bytes_used seen by the consumer"""
+    full_stalls: int
+
+
+ring_usage_decoder = msgspec.json.Decoder(type=dict[str, RingUsage])
+
+
+def max_encoded_size(
+    struct_type: type[msgspec.Struct], encoder: msgspec.msgpack.Encoder, max_bytes_size: int = 0
+) -> int:
+    """
+    msgpack size of the struct with every numeric field at its widest encoding and every
+    bytes field max_bytes_size long
+    """
+    values = {}
+    for field in msgspec.structs.fields(struct_type):
+        field_types = get_args(field.type) or (field.type,)
+        if bytes in field_types:
+            values[field.name] = bytes(max_bytes_size)
+        elif float in field_types:
+            values[field.name] = 0.1
+        elif int in field_types:
+            values[field.name] = -(2**63)
+
+    return len(encoder.encode(struct_type(**values)))
+
+
+TYPICAL_SKETCH_BUCKETS = 8
+"""
+Buckets of a trade window sketch for sizing bursts - catch-up bursts are mostly windows of
+the smallest size with a few trades each, rings of wider sketches grow from the high
+watermark
+"""
+
+
+def get_record_size(kind: WindowKind, sketch_size: int) -> int:
+    """Packed size of a record of kind with trade sketches of sketch_size bytes"""
+    if kind == WindowKind.trade:
+        value_size = max_encoded_size(
+            TradeWindowAggregate, trade_window_aggregate_encoder, sketch_size
+        )
+    else:
+        value_size = max_encoded_size(OrderBookAccumulator, ob_acc_encoder)
+    return shared_bytes.packed_size(bytes(WINDOW_KEY_FMT.size), bytes(value_size))
+
+
+RECORD_SIZE: dict[WindowKind, int] = {
+    kind: get_record_size(kind, quantile_sketch.HEADER.size + TYPICAL_SKETCH_BUCKETS * 8)
+    for kind in WindowKind
+}
+"""Typical record size, see TYPICAL_SKETCH_BUCKETS"""
+LARGEST_RECORD_SIZE: dict[WindowKind, int] = {
+    kind: get_record_size(kind, quantile_sketch.MAX_SERIALIZED_SIZE) for kind in WindowKind
+}
+
+
+def next_power_of_two(n: int) -> int:
+    return 1 << max(0, n - 1).bit_length()
+
+
+def choose_ring_size(kind: WindowKind, series_count: int, usage: RingUsage | None) -> int:
+    """
+    Enough for BURST_WINDOWS windows of every series, at least twice the high watermark of
+    the previous run and double the previous size if the worker stalled on a full ring.
+    """
+    if LARGEST_RECORD_SIZE[kind] > ring_buffer.MAX_RECORD_SIZE:
+        raise ValueError(
+            f"{kind.name} records of up to {LARGEST_RECORD_SIZE[kind]} bytes exceed the ring"
+            f" buffer max record size {ring_buffer.MAX_RECORD_SIZE}"
+        )
+
+    size = series_count * RECORD_SIZE[kind] * BURST_WINDOWS
+    if usage is not None:
+        size = max(size, usage.high_watermark * 2)
+        if usage.full_stalls > 0:
+            size = max(size, usage.buf_size * 2)
+
+    return min(RING_MAX_SIZE, max(RING_MIN_SIZE, next_power_of_two(size)))
@@ -0,0 +1,183 @@
+"""
+Group commit of windows into the windows DB.
+
+Windows drained from all worker rings are copied into one pending batch which is written
+with a single RocksDB write batch once it reaches max_records/max_bytes or is older than
+max_delay_s. With `threaded=True` the write happens on a dedicated thread (the binding
+releases the GIL while writing) so the coordinator keeps draining rings meanwhile.
+
+Every batch also carries the checkpoint row (see messages.CHECKPOINT_KEY_PREFIX) of each
+series it touches, so checkpoints never run ahead of or behind the stored windows. Held
+series (a backfill split into time shards) are written without moving their checkpoints.
+
+Ring offsets are committed before the batch is written, a crash loses at most the pending
+batches which the workers recompute from the checkpoints stored in the DB.
+
+Windows are copied out of the rings rather than handed to put_batch as views: a view pins
+its ring space until the batch is written, up to max_delay_s plus the queued batches,
+which would stall the workers and block closing a crashed worker's ring. The copy is two
+small allocations per window, the write batch itself is what removed the per-window
+put overhead.
+"""
+
+import queue
+import threading
+import time
+
+from src.lib.rocks_db_log import RocksdbLog
+
+from .messages import CHECKPOINT_VALUE_FMT, WINDOW_KEY_FMT, pack_checkpoint_key
+
+WindowPair = tuple[bytes, bytes]
+
+BATCH_MAX_RECORDS = 8192
+BATCH_MAX_BYTES = 4 * 2**20
+BATCH_MAX_DELAY_S = 0.05
+MAX_QUEUED_BATCHES = 4
+"""Batches waiting for the writer thread before `add` blocks"""
+
+
+class WindowStorageWriter:
+    def __init__(
+        self,
+        storage: RocksdbLog,
+        max_records: int = BATCH_MAX_RECORDS,
+        max_bytes: int = BATCH_MAX_BYTES,
+        max_delay_s: float = BATCH_MAX_DELAY_S,
+        threaded: bool = False,
+    ):
+        self.storage = storage
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_delay_s = max_delay_s
+        self.pending: list[WindowPair] = []
+        self.pending_bytes = 0
+        self.pending_since = 0.0
+        self.checkpoints: dict[bytes, int] = {}
+        """latest window_end_ms per series key (window key without window_end_ms)"""
+        self.pending_series: set[bytes] = set()
+        self.held_series: set[bytes] = set()
+        """series whose checkpoints stay put, see hold"""
+        self.records_written = 0
+        self.batches_written = 0
+
+        self._queue: queue.Queue[list[WindowPair] | None] | None = None
+        self._thread: threading.Thread | None = None
+        self._error: BaseException | None = None
+        if threaded:
+            self._queue = queue.Queue(maxsize=MAX_QUEUED_BATCHES)
+            self._thread = threading.Thread(
+                target=self._run_thread, name="window-storage-writer", daemon=True
+            )
+            self._thread.start()
+
+    def add(self, events: list[tuple[memoryview, memoryview]]) -> None:
+        """
+        Copy (key, value) views (see ring_buffer.peek_many) into the pending batch, the
+        views may be released and the ring committed right after.
+        """
+        self._raise_error()
+        if not self.pending:
+            self.pending_since = time.monotonic()
+
+        for key_view, value_view in events:
+            if len(key_view) != WINDOW_KEY_FMT.size:
+                raise ValueError(
+                    f"window key of {len(key_view)} bytes, expected {WINDOW_KEY_FMT.size}"
+                )
+            key_bytes = bytes(key_view)
+            self.pending.append((key_bytes, bytes(value_view)))
+            self.pending_bytes += len(key_bytes) + len(value_view)
+
+            series = key_bytes[8:]
+            if series in self.held_series:
+                continue
+            (window_end_ms,) = CHECKPOINT_VALUE_FMT.unpack_from(key_bytes)
+            if window_end_ms > self.checkpoints.get(series, -1):
+                self.checkpoints[series] = window_end_ms
+            self.pending_series.add(series)
+
+        if len(self.pending) >= self.max_records or self.pending_bytes >= self.max_bytes:
+            self.flush()
+
+    def hold(self, series: set[bytes]) -> None:
+        """
+        Stop moving the checkpoints of series (window keys without window_end_ms) until
+        released, for windows stored out of order - a crash then recomputes from before
+        all of them
+        """
+        self.held_series |= series
+
+    def release(self, series: set[bytes]) -> None:
+        """Checkpoints of series move again with their next window"""
+        self.held_series -= series
+
+    def is_due(self) -> bool:
+        return bool(self.pending) and time.monotonic() - self.pending_since >= self.max_delay_s
+
+    def flush(self) -> None:
+        """Write (or hand to the writer thread) the pending batch"""
+        if not self.pending:
+            return
+        batch = self.pending
+        for series in self.pending_series:
+            batch.append(
+                (
+                    pack_checkpoint_key(series),
+                    CHECKPOINT_VALUE_FMT.pack(self.checkpoints[series]),
+                )
+            )
+        self.pending = []
+        self.pending_bytes = 0
+        self.pending_series = set()
+
+        if self._queue is None:
+            self._write(batch)
+        else:
+            self._queue.put(batch)
+
+    def _write(self, batch: list[WindowPair]) -> None:
+        self.storage.put_batch(batch)
+        self.records_written += len(batch)
+        self.batches_written += 1
+
+    def _run_thread(self) -> None:
+        assert self._queue is not None
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                self._queue.task_done()
+                return
+            try:
+                if self._error is None:
+                    self._write(batch)
+            except BaseException as error:
+                self._error = error
+                print(f"[MAIN] Writing {len(batch)} windows failed: {error}")
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError("window storage writer failed") from self._error
+
+    def flush_if_due(self, idle: bool) -> None:
+        """Flush batches older than max_delay_s, or right away once the rings are idle"""
+        if idle or self.is_due():
+            self.flush()
+
+    def sync(self) -> None:
+        """Flush and wait until everything added so far is written"""
+        self.flush()
+        if self._queue is not None:
+            self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """Flush, wait for the writer thread to finish and raise if any write failed"""
+        self.sync()
+        if self._thread is not None and self._queue is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._raise_error()
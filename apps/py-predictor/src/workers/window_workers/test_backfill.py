@@ -0,0 +1,19 @@
+import numpy as np
+
+from .backfill import split_history
+
+
+def test_split_history_balances_index_entries():
+    # Dense history in the first hour, sparse after
+    entry_times = np.concatenate(
+        (np.arange(0, 3_600_000, 1000), np.arange(3_600_000, 36_000_000, 600_000))
+    )
+    boundaries = split_history(entry_times, 0, 36_000_000, 4, 60_000)
+
+    assert boundaries == sorted(set(boundaries))
+    assert all(0 < b < 36_000_000 and b % 60_000 == 0 for b in boundaries)
+    assert len(boundaries) == 3
+    assert boundaries[1] < 3_600_000
+
+    # Too few entries, equal time ranges
+    assert split_history(np.array([0]), 0, 4_000_000, 4, 60_000) == [960_000, 1_980_000, 3_000_000]
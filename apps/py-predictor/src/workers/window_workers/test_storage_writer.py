@@ -0,0 +1,84 @@
+from typing import cast
+
+from src.lib.rocks_db_log import RocksdbLog
+
+from .messages import (
+    CHECKPOINT_VALUE_FMT,
+    Platform,
+    WindowKeyParts,
+    WindowKind,
+    is_checkpoint_key,
+    pack_checkpoint_key,
+    pack_window_key,
+)
+from .storage_writer import WindowStorageWriter
+
+
+class BatchRecorder:
+    def __init__(self):
+        self.batches: list[list[tuple[bytes, bytes]]] = []
+
+    def put_batch(self, items: list[tuple[bytes, bytes]]) -> None:
+        self.batches.append(items)
+
+
+KEY = WindowKeyParts(
+    window_end_ms=1000,
+    symbol="eth_usdt",
+    kind=WindowKind.trade,
+    window_size_ms=1000,
+    platform=Platform.kraken,
+)
+
+
+def make_events(count: int) -> list[tuple[memoryview, memoryview]]:
+    """count windows, each of its own series"""
+    keys = [
+        pack_window_key(
+            WindowKeyParts(60_000, "btc_usdt", WindowKind.trade, 1000 * (i + 1), Platform.kraken)
+        )
+        for i in range(count)
+    ]
+    return [(memoryview(key), memoryview(b"value")) for key in keys]
+
+
+def test_storage_writer_group_commit():
+    recorder = BatchRecorder()
+    writer = WindowStorageWriter(cast(RocksdbLog, recorder), max_records=4, max_delay_s=60)
+
+    writer.add(make_events(3))
+    writer.flush_if_due(idle=False)
+    assert recorder.batches == []
+
+    writer.add(make_events(2))
+    # 5 windows of 3 series and their checkpoint rows
+    assert [len(batch) for batch in recorder.batches] == [8]
+    checkpoints = {
+        key[8:]: CHECKPOINT_VALUE_FMT.unpack(value)[0]
+        for key, value in recorder.batches[0]
+        if is_checkpoint_key(key)
+    }
+    assert len(checkpoints) == 3
+    assert all(window_end_ms == 60_000 for window_end_ms in checkpoints.values())
+
+    writer.add([(memoryview(pack_window_key(KEY)), memoryview(b"value"))])
+    writer.flush_if_due(idle=True)
+    assert recorder.batches[1] == [
+        (pack_window_key(KEY), b"value"),
+        (pack_checkpoint_key(pack_window_key(KEY)[8:]), CHECKPOINT_VALUE_FMT.pack(1000)),
+    ]
+
+
+def test_storage_writer_threaded():
+    recorder = BatchRecorder()
+    writer = WindowStorageWriter(cast(RocksdbLog, recorder), max_records=10, threaded=True)
+
+    for _ in range(7):
+        writer.add(make_events(3))
+    writer.sync()
+    windows = [key for batch in recorder.batches for key, _ in batch if not is_checkpoint_key(key)]
+    assert len(windows) == 21
+
+    writer.add(make_events(1))
+    writer.close()
+    assert writer.batches_written == len(recorder.batches)
@@ -0,0 +1,180 @@
+import os
+import sys
+from multiprocessing import Process
+from typing import cast
+
+from src.lib.fixed_point import Scale
+from src.lib.rocks_db_log import RocksdbLog
+from src.lib.worker import ring_buffer, ring_signal
+
+from . import window_workers
+from .messages import (
+    CHECKPOINT_VALUE_FMT,
+    Platform,
+    WindowKeyParts,
+    WindowKind,
+    pack_checkpoint_key,
+    pack_window_key,
+)
+from .window_workers import WorkerConfig, WorkerProcess
+
+
+def make_worker(worker_id: str, exit_code: int) -> WorkerProcess:
+    shm_data, shm_index, _size, mask, _resumed = ring_buffer.open_named(
+        f"{worker_id}-{os.getpid()}", 2**16, 1024
+    )
+    proc = Process(target=sys.exit, args=(exit_code,))
+    proc.start()
+    proc.join()
+
+    return WorkerProcess(
+        id=worker_id,
+        proc=proc,
+        shm_data=shm_data,
+        shm_index=shm_index,
+        channels=ring_signal.create_channels(),
+        mask=mask,
+        reads=0,
+        done=False,
+        config=WorkerConfig("kraken", WindowKind.trade, ["btc_usdt"], [1000], {}),
+    )
+
+
+async def test_supervise_workers_restarts_crashed(monkeypatch):
+    monkeypatch.setattr(window_workers, "RESTART_BACKOFF_S", 0.0)
+
+    crashed = make_worker("crashed", exit_code=1)
+    finished = make_worker("finished", exit_code=0)
+    workers = [crashed, finished]
+    restarted: list[WorkerProcess] = []
+
+    def restart_worker(worker: WorkerProcess) -> WorkerProcess:
+        replacement = make_worker(f"{worker.id}-restarted", exit_code=0)
+        restarted.append(replacement)
+        return replacement
+
+    def is_stopped() -> bool:
+        return len(restarted) > 0 and len(workers) == 1
+
+    try:
+        await window_workers.supervise_workers(
+            workers, is_stopped, check_interval=0.01, restart_worker=restart_worker
+        )
+    finally:
+        for worker in [crashed, *restarted]:
+            window_workers.release_worker(worker)
+
+    assert crashed.crashes == 1
+    assert finished.done
+    assert workers == restarted
+
+
+def test_split_remaining_series():
+    scale = Scale(price_decimals=12)
+    config = WorkerConfig("kraken", WindowKind.order, ["btc_usdt", "eth_usdt"], [1000, 60000], {})
+    config.symbol_scales = {"btc_usdt": scale}
+    config.ladder_symbols = ["eth_usdt"]
+
+    remaining = window_workers.split_remaining_series(config, {("kraken", "btc_usdt", 1000)})
+
+    assert [
+        (c.symbols, c.window_sizes_ms, c.symbol_scales, c.ladder_symbols) for c in remaining
+    ] == [
+        (["btc_usdt"], [60000], {"btc_usdt": scale}, []),
+        (["eth_usdt"], [1000, 60000], {}, ["eth_usdt"]),
+    ]
+    all_series = window_workers.get_config_series(config)
+    assert window_workers.split_remaining_series(config, all_series) == []
+
+
+def test_series_costs_stay_put_once_planned(tmp_path, monkeypatch):
+    path = str(tmp_path / "series_costs.json")
+    sizes = {"btc_usdt": 100.0, "eth_usdt": 10.0}
+
+    def estimate_series_costs(platform_symbols, raw_storage_base_dir):
+        return {
+            (platform, symbol, kind): sizes[symbol]
+            for platform, symbol in platform_symbols
+            for kind in [WindowKind.trade, WindowKind.order]
+        }
+
+    monkeypatch.setattr(window_workers, "estimate_series_costs", estimate_series_costs)
+    window_workers.plan_series_costs([("kraken", "btc_usdt")], path, str(tmp_path))
+
+    # The log grew, a new symbol is estimated from the sizes of now
+    sizes["btc_usdt"] = 500.0
+    platform_symbols = [("kraken", "btc_usdt"), ("kraken", "eth_usdt")]
+    costs = window_workers.plan_series_costs(platform_symbols, path, str(tmp_path))
+
+    assert costs[("kraken", "btc_usdt", WindowKind.trade)] == 100.0
+    assert costs[("kraken", "eth_usdt", WindowKind.order)] == 10.0
+
+
+def test_release_leftover_ring():
+    worker_id = f"leftover-{os.getpid()}"
+    shm_data, shm_index, _size, _mask, _resumed = ring_buffer.open_named(worker_id, 2**16, 1024)
+    shm_data.close()
+    shm_index.close()
+
+    assert window_workers.release_leftover_ring(worker_id)
+    assert not window_workers.release_leftover_ring(worker_id)
+
+
+class SortedRows:
+    """Iterator over sorted (key, value) rows, in batches of 2"""
+
+    def __init__(self, rows: list[tuple[bytes, bytes]]):
+        self.rows = rows
+
+    def has_next(self) -> bool:
+        return bool(self.rows)
+
+    def next_batch(self) -> list[tuple[bytes, bytes]]:
+        batch, self.rows = self.rows[:2], self.rows[2:]
+        return batch
+
+    def close(self) -> None:
+        pass
+
+
+class SortedStore:
+    def __init__(self):
+        self.rows: dict[bytes, bytes] = {}
+        self.reverse_walks = 0
+
+    def put_batch(self, items: list[tuple[bytes, bytes]]) -> None:
+        self.rows.update(items)
+
+    def iterate_from(self, start_key: bytes) -> SortedRows:
+        return SortedRows(sorted(row for row in self.rows.items() if row[0] >= start_key))
+
+    def iterate_from_end(self) -> SortedRows:
+        self.reverse_walks += 1
+        return SortedRows(sorted(self.rows.items(), reverse=True))
+
+
+def test_read_checkpoints_scans_for_series_without_rows():
+    def window_key(window_end_ms: int, symbol: str) -> bytes:
+        return pack_window_key(
+            WindowKeyParts(window_end_ms, symbol, WindowKind.trade, 1000, Platform.kraken)
+        )
+
+    store = SortedStore()
+    store.put_batch([(window_key(end, "eth_usdt"), b"") for end in (1000, 2000, 3000)])
+    store.put_batch([(window_key(end, "btc_usdt"), b"") for end in (2000, 5000)])
+    # Only btc_usdt has a checkpoint row, eth_usdt was stored before rows existed
+    btc_row = pack_checkpoint_key(window_key(0, "btc_usdt")[8:])
+    store.put_batch([(btc_row, CHECKPOINT_VALUE_FMT.pack(5000))])
+    storage = cast(RocksdbLog, store)
+    symbols = [("kraken", "btc_usdt"), ("kraken", "eth_usdt"), ("kraken", "sol_usdt")]
+
+    checkpoint = window_workers.read_checkpoints(storage, symbols, [1000])
+    assert checkpoint["kraken-btc_usdt-trade-1000"] == 5000
+    assert checkpoint["kraken-eth_usdt-trade-1000"] == 3000
+    assert checkpoint["kraken-sol_usdt-trade-1000"] is None
+    assert checkpoint["kraken-btc_usdt-order-1000"] is None
+    assert store.reverse_walks == 1
+
+    # The scan wrote rows, for sol_usdt one of no windows
+    assert window_workers.read_checkpoints(storage, symbols, [1000]) == checkpoint
+    assert store.reverse_walks == 1
@@ -87,13 +87,13 @@ class TradeWindowAggregate(msgspec.Struct):
     max_gap_ms: int = 0
     """Maximum gap between consecutive trades - indicates inactivity periods."""
 
-    # price_sketch: bytes | None = None
+    price_sketch: bytes | None = None
     """
-    Mergeable quantile sketch (e.g., t-digest) for trade prices
+    Mergeable quantile sketch (src.lib.quantile_sketch) for trade prices
     - preserves price distribution shape.
     """
 
-    # size_sketch: bytes | None = None
+    size_sketch: bytes | None = None
     """
     Mergeable quantile sketch for trade sizes
     - preserves size distribution shape.
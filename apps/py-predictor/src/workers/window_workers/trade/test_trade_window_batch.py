@@ -0,0 +1,55 @@
+import math
+import random
+
+import msgspec
+
+from .messages import Trade
+from .trade_window_batch import decode_trade_columns
+from .trade_window_worker import TradeWindowCascade
+
+WINDOW_SIZES_MS = [700, 1000, 3000, 5000]
+
+
+def test_handle_batch_matches_handle():
+    rng = random.Random(3)
+    trades = []
+    time_ms = 1_700_000_000_000
+    for i in range(6000):
+        time_ms += rng.choice([0, 3, 40, 700, 4000])
+        # A few late trades take the trade by trade path
+        late_ms = 1500 if i % 997 == 0 else 0
+        trades.append(
+            Trade(
+                symbol="btc_usdt",
+                price=f"{rng.uniform(99, 101):.4f}",
+                quantity=f"{rng.uniform(0.001, 3):.5f}",
+                time=time_ms - late_ms,
+                platform="kraken",
+                side=rng.choice([0, 1]),
+                orderType=rng.choice([0, 1]),
+            )
+        )
+    values = [msgspec.json.encode(trade) for trade in trades]
+
+    streamed = TradeWindowCascade(WINDOW_SIZES_MS)
+    expected = [win for trade in trades for win in streamed.handle(trade)]
+
+    batched = TradeWindowCascade(WINDOW_SIZES_MS)
+    actual = []
+    for i in range(0, len(values), 1000):
+        actual.extend(batched.handle_batch(decode_trade_columns(values[i : i + 1000])))
+
+    actual_windows = {(size, start): aggregate for size, (start, aggregate) in actual}
+    assert len(actual_windows) == len(actual)
+    assert actual_windows.keys() == {(size, start) for size, (start, _) in expected}
+    for size, (start, aggregate) in expected:
+        actual_fields = msgspec.structs.asdict(actual_windows[(size, start)])
+        for name, value in msgspec.structs.asdict(aggregate).items():
+            if isinstance(value, bytes):
+                assert actual_fields[name] == value, (size, start, name)
+                continue
+            assert math.isclose(actual_fields[name], value, rel_tol=1e-9, abs_tol=1e-12), (
+                size,
+                start,
+                name,
+            )
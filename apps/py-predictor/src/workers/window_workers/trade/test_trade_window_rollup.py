@@ -0,0 +1,118 @@
+import math
+import random
+from bisect import bisect_left
+
+import msgspec
+
+from .messages import Trade
+from .trade_window_soa import TradeWindowSoA
+from .trade_window_worker import Lateness, TradeWindowCascade, WindowHandler
+
+
+def make_trades(count: int, gaps_ms: list[int]) -> list[Trade]:
+    rng = random.Random(7)
+    trades = []
+    time_ms = 1_700_000_000_000
+    price = 100.0
+    for _ in range(count):
+        time_ms += rng.choice(gaps_ms)
+        price *= math.exp(rng.gauss(0, 0.001))
+        trades.append(
+            Trade(
+                symbol="btc_usdt",
+                price=str(price),
+                quantity=str(rng.uniform(0.01, 2)),
+                time=time_ms,
+                platform="kraken",
+                side=rng.choice([0, 1]),
+                orderType=0,
+            )
+        )
+    return trades
+
+
+def assert_close(actual: dict, expected: dict, key) -> None:
+    for name, value in expected.items():
+        if isinstance(value, bytes):
+            assert actual[name] == value, (key, name)  # Merged sketches are exact
+        else:
+            assert math.isclose(actual[name], value, rel_tol=1e-9, abs_tol=1e-12), (key, name)
+
+
+def test_cascade_matches_windows_from_trades():
+    window_sizes_ms = [1000, 5000, 30000, 60000, 7000]
+    trades = make_trades(5000, [1, 50, 300, 2500])
+
+    cascade = TradeWindowCascade(window_sizes_ms)
+    handlers = [WindowHandler(window_size_ms) for window_size_ms in window_sizes_ms]
+    rolled_up = {}
+    expected = {}
+    for trade in trades:
+        for window_size_ms, (start, aggregate) in cascade.handle(trade):
+            rolled_up[(window_size_ms, start)] = msgspec.structs.asdict(aggregate)
+        for handler in handlers:
+            for start, aggregate in handler.handle(trade):
+                expected[(handler.window_size_ms, start)] = msgspec.structs.asdict(aggregate)
+
+    assert {size for size, _ in expected} == set(window_sizes_ms)
+    assert expected.keys() <= rolled_up.keys()
+    for key, fields in expected.items():
+        assert_close(rolled_up[key], fields, key)
+
+
+def test_hopping_windows_match_windows_from_trades():
+    trades = make_trades(3000, [1, 200, 900, 12000])
+    cascade = TradeWindowCascade([10000, 1000], hop_sizes_ms={10000: 1000})
+
+    hopping = {}
+    for trade in trades:
+        for window_size_ms, (start, aggregate) in cascade.handle(trade):
+            if window_size_ms != 10000:
+                continue
+            assert start not in hopping
+            hopping[start] = msgspec.structs.asdict(aggregate)
+
+    assert len(hopping) > 0
+    last_start = max(hopping)
+    times = [trade.time for trade in trades]
+    soa = TradeWindowSoA()
+    for start in range(min(hopping), last_start + 1, 1000):
+        soa.clear()
+        for trade in trades[bisect_left(times, start) : bisect_left(times, start + 10000)]:
+            soa.append(trade)
+        if soa.i == 0:
+            assert start not in hopping
+            continue
+        expected = msgspec.structs.asdict(soa.features(start, start + 10000))
+        assert_close(hopping[start], expected, start)
+
+
+def test_amended_windows_are_rolled_up_again():
+    trades = make_trades(2000, [20, 60])
+    late = trades[1000:1100:10]
+    """trades of closed windows, they arrive 4s late"""
+    late_times = {trade.time for trade in late}
+    arrivals = sorted(
+        trades, key=lambda trade: trade.time + (4000 if trade.time in late_times else 0)
+    )
+    window_sizes_ms = [1000, 5000, 10000]
+    hop_sizes_ms = {10000: 1000}
+
+    in_order = TradeWindowCascade(window_sizes_ms, hop_sizes_ms=hop_sizes_ms)
+    amending = TradeWindowCascade(
+        window_sizes_ms, hop_sizes_ms=hop_sizes_ms, lateness=Lateness(allowed_ms=0, amend_windows=8)
+    )
+    expected = {}
+    stored = {}
+    for trade in trades:
+        for window_size_ms, (start, aggregate) in in_order.handle(trade):
+            expected[(window_size_ms, start)] = msgspec.structs.asdict(aggregate)
+    for trade in arrivals:
+        for window_size_ms, (start, aggregate) in amending.handle(trade):
+            stored[(window_size_ms, start)] = msgspec.structs.asdict(aggregate)
+
+    assert amending.late_trades == 0
+    assert expected.keys() <= stored.keys()
+    for key, fields in expected.items():
+        assert math.isclose(stored[key]["sum_vol"], fields["sum_vol"], rel_tol=1e-9), key
+        assert stored[key]["trade_count"] == fields["trade_count"], key
@@ -0,0 +1,133 @@
+import random
+
+from .messages import Trade
+from .trade_window_batch import trade_columns
+from .trade_window_worker import Shard, TradeWindowCascade, WindowHandler, resume_shard
+
+
+def make_trade(time_ms: int, quantity: float = 1.0, price: float = 100.0) -> Trade:
+    return Trade(
+        symbol="btc_usdt",
+        price=str(price),
+        quantity=str(quantity),
+        time=time_ms,
+        platform="kraken",
+        side=0,
+        orderType=0,
+    )
+
+
+def window_counts(windows) -> dict[int, int]:
+    return {start: aggregate.trade_count for start, aggregate in windows}
+
+
+def test_out_of_order_trades_within_lateness_land_in_their_window():
+    rng = random.Random(3)
+    trades = [make_trade(time_ms) for time_ms in range(0, 20_000, 7)]
+    shuffled = list(trades)
+    for i in range(0, len(shuffled) - 100, 50):  # up to ~700ms out of order
+        j = i + rng.randrange(100)
+        shuffled[i], shuffled[j] = shuffled[j], shuffled[i]
+
+    in_order = WindowHandler(1000, allowed_lateness_ms=1000)
+    expected = [win for trade in trades for win in in_order.handle(trade)]
+    streamed = WindowHandler(1000, allowed_lateness_ms=1000)
+    actual = [win for trade in shuffled for win in streamed.handle(trade)]
+    batched = WindowHandler(1000, allowed_lateness_ms=1000)
+    actual_batched = [
+        win
+        for i in range(0, len(shuffled), 300)
+        for win in batched.handle_batch(trade_columns(shuffled[i : i + 300]))
+    ]
+
+    assert [start for start, _ in actual] == [start for start, _ in expected]
+    assert window_counts(actual) == window_counts(expected)
+    assert window_counts(actual_batched) == window_counts(expected)
+    assert streamed.late_trades == batched.late_trades == 0
+
+
+def test_trades_past_the_watermark_are_dropped_or_amend_closed_windows():
+    dropping = WindowHandler(1000, allowed_lateness_ms=0)
+    amending = WindowHandler(1000, allowed_lateness_ms=0, amend_windows=2)
+    for handler in (dropping, amending):
+        for time_ms in (100, 1100, 2100):
+            handler.handle(make_trade(time_ms))
+        assert handler.handle(make_trade(500, quantity=3.0)) == []
+
+    assert dropping.late_trades == 1
+    assert dropping.take_amended() == []
+
+    amended = amending.take_amended()
+    assert amending.late_trades == 0
+    assert [(start, aggregate.trade_count) for start, aggregate in amended] == [(0, 2)]
+    assert amended[0][1].sum_vol == 4.0
+    assert amending.take_amended() == []
+
+
+def test_time_shards_emit_the_windows_of_one_pass():
+    rng = random.Random(5)
+    trades = [
+        make_trade(time_ms, price=100.0 + rng.random())
+        for time_ms in sorted(rng.randrange(30_000) for _ in range(3000))
+    ]
+
+    def run_shard(shard: Shard, stop_ms: int | None) -> dict:
+        cascade = TradeWindowCascade([1000, 3000, 6000], hop_sizes_ms={6000: 1000})
+        shard_trades = [
+            trade
+            for trade in trades
+            if trade.time >= shard.start_ms and (stop_ms is None or trade.time < stop_ms)
+        ]
+        windows = cascade.handle_batch(trade_columns(shard_trades)) + cascade.flush()
+        return {
+            (size, start): aggregate for size, (start, aggregate) in windows if shard.owns(start)
+        }
+
+    expected = run_shard(Shard(0), None)
+    # Shards read on past their end by the largest window and its lateness
+    actual = {
+        **run_shard(Shard(0, 12_000), 12_000 + 6000 + 6000),
+        **run_shard(Shard(12_000, 21_000), 21_000 + 6000 + 6000),
+        **run_shard(Shard(21_000), None),
+    }
+
+    assert actual.keys() == expected.keys()
+    assert any(start < 12_000 < start + 6000 for size, start in expected if size == 6000)
+    for key, aggregate in expected.items():
+        assert actual[key].trade_count == aggregate.trade_count
+        assert actual[key].max_gap_ms == aggregate.max_gap_ms
+        assert abs(actual[key].sum_logret - aggregate.sum_logret) < 1e-12
+
+
+def test_resumed_cascade_does_not_overwrite_stored_windows():
+    rng = random.Random(11)
+    trades = [
+        make_trade(time_ms, price=100.0 + rng.random())
+        for time_ms in sorted(rng.randrange(90_000) for _ in range(4000))
+    ]
+
+    def run_cascade(replay: list[Trade], owner: Shard | None) -> dict:
+        cascade = TradeWindowCascade([1000, 5000, 30_000], hop_sizes_ms={30_000: 1000})
+        windows = cascade.handle_batch(trade_columns(replay))
+        return {
+            (size, start): aggregate
+            for size, (start, aggregate) in windows
+            if owner is None or owner.owns(start)
+        }
+
+    expected = run_cascade(trades, None)
+
+    # Crash mid-way, resume from the oldest checkpoint of the stored series
+    stored = run_cascade([trade for trade in trades if trade.time < 47_300], None)
+    checkpoint_ms = min(
+        max(start for size, start in stored if size == window_size_ms)
+        for window_size_ms in [1000, 5000, 30_000]
+    )
+    assert checkpoint_ms % 5000 != 0  # a 5s window crosses it
+    replay = [trade for trade in trades if trade.time > checkpoint_ms]
+    stored.update(run_cascade(replay, resume_shard(None, checkpoint_ms)))
+
+    assert stored.keys() == expected.keys()
+    for key, aggregate in expected.items():
+        assert stored[key].trade_count == aggregate.trade_count
+        assert abs(stored[key].sum_logret - aggregate.sum_logret) < 1e-12
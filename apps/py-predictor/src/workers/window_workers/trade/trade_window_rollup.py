@@ -0,0 +1,307 @@
+"""
+Coarser and hopping trade windows merged from finished finer windows instead of
+re-bucketing trades.
+
+Every TradeWindowAggregate field is mergeable. The log-return and inter-trade time sums
+of a window only cover consecutive trades inside it, so merging adds the terms between
+the close of one window and the open of the next - the result is the same as computing
+the coarse window from the raw trades (up to float summation order, the quantile sketches
+are exact).
+"""
+
+import math
+from collections import deque
+
+import msgspec
+
+from src.lib import quantile_sketch
+
+from .messages import TradeWindowAggregate
+
+
+def merge_trade_aggregate_into(
+    acc: TradeWindowAggregate, later: TradeWindowAggregate, merge_sketches: bool = True
+) -> None:
+    """
+    Merge a non-empty window following acc (also non-empty) into acc. Without
+    merge_sketches the caller merges the quantile sketches (see RollupWindowHandler).
+    """
+    if acc.close > 0.0 and later.open > 0.0:
+        logret = math.log(later.open) - math.log(acc.close)
+        acc.sum_logret += later.sum_logret + logret
+        acc.sum_logret2 += later.sum_logret2 + logret * logret
+        acc.sum_logret3 += later.sum_logret3 + logret * logret * logret
+    else:
+        # Same as features(), returns touching a nonpositive price are skipped
+        acc.sum_logret += later.sum_logret
+        acc.sum_logret2 += later.sum_logret2
+        acc.sum_logret3 += later.sum_logret3
+
+    gap_ms = later.first_ts - acc.last_ts
+    acc.sum_dt += later.sum_dt + gap_ms
+    acc.max_gap_ms = max(acc.max_gap_ms, later.max_gap_ms, gap_ms)
+
+    acc.trade_count += later.trade_count
+    acc.sum_vol += later.sum_vol
+    acc.sum_pv += later.sum_pv
+    acc.buy_vol += later.buy_vol
+    acc.sell_vol += later.sell_vol
+    acc.sum_price += later.sum_price
+    acc.sum_price2 += later.sum_price2
+    acc.high = max(acc.high, later.high)
+    acc.low = min(acc.low, later.low)
+    acc.close = later.close
+    acc.min_size = min(acc.min_size, later.min_size)
+    acc.max_size = max(acc.max_size, later.max_size)
+    acc.last_ts = later.last_ts
+    if merge_sketches:
+        acc.price_sketch = quantile_sketch.merge(acc.price_sketch, later.price_sketch)
+        acc.size_sketch = quantile_sketch.merge(acc.size_sketch, later.size_sketch)
+
+
+def merge_trade_aggregates(
+    earlier: TradeWindowAggregate, later: TradeWindowAggregate
+) -> TradeWindowAggregate:
+    merged = msgspec.structs.replace(earlier)
+    merge_trade_aggregate_into(merged, later)
+    return merged
+
+
+def merge_trade_aggregate_list(aggregates: list[TradeWindowAggregate]) -> TradeWindowAggregate:
+    """Merge of non-empty windows in order, each following the one before"""
+    merged = msgspec.structs.replace(aggregates[0])
+    for aggregate in aggregates[1:]:
+        merge_trade_aggregate_into(merged, aggregate, merge_sketches=False)
+    merged.price_sketch = quantile_sketch.merge_many([a.price_sketch for a in aggregates])
+    merged.size_sketch = quantile_sketch.merge_many([a.size_sketch for a in aggregates])
+    return merged
+
+
+def replace_window(
+    windows: "list[tuple[int, TradeWindowAggregate]] | deque[tuple[int, TradeWindowAggregate]]",
+    window_start: int,
+    aggregate: TradeWindowAggregate,
+) -> bool:
+    """Put aggregate in place of the window of windows starting at window_start"""
+    for i, (start, _) in enumerate(windows):
+        if start == window_start:
+            windows[i] = (window_start, aggregate)
+            return True
+    return False
+
+
+class RollupWindowHandler:
+    """
+    Window of window_size_ms built from the finished (non-empty, in order) windows of a
+    size dividing it. Emits like WindowHandler: (window_start, aggregate) once a window of
+    the next coarse window arrives.
+
+    amend_windows
+        emitted windows whose finer windows are kept, `amend_window` merges them again
+    """
+
+    def __init__(self, window_size_ms: int, amend_windows: int = 0):
+        self.window_size_ms = window_size_ms
+        self.current_window_start: int | None = None
+        self.current: TradeWindowAggregate | None = None
+        self.windows: list[tuple[int, TradeWindowAggregate]] = []
+        """(window_start, aggregate) of the finer windows of current, their sketches are
+        merged once it is emitted"""
+        self.emitted: deque[tuple[int, list[tuple[int, TradeWindowAggregate]]]] = deque(
+            maxlen=amend_windows
+        )
+        """(coarse window start, its finer windows) of the last emitted windows"""
+
+    def _emit(self) -> tuple[int, TradeWindowAggregate]:
+        assert self.current is not None and self.current_window_start is not None
+        self.current.price_sketch = quantile_sketch.merge_many(
+            [aggregate.price_sketch for _, aggregate in self.windows]
+        )
+        self.current.size_sketch = quantile_sketch.merge_many(
+            [aggregate.size_sketch for _, aggregate in self.windows]
+        )
+        self.emitted.append((self.current_window_start, self.windows))
+        return (self.current_window_start, self.current)
+
+    def handle_window(
+        self, window_start: int, aggregate: TradeWindowAggregate
+    ) -> None | tuple[int, TradeWindowAggregate]:
+        coarse_start = (window_start // self.window_size_ms) * self.window_size_ms
+
+        result = None
+        if self.current is not None and self.current_window_start is not None:
+            if coarse_start == self.current_window_start:
+                merge_trade_aggregate_into(self.current, aggregate, merge_sketches=False)
+                self.windows.append((window_start, aggregate))
+                return None
+            if coarse_start < self.current_window_start:
+                return None  # Its coarse window was already emitted
+            result = self._emit()
+
+        self.current_window_start = coarse_start
+        self.current = msgspec.structs.replace(aggregate)
+        self.windows = [(window_start, aggregate)]
+        return result
+
+    def amend_window(
+        self, window_start: int, aggregate: TradeWindowAggregate
+    ) -> None | tuple[int, TradeWindowAggregate]:
+        """
+        A finer window emitted again with late trades. Returns its coarse window to emit
+        again, None while it is still current (or no longer kept).
+        """
+        coarse_start = (window_start // self.window_size_ms) * self.window_size_ms
+        if coarse_start == self.current_window_start and self.current is not None:
+            if replace_window(self.windows, window_start, aggregate):
+                self.current = merge_trade_aggregate_list([a for _, a in self.windows])
+            return None
+        for emitted_start, windows in self.emitted:
+            if emitted_start == coarse_start and replace_window(windows, window_start, aggregate):
+                return (coarse_start, merge_trade_aggregate_list([a for _, a in windows]))
+        return None
+
+    def flush(self) -> None | tuple[int, TradeWindowAggregate]:
+        """The current coarse window as is, at the end of a bounded replay"""
+        if self.current is None or self.current_window_start is None:
+            return None
+        result = self._emit()
+        self.current = None
+        self.windows = []
+        return result
+
+
+class HoppingWindowHandler:
+    """
+    Windows of window_size_ms starting every hop_ms, built from the finished (non-empty, in
+    order) windows of hop_ms called slices. Emits (window_start, aggregate) for every hop
+    whose window holds at least one slice, once the window is complete.
+
+    Slices sit in a two-stack queue: the back stack keeps one running aggregate of its
+    slices, the front stack keeps for each slice the aggregate from it to the newest slice
+    of the stack. A window is then one merge of the two, evicting is a pop and the stacks
+    are rebuilt once per slice, so the cost per window does not depend on the overlap.
+
+    amend_windows
+        slices that may be emitted again with late trades, see `amend_window`
+    """
+
+    def __init__(self, window_size_ms: int, hop_ms: int, amend_windows: int = 0):
+        if hop_ms <= 0 or window_size_ms % hop_ms != 0:
+            raise ValueError(f"hop {hop_ms}ms does not divide the window {window_size_ms}ms")
+        self.window_size_ms = window_size_ms
+        self.hop_ms = hop_ms
+        self.recent: deque[tuple[int, TradeWindowAggregate]] = deque(
+            maxlen=window_size_ms // hop_ms + amend_windows if amend_windows else 0
+        )
+        """(slice_start, aggregate) of the last slices, enough for the windows holding any
+        of the last amend_windows slices"""
+        self.front: list[tuple[int, TradeWindowAggregate]] = []
+        """(slice_start, aggregate of it up to the newest front slice), oldest last"""
+        self.back: list[tuple[int, TradeWindowAggregate]] = []
+        self.back_aggregate: TradeWindowAggregate | None = None
+        self.next_window_end: int | None = None
+
+    def _push(self, slice_start: int, aggregate: TradeWindowAggregate) -> None:
+        self.back.append((slice_start, aggregate))
+        if self.back_aggregate is None:
+            self.back_aggregate = msgspec.structs.replace(aggregate)
+        else:
+            merge_trade_aggregate_into(self.back_aggregate, aggregate)
+
+    def _evict_before(self, window_start: int) -> None:
+        while True:
+            if not self.front:
+                if not self.back:
+                    return
+                # Move the back stack over, newest first
+                acc: TradeWindowAggregate | None = None
+                for slice_start, aggregate in reversed(self.back):
+                    acc = aggregate if acc is None else merge_trade_aggregates(aggregate, acc)
+                    self.front.append((slice_start, acc))
+                self.back.clear()
+                self.back_aggregate = None
+
+            if self.front[-1][0] >= window_start:
+                return
+            self.front.pop()
+
+    def _aggregate(self) -> TradeWindowAggregate | None:
+        if not self.front:
+            return msgspec.structs.replace(self.back_aggregate) if self.back_aggregate else None
+        if self.back_aggregate is None:
+            return msgspec.structs.replace(self.front[-1][1])
+        return merge_trade_aggregates(self.front[-1][1], self.back_aggregate)
+
+    def _emit(self, window_end: int, finished: list[tuple[int, TradeWindowAggregate]]) -> None:
+        window_start = window_end - self.window_size_ms
+        self._evict_before(window_start)
+        aggregate = self._aggregate()
+        if aggregate is not None:
+            finished.append((window_start, aggregate))
+
+    def handle_window(
+        self, slice_start: int, aggregate: TradeWindowAggregate
+    ) -> list[tuple[int, TradeWindowAggregate]]:
+        finished: list[tuple[int, TradeWindowAggregate]] = []
+        if self.next_window_end is not None:
+            if slice_start + self.hop_ms < self.next_window_end:
+                return finished  # Its windows were already emitted
+
+            # Windows ending in the empty slices before this one, while they hold any slice
+            while self.next_window_end <= slice_start and (self.front or self.back):
+                self._emit(self.next_window_end, finished)
+                self.next_window_end += self.hop_ms
+
+        self._push(slice_start, aggregate)
+        self.recent.append((slice_start, aggregate))
+        window_end = slice_start + self.hop_ms
+        self._emit(window_end, finished)
+        self.next_window_end = window_end + self.hop_ms
+        return finished
+
+    def amend_window(
+        self, slice_start: int, aggregate: TradeWindowAggregate
+    ) -> list[tuple[int, TradeWindowAggregate]]:
+        """
+        A slice emitted again with late trades. Returns the emitted windows holding it,
+        merged again, the windows still to come hold the amended slice.
+        """
+        finished: list[tuple[int, TradeWindowAggregate]] = []
+        if self.next_window_end is None or not replace_window(self.recent, slice_start, aggregate):
+            return finished
+
+        last_window_end = self.next_window_end - self.hop_ms
+        last_window_start = last_window_end - self.window_size_ms
+        for window_end in range(
+            slice_start + self.hop_ms,
+            min(slice_start + self.window_size_ms, last_window_end) + 1,
+            self.hop_ms,
+        ):
+            window_start = window_end - self.window_size_ms
+            finished.append(
+                (
+                    window_start,
+                    merge_trade_aggregate_list(
+                        [a for start, a in self.recent if window_start <= start < window_end]
+                    ),
+                )
+            )
+
+        # The stacks hold the slices of the last window on
+        self.front.clear()
+        self.back.clear()
+        self.back_aggregate = None
+        for start, slice_aggregate in self.recent:
+            if start >= last_window_start:
+                self._push(start, slice_aggregate)
+        return finished
+
+    def flush(self) -> list[tuple[int, TradeWindowAggregate]]:
+        """The windows still holding slices as is, at the end of a bounded replay"""
+        finished: list[tuple[int, TradeWindowAggregate]] = []
+        if self.next_window_end is None:
+            return finished
+        while self.front or self.back:
+            self._emit(self.next_window_end, finished)
+            self.next_window_end += self.hop_ms
+        return finished
@@ -2,10 +2,13 @@ from array import array
 
 import numpy as np
 
+from src.lib import quantile_sketch
+
 from .messages import (
     Trade,
     TradeWindowAggregate,
 )
+from .trade_window_batch import TradeColumns
 
 
 class TradeWindowSoA:
@@ -25,6 +28,11 @@ class TradeWindowSoA:
         self.i = 0
 
     def append(self, trade: Trade):
+        self.append_values(
+            trade.time, float(trade.price), float(trade.quantity), trade.side, trade.orderType
+        )
+
+    def append_values(self, ts: int, price: float, qty: float, side: int, order_type: int):
         if self.i == len(self.ts):  # grow by 2x
             grow = len(self.ts)
             self.ts.extend([0] * grow)
@@ -33,13 +41,31 @@ class TradeWindowSoA:
             self.side.extend([0] * grow)
             self.order_type.extend([0] * grow)
         idx = self.i
-        self.ts[idx] = trade.time
-        self.price_u[idx] = float(trade.price)
-        self.qty_u[idx] = float(trade.quantity)
-        self.side[idx] = trade.side
-        self.order_type[idx] = trade.orderType
+        self.ts[idx] = ts
+        self.price_u[idx] = price
+        self.qty_u[idx] = qty
+        self.side[idx] = side
+        self.order_type[idx] = order_type
         self.i += 1
 
+    def append_columns(self, columns: TradeColumns):
+        n = len(columns)
+        grow = max(0, self.i + n - len(self.ts))
+        if grow > 0:
+            grow = max(grow, len(self.ts))
+            self.ts.extend([0] * grow)
+            self.price_u.extend([0] * grow)
+            self.qty_u.extend([0] * grow)
+            self.side.extend([0] * grow)
+            self.order_type.extend([0] * grow)
+        start, end = self.i, self.i + n
+        np.frombuffer(memoryview(self.ts), dtype=np.int64)[start:end] = columns.ts
+        np.frombuffer(memoryview(self.price_u), dtype=np.float64)[start:end] = columns.price
+        np.frombuffer(memoryview(self.qty_u), dtype=np.float64)[start:end] = columns.quantity
+        np.frombuffer(memoryview(self.side), dtype=np.uint8)[start:end] = columns.side
+        np.frombuffer(memoryview(self.order_type), dtype=np.uint8)[start:end] = columns.order_type
+        self.i = end
+
     def clear(self):
         self.i = 0
         return self
@@ -83,8 +109,8 @@ class TradeWindowSoA:
                 last_ts=window_start,
                 sum_dt=0,
                 max_gap_ms=0,
-                # price_sketch=price_sketch,
-                # size_sketch=size_sketch,
+                price_sketch=None,
+                size_sketch=None,
             )
 
         # ---- core sums (avoid large temporaries) ----
@@ -155,6 +181,6 @@ class TradeWindowSoA:
             last_ts=last_ts,
             sum_dt=sum_dt,
             max_gap_ms=max_gap_ms,
-            # price_sketch=price_sketch,
-            # size_sketch=size_sketch,
+            price_sketch=quantile_sketch.from_values(price),
+            size_sketch=quantile_sketch.from_values(quantity),
         )
@@ -1,18 +1,20 @@
 import asyncio
-import time
-from collections.abc import Callable
+import os
+from collections import deque
+from collections.abc import Awaitable, Callable
 from dataclasses import dataclass
-from multiprocessing import Process
-from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.connection import Connection
 from multiprocessing.synchronize import Event as EventType
 
+import numpy as np
 import zmq.asyncio
 
+from src.lib import time_index
 from src.lib.rocks_db_log import RocksdbLog
 from src.lib.worker import ring_buffer
+from src.lib.worker.ring_writer import RingWriter
 from src.lib.zeromq_subscriber import (
     IsStopped,
-    TradeWithId,
     consume_trades_consistently,
 )
 
@@ -20,31 +22,96 @@ from ..messages import Platform, WindowKeyParts, WindowKind, pack_window_key
 from .messages import (
     Trade,
     TradeWindowAggregate,
-    trade_decoder,
     trade_window_aggregate_encoder,
 )
+from .trade_window_batch import (
+    TradeColumns,
+    decode_trade_columns,
+    segment_starts,
+    trade_columns,
+    window_aggregates,
+)
+from .trade_window_rollup import HoppingWindowHandler, RollupWindowHandler
 from .trade_window_soa import TradeWindowSoA
 
 EmitWindow = Callable[[str, int, tuple[int, TradeWindowAggregate] | None], None]
+FlushWindows = Callable[[], Awaitable[None]]
+
+WRITE_BATCH_SIZE = 256
+"""Windows collected before they are published to the ring buffer in one write_many"""
+
+
+@dataclass(frozen=True)
+class Lateness:
+    allowed_ms: int | None = None
+    """event time a window stays open past its end, None for one window size"""
+    amend_windows: int = 0
+    """
+    closed windows kept per size to re-emit with late trades, 0 drops late trades. Coarser
+    and hopping windows built from an amended window are re-emitted too.
+    """
+
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    Time range of a backfill split across workers, the worker only emits the windows
+    starting in [start_ms, end_ms). A shard with an end reads on past it until its windows
+    are complete and then exits, windows crossing a boundary are computed from the trades
+    on both sides by the shard they start in. The last shard (no end) continues live.
+    """
+
+    start_ms: int
+    end_ms: int | None = None
+
+    def owns(self, window_start: int) -> bool:
+        return self.start_ms <= window_start and (self.end_ms is None or window_start < self.end_ms)
+
+
+def resume_shard(shard: Shard | None, checkpoint_ms: int | None) -> Shard | None:
+    """
+    Windows to emit when replaying from checkpoint_ms: those of shard starting after it.
+    Windows up to the checkpoint were stored complete by an earlier run, the replay only
+    holds their trades after it (coarse and hopping windows crossing it included).
+    """
+    if not checkpoint_ms:
+        return shard
+    if shard is None:
+        return Shard(checkpoint_ms + 1)
+    return Shard(max(shard.start_ms, checkpoint_ms + 1), shard.end_ms)
 
 
 def run(
     shm_data_name: str,
     shm_index_name: str,
+    not_empty_sender: Connection,
+    not_full_receiver: Connection,
     rocksdb_path: str,
     platform_str: str,
     symbols: list[str],
     window_sizes_ms: list[int],
     checkpoint_ms: dict[str, int | None],
     shutdown_event: EventType | None = None,
+    hop_sizes_ms: dict[int, int] | None = None,
+    lateness: Lateness | None = None,
+    shard: Shard | None = None,
 ):
-    shm_data, shm_index, size, mask = ring_buffer.init(
+    """
+    hop_sizes_ms
+        window size -> hop for hopping windows, see TradeWindowCascade
+    lateness
+        allowed lateness of trades and amended windows, see WindowHandler
+    shard
+        time shard of a split backfill (a single symbol), see Shard
+    """
+    shm_data, shm_index, size, mask = ring_buffer.attach(
         shm_data_name=shm_data_name, shm_index_name=shm_index_name
     )
     data_buf = shm_data.buf
     index_buf = shm_index.buf
     if data_buf is None or index_buf is None:
         raise RuntimeError("Shared buffer does not exist")
+    ring_buffer.set_producer_pid(index_buf, os.getpid())
 
     platform = Platform[platform_str]
 
@@ -53,61 +120,80 @@ def run(
     worker_id = f"{platform_str}-trade-{symbols_str}-{window_sizes_str}"
 
     storages: dict[str, RocksdbLog] = {}
-    window_handlers: dict[str, list[WindowHandler]] = {}
+    window_handlers: dict[str, TradeWindowCascade] = {}
+    owners = {symbol: resume_shard(shard, checkpoint_ms.get(symbol)) for symbol in symbols}
 
     for symbol in symbols:
         storage = RocksdbLog(base_dir=rocksdb_path, db_name=symbol, writable=False)
         storage.init()
         storages[symbol] = storage
-        window_handlers[symbol] = [
-            WindowHandler(window_size_ms=window_size_ms) for window_size_ms in window_sizes_ms
-        ]
+        window_handlers[symbol] = TradeWindowCascade(window_sizes_ms, hop_sizes_ms, lateness)
 
     def is_stopped() -> bool:
+        # The stop flag reaches workers re-attached by a restarted coordinator
+        if ring_buffer.is_stop_requested(index_buf):
+            return True
         return shutdown_event is not None and shutdown_event.is_set()
 
     count = 0
+    live = False
+    writer = RingWriter(
+        data_buf=data_buf,
+        index_buf=index_buf,
+        mask=mask,
+        not_empty_sender=not_empty_sender,
+        not_full_receiver=not_full_receiver,
+    )
+
+    async def flush_windows():
+        # Keep reading the sockets while the ring is full, only wait once the spill is full
+        writer.try_flush()
+        if writer.is_over_limit():
+            await writer.make_room(is_stopped)
 
     def emit_window(symbol: str, window_size_ms: int, win: tuple[int, TradeWindowAggregate] | None):
         nonlocal count
-        if win is None:
+        owner = owners[symbol]
+        if win is None or (owner is not None and not owner.owns(win[0])):
             return
 
         count = count + 1
-        data = trade_window_aggregate_encoder.encode(win[1])
-        written = False
-
-        while not written and not is_stopped():
-            written = ring_buffer.write(
-                data_buf=data_buf,
-                index_buf=index_buf,
-                mask=mask,
-                key=pack_window_key(
-                    WindowKeyParts(
-                        window_end_ms=win[0],
-                        symbol=symbol,
-                        kind=WindowKind.trade,
-                        window_size_ms=window_size_ms,
-                        platform=platform,
-                    )
-                ),
-                value=data,
-            )
-            if written is False:
-                time.sleep(0.01)
+        writer.append(
+            pack_window_key(
+                WindowKeyParts(
+                    window_end_ms=win[0],
+                    symbol=symbol,
+                    kind=WindowKind.trade,
+                    window_size_ms=window_size_ms,
+                    platform=platform,
+                )
+            ),
+            trade_window_aggregate_encoder.encode(win[1]),
+        )
+
+        if len(writer) >= WRITE_BATCH_SIZE:
+            writer.try_flush()
+        if not live and writer.is_over_limit():
+            # Catch-up from storage has nothing else to do, wait for the coordinator
+            writer.flush(is_stopped)
 
         if count % 10000 == 0:
             print(f"[worker {worker_id}] write window {count}")
 
     async def run_all_from_socket():
+        nonlocal live
+        live = True
         zmq_context = zmq.asyncio.Context()
         tasks = [
+            writer.run_flusher(is_stopped),
+        ] + [
             run_from_socket(
                 platform=platform_str,
                 symbol=symbol,
                 storage=storages[symbol],
                 window_handlers=window_handlers[symbol],
                 emit_window=lambda s, ws, win, sym=symbol: emit_window(sym, ws, win),
+                flush_windows=flush_windows,
                 is_stopped=is_stopped,
                 checkpoint_ms=checkpoint_ms.get(symbol),
                 worker_id=worker_id,
@@ -120,6 +206,13 @@ def run(
         finally:
             zmq_context.term()
 
+    stop_ms: int | None = None
+    if shard is not None and shard.end_ms is not None:
+        # Trades of the last owned windows, up to their lateness past the largest window
+        largest_ms = max(window_sizes_ms)
+        allowed_ms = lateness.allowed_ms if lateness is not None else None
+        stop_ms = shard.end_ms + largest_ms + (largest_ms if allowed_ms is None else allowed_ms)
+
     try:
         for symbol in symbols:
             if is_stopped():
@@ -131,106 +224,61 @@ def run(
                 checkpoint_ms=checkpoint_ms.get(symbol),
                 is_stopped=is_stopped,
                 worker_id=worker_id,
+                stop_ms=stop_ms,
             )
+            if stop_ms is not None and not is_stopped():
+                for window_size_ms, win in window_handlers[symbol].flush():
+                    emit_window(symbol, window_size_ms, win)
+            writer.flush(is_stopped)
 
-        if not is_stopped():
+        if stop_ms is None and not is_stopped():
             asyncio.run(run_all_from_socket())
     finally:
         print(f"[worker {worker_id}] done")
         for storage in storages.values():
             storage.close()
+        ring_buffer.set_producer_pid(index_buf, 0)
         shm_data.close()
         shm_index.close()
 
 
-def find_first_key_after_checkpoint(storage: RocksdbLog, checkpoint_ms: int) -> bytes | None:
-    forward_iter = storage.iterate_from(None, 1)
-    reverse_iter = storage.iterate_from_end(None, 1)
-    try:
-        if not forward_iter.has_next() or not reverse_iter.has_next():
-            return None
-
-        first_batch = forward_iter.next_batch()
-        last_batch = reverse_iter.next_batch()
-
-        if not first_batch or not last_batch:
-            return None
-
-        low_key = int.from_bytes(first_batch[0][0], byteorder="big", signed=True)
-        high_key = int.from_bytes(last_batch[0][0], byteorder="big", signed=True)
-
-        first_trade = trade_decoder.decode(first_batch[0][1])
-        if first_trade.time > checkpoint_ms:
-            return None
-
-        last_trade = trade_decoder.decode(last_batch[0][1])
-        if last_trade.time <= checkpoint_ms:
-            return last_batch[0][0]
-
-    finally:
-        forward_iter.close()
-        reverse_iter.close()
-
-    result_key: bytes | None = None
-
-    while low_key <= high_key:
-        mid_key = (low_key + high_key) // 2
-        mid_key_bytes = mid_key.to_bytes(8, byteorder="big", signed=True)
-
-        mid_iter = storage.iterate_from(mid_key_bytes, 1)
-        try:
-            if not mid_iter.has_next():
-                high_key = mid_key - 1
-                continue
-
-            batch = mid_iter.next_batch()
-            if not batch:
-                high_key = mid_key - 1
-                continue
-
-            key_bytes, value_bytes = batch[0]
-            trade = trade_decoder.decode(value_bytes)
-
-            if trade.time > checkpoint_ms:
-                result_key = key_bytes
-                high_key = mid_key - 1
-            else:
-                low_key = mid_key + 1
-        finally:
-            mid_iter.close()
-
-    return result_key
-
-
 def run_from_storage(
     storage: RocksdbLog,
-    window_handlers: list["WindowHandler"],
+    window_handlers: "TradeWindowCascade",
     emit_window: EmitWindow,
     checkpoint_ms: int | None,
     is_stopped: IsStopped = lambda: False,
     worker_id: str = "",
+    stop_ms: int | None = None,
 ):
+    """
+    Replay the trades after checkpoint_ms, with stop_ms up to the first trade at or past it
+    """
     checkpoint_ms = checkpoint_ms or 0
     start_key: bytes | None = None
     if checkpoint_ms > 0:
-        start_key = find_first_key_after_checkpoint(storage, checkpoint_ms)
+        start_key = time_index.find_first_key_after(storage, checkpoint_ms)
         if start_key is not None:
-            print(f"[worker {worker_id}] binary search found start key, skipping to checkpoint")
+            print(f"[worker {worker_id}] time index found start key, skipping to checkpoint")
 
     iter = storage.iterate_from(start_key, 1_000)
 
     try:
         while iter.has_next() and not is_stopped():
             messages = iter.next_batch()
-
-            for _, value_bytes in messages:
-                if is_stopped():
-                    break
-
-                trade = trade_decoder.decode(value_bytes)
-
-                for window_handler in window_handlers:
-                    emit_window(window_handler.window_size_ms, window_handler.handle(trade))
+            columns = decode_trade_columns([value_bytes for _, value_bytes in messages])
+
+            stop_at: int | None = None
+            if stop_ms is not None:
+                past = np.flatnonzero(columns.ts >= stop_ms)
+                if len(past) > 0:
+                    stop_at = int(past[0])
+                    columns = columns.slice(0, stop_at)
+
+            for window_size_ms, win in window_handlers.handle_batch(columns):
+                emit_window(window_size_ms, win)
+            if stop_at is not None:
+                break
     finally:
         iter.close()
 
@@ -239,8 +287,9 @@ async def run_from_socket(
     platform: str,
     symbol: str,
     storage: RocksdbLog,
-    window_handlers: list["WindowHandler"],
+    window_handlers: "TradeWindowCascade",
     emit_window: EmitWindow,
+    flush_windows: FlushWindows,
     is_stopped: IsStopped,
     checkpoint_ms: int | None = None,
     worker_id: str = "",
@@ -260,27 +309,18 @@ async def run_from_socket(
             zmq_context=zmq_context,
         ):
             batch_count += 1
-            for trade_with_id in batch:
-                if trade_with_id.time <= checkpoint_ms:
-                    continue
-
-                event_count += 1
-                trade = Trade(
-                    symbol=trade_with_id.symbol,
-                    price=trade_with_id.price,
-                    quantity=trade_with_id.quantity,
-                    time=trade_with_id.time,
-                    platform=trade_with_id.platform,
-                    side=trade_with_id.side,
-                    orderType=trade_with_id.orderType,
-                    misc=trade_with_id.misc,
+            trades = [trade for trade in batch if trade.time > checkpoint_ms]
+            if trades:
+                event_count += len(trades)
+                for window_size_ms, win in window_handlers.handle_batch(trade_columns(trades)):
+                    emit_window(symbol, window_size_ms, win)
+
+                print(
+                    f"[worker {worker_id}] socket {symbol} processed {event_count} trades,"
+                    f" {window_handlers.late_trades} dropped late"
                 )
 
-                for window_handler in window_handlers:
-                    emit_window(symbol, window_handler.window_size_ms, window_handler.handle(trade))
-
-                print(f"[worker {worker_id}] socket {symbol} processed {event_count} trades")
-
+            await flush_windows()
             await asyncio.sleep(0)
 
         print(
@@ -291,145 +331,318 @@ async def run_from_socket(
 
 
 class WindowHandler:
-    def __init__(self, window_size_ms: int):
+    """
+    Tumbling windows of window_size_ms over trades in event time.
+
+    The watermark trails the newest trade time by allowed_lateness_ms (one window by
+    default) and a window stays open until the watermark passes its end, so trades that
+    arrive out of order still land in their window. Windows are emitted in order of their
+    start. A trade of a window already closed is dropped (counted in late_trades) or, with
+    amend_windows, added to one of the last amend_windows closed windows which is then
+    re-emitted by `take_amended`.
+    """
+
+    def __init__(
+        self, window_size_ms: int, allowed_lateness_ms: int | None = None, amend_windows: int = 0
+    ):
+        if allowed_lateness_ms is not None and allowed_lateness_ms < 0:
+            raise ValueError(f"allowed lateness {allowed_lateness_ms}ms is negative")
         self.window_size_ms = window_size_ms
-        self.current_window_start: int | None = None
-        self.current_window_data = TradeWindowSoA()
-        self.next_window_start: int | None = None
-        self.next_window_data = TradeWindowSoA()
-
-    def handle(self, trade: Trade) -> None | tuple[int, TradeWindowAggregate]:
-        record_time_ms = trade.time
-        window_start_incl = (record_time_ms // self.window_size_ms) * self.window_size_ms
-        result = None
-
-        if self.current_window_start is None:
-            self.current_window_start = window_start_incl
-            self.current_window_data.append(trade)
-        elif window_start_incl == self.current_window_start:
-            self.current_window_data.append(trade)
-        elif self.next_window_start is None or window_start_incl == self.next_window_start:
-            if self.next_window_start is None:
-                self.next_window_start = window_start_incl
-            self.next_window_data.append(trade)
-        elif window_start_incl > self.next_window_start:
-            if self.current_window_data.i > 0:
-                result = (
-                    self.current_window_start,
-                    self.current_window_data.features(
-                        window_start=self.current_window_start,
-                        window_end=self.current_window_start + self.window_size_ms,
-                    ),
-                )
-
-            tmp_next_window_data = self.current_window_data.clear()
-            self.current_window_start = self.next_window_start
-            self.current_window_data = self.next_window_data
-            self.next_window_start = window_start_incl
-            self.next_window_data = tmp_next_window_data
-            self.next_window_data.append(trade)
-
-        return result
-
-
-if __name__ == "__main__":
-    import asyncio
+        self.allowed_lateness_ms = (
+            window_size_ms if allowed_lateness_ms is None else allowed_lateness_ms
+        )
+        self.amend_windows = amend_windows
+        self.max_ts: int | None = None
+        self.open: dict[int, TradeWindowSoA] = {}
+        """window start -> trades of the windows the watermark has not passed"""
+        self.closed: deque[tuple[int, TradeWindowSoA]] = deque(maxlen=amend_windows)
+        self.amended: dict[int, TradeWindowSoA] = {}
+        self.free: list[TradeWindowSoA] = []
+        self.late_trades = 0
+
+    def watermark(self) -> int | None:
+        if self.max_ts is None:
+            return None
+        return self.max_ts - self.allowed_lateness_ms
+
+    def _is_closed(self, window_start: int) -> bool:
+        watermark = self.watermark()
+        return watermark is not None and window_start + self.window_size_ms <= watermark
+
+    def _window(self, window_start: int) -> TradeWindowSoA:
+        soa = self.open.get(window_start)
+        if soa is None:
+            soa = self.free.pop().clear() if self.free else TradeWindowSoA()
+            self.open[window_start] = soa
+        return soa
+
+    def _close_due(self, finished: list[tuple[int, TradeWindowAggregate]]) -> None:
+        size = self.window_size_ms
+        for window_start in sorted(start for start in self.open if self._is_closed(start)):
+            soa = self.open.pop(window_start)
+            finished.append((window_start, soa.features(window_start, window_start + size)))
+            if self.amend_windows > 0:
+                # Evicted windows are not reused, an amendment may still hold them
+                self.closed.append((window_start, soa))
+            else:
+                self.free.append(soa)
+
+    def _handle_late(
+        self,
+        window_start: int,
+        record_time_ms: int,
+        price: float,
+        qty: float,
+        side: int,
+        order_type: int,
+    ) -> None:
+        for closed_start, soa in self.closed:
+            if closed_start == window_start:
+                soa.append_values(record_time_ms, price, qty, side, order_type)
+                self.amended[window_start] = soa
+                return
+        self.late_trades += 1
+
+    def take_amended(self) -> list[tuple[int, TradeWindowAggregate]]:
+        """Closed windows that got late trades since the last call, to emit again"""
+        size = self.window_size_ms
+        amended = [
+            (window_start, soa.features(window_start, window_start + size))
+            for window_start, soa in sorted(self.amended.items(), key=lambda item: item[0])
+        ]
+        self.amended.clear()
+        return amended
 
-    @dataclass
-    class WorkerProcess:
-        id: str
-        proc: Process
-        shm_data: SharedMemory
-        shm_index: SharedMemory
-        mask: int
-        reads: int
-        done: bool
+    def handle(self, trade: Trade) -> list[tuple[int, TradeWindowAggregate]]:
+        return self.handle_values(
+            trade.time, float(trade.price), float(trade.quantity), trade.side, trade.orderType
+        )
 
-    async def read_worker_loop(workers: list[WorkerProcess]):
+    def handle_values(
+        self, record_time_ms: int, price: float, qty: float, side: int, order_type: int
+    ) -> list[tuple[int, TradeWindowAggregate]]:
+        """returns the windows the trade closed as (window_start, aggregate)"""
+        finished: list[tuple[int, TradeWindowAggregate]] = []
+        window_start = (record_time_ms // self.window_size_ms) * self.window_size_ms
+
+        if self._is_closed(window_start):
+            self._handle_late(window_start, record_time_ms, price, qty, side, order_type)
+            return finished
+
+        self._window(window_start).append_values(record_time_ms, price, qty, side, order_type)
+        if self.max_ts is None or record_time_ms > self.max_ts:
+            self.max_ts = record_time_ms
+            self._close_due(finished)
+        return finished
+
+    def _handle_rows(self, columns: TradeColumns) -> list[tuple[int, TradeWindowAggregate]]:
+        finished: list[tuple[int, TradeWindowAggregate]] = []
+        for row in zip(
+            columns.ts.tolist(),
+            columns.price.tolist(),
+            columns.quantity.tolist(),
+            columns.side.tolist(),
+            columns.order_type.tolist(),
+            strict=True,
+        ):
+            finished.extend(self.handle_values(*row))
+        return finished
+
+    def flush(self) -> list[tuple[int, TradeWindowAggregate]]:
+        """Close every open window, at the end of a bounded replay"""
+        finished: list[tuple[int, TradeWindowAggregate]] = []
+        size = self.window_size_ms
+        for window_start in sorted(self.open):
+            soa = self.open.pop(window_start)
+            finished.append((window_start, soa.features(window_start, window_start + size)))
+            self.free.append(soa)
+        return finished
+
+    def handle_batch(self, columns: TradeColumns) -> list[tuple[int, TradeWindowAggregate]]:
         """
-        Asynchronously polls a single worker's ring buffer until it has read LOOP_SIZE items.
-        Uses small async sleeps to avoid blocking the event loop.
+        Same windows as `handle` for every trade of columns in order. Batches whose window
+        ids only move forward and start in an open window are split into windows with
+        NumPy, windows they both open and close are aggregated without copying their
+        trades. Other batches (late trades) go through `handle` trade by trade.
         """
-        storage = RocksdbLog(
-            base_dir="/Users/e/taltech/loputoo/start/storage/py-predictor/dev",
-            db_name="windows",
-            writable=True,
-        )
-        reads = 0
-
-        start = time.time()
-        while True:
-            read = False
-
-            for worker in workers:
-                tup = ring_buffer.read(
-                    data_buf=worker.shm_data.buf, index_buf=worker.shm_index.buf, mask=worker.mask
-                )
-                if tup is None:
-                    continue
-                read = True
-                worker.reads = worker.reads + 1
-                reads = reads + 1
-
-                key_bytes, value_bytes = tup
-
-                storage.put(key=key_bytes, value=value_bytes)
-
-                if reads % 10000 == 0:
-                    print(f"[MAIN] read/write {reads} in {time.time() - start}s")
-
-            if not read:
-                await asyncio.sleep(0.1)
-
-    async def run_all():
-        workers: list[WorkerProcess] = []
-
-        for platform, symbol in [
-            ("binance", "eth_usdt"),
-            ("binance", "xrp_usdt"),
-            ("binance", "btc_usdt"),
-            ("binance", "trump_usdt"),
-        ]:
-            # for platform, symbol in [("binance", "eth_usdt")]:
-            worker_name = f"worker-trade-window-{platform}-{symbol}"
-            shm_data, shm_index, size, mask = ring_buffer.init(
-                shm_data_name=None, shm_index_name=None
+        if len(columns) == 0:
+            return []
+
+        size = self.window_size_ms
+        window_starts = (columns.ts // size) * size
+        if self._is_closed(int(window_starts[0])) or np.any(np.diff(window_starts) < 0):
+            return self._handle_rows(columns)
+
+        # Window ids only move forward, so no trade lands in a window closed by the batch
+        batch_max_ts = int(columns.ts.max())
+        if self.max_ts is None or batch_max_ts > self.max_ts:
+            self.max_ts = batch_max_ts
+
+        starts = segment_starts(window_starts)
+        segment_window_starts = window_starts[starts].tolist()
+        starts_list = starts.tolist()
+        ends = np.append(starts[1:], len(columns)).tolist()
+
+        # Closed windows kept for amendments need their trades, the others are aggregated
+        # straight from the columns
+        closing = [
+            k
+            for k, window_start in enumerate(segment_window_starts)
+            if self.amend_windows == 0
+            and window_start not in self.open
+            and self._is_closed(window_start)
+        ]
+        closing_set = set(closing)
+        for k, window_start in enumerate(segment_window_starts):
+            if k not in closing_set:
+                self._window(window_start).append_columns(columns.slice(starts_list[k], ends[k]))
+
+        finished: list[tuple[int, TradeWindowAggregate]] = []
+        if closing:
+            # Closed windows are a prefix of the segments, one pass covers them (and the few
+            # segments of already open windows between them)
+            first, last = closing[0], closing[-1]
+            offset = starts_list[first]
+            aggregates = window_aggregates(
+                columns.slice(offset, ends[last]), starts[first : last + 1] - offset
             )
-            p = Process(
-                target=run,
-                args=(
-                    shm_data.name,
-                    shm_index.name,
-                    f"/Users/e/taltech/loputoo/start/storage/internal-bridge/{platform}/unified/trade",
-                    platform,
-                    symbol,
-                    [1000],
-                ),
-                name=worker_name,
+            finished.extend((segment_window_starts[k], aggregates[k - first]) for k in closing)
+
+        self._close_due(finished)
+        finished.sort(key=lambda win: win[0])
+        return finished
+
+
+class TradeWindowCascade:
+    """
+    All window sizes of a symbol. Only sizes no other configured size divides are computed
+    from trades, the rest are rolled up from the largest configured size dividing them
+    (1s -> 5s -> 30s -> 60s).
+
+    hop_sizes_ms
+        window size -> hop, such windows are hopping instead of tumbling and are built from
+        the (tumbling) windows of the hop size, which are only emitted if configured too
+    lateness
+        how long windows computed from trades wait for late trades, see WindowHandler
+    """
+
+    def __init__(
+        self,
+        window_sizes_ms: list[int],
+        hop_sizes_ms: dict[int, int] | None = None,
+        lateness: Lateness | None = None,
+    ):
+        hop_sizes_ms = hop_sizes_ms or {}
+        lateness = lateness or Lateness()
+        self.emitted_sizes = set(window_sizes_ms) - hop_sizes_ms.keys()
+        sizes = sorted(self.emitted_sizes | set(hop_sizes_ms.values()))
+        self.handlers: list[WindowHandler] = []
+        self.rollups: dict[int, list[RollupWindowHandler]] = {}
+        """source window size -> rollups fed by its finished windows"""
+        self.hopping: dict[int, list[HoppingWindowHandler]] = {}
+        """hop size -> hopping windows fed by its finished windows"""
+
+        for window_size_ms in set(window_sizes_ms) & hop_sizes_ms.keys():
+            hop_ms = hop_sizes_ms[window_size_ms]
+            self.hopping.setdefault(hop_ms, []).append(
+                HoppingWindowHandler(window_size_ms, hop_ms, lateness.amend_windows)
             )
 
-            workers.append(
-                WorkerProcess(
-                    id=worker_name,
-                    proc=p,
-                    shm_data=shm_data,
-                    shm_index=shm_index,
-                    mask=mask,
-                    reads=0,
-                    done=False,
+        for size in sizes:
+            divisors = [other for other in sizes if other < size and size % other == 0]
+            if divisors:
+                self.rollups.setdefault(max(divisors), []).append(
+                    RollupWindowHandler(size, lateness.amend_windows)
+                )
+            else:
+                self.handlers.append(
+                    WindowHandler(size, lateness.allowed_ms, lateness.amend_windows)
                 )
-            )
-
-        for w in workers:
-            w.proc.start()
-
-        await read_worker_loop(workers)
-
-        for w in workers:
-            w.proc.join()
-            w.shm_data.close()
-            w.shm_data.unlink()
-            w.shm_index.close()
-            w.shm_index.unlink()
 
-    asyncio.run(run_all())
+    def handle(self, trade: Trade) -> list[tuple[int, tuple[int, TradeWindowAggregate]]]:
+        """returns the finished windows as (window_size_ms, (window_start, aggregate))"""
+        finished: list[tuple[int, tuple[int, TradeWindowAggregate]]] = []
+        for handler in self.handlers:
+            for win in handler.handle(trade):
+                self._roll_up(handler.window_size_ms, win, finished)
+        self._take_amended(finished)
+        return finished
+
+    def handle_batch(
+        self, columns: TradeColumns
+    ) -> list[tuple[int, tuple[int, TradeWindowAggregate]]]:
+        """`handle` for a batch of trades, see WindowHandler.handle_batch"""
+        finished: list[tuple[int, tuple[int, TradeWindowAggregate]]] = []
+        for handler in self.handlers:
+            for win in handler.handle_batch(columns):
+                self._roll_up(handler.window_size_ms, win, finished)
+        self._take_amended(finished)
+        return finished
+
+    def flush(self) -> list[tuple[int, tuple[int, TradeWindowAggregate]]]:
+        """
+        Emit every window still open or partly rolled up, at the end of a bounded replay
+        (see Shard). Finer windows go first so each rollup has all of its windows.
+        """
+        finished: list[tuple[int, tuple[int, TradeWindowAggregate]]] = []
+        for handler in self.handlers:
+            for win in handler.flush():
+                self._roll_up(handler.window_size_ms, win, finished)
+        self._take_amended(finished)
+
+        rollups = [rollup for size_rollups in self.rollups.values() for rollup in size_rollups]
+        for rollup in sorted(rollups, key=lambda rollup: rollup.window_size_ms):
+            coarse = rollup.flush()
+            if coarse is not None:
+                self._roll_up(rollup.window_size_ms, coarse, finished)
+
+        for size_hopping in self.hopping.values():
+            for hopping in size_hopping:
+                for hop_win in hopping.flush():
+                    finished.append((hopping.window_size_ms, hop_win))
+        return finished
+
+    @property
+    def late_trades(self) -> int:
+        return sum(handler.late_trades for handler in self.handlers)
+
+    def _take_amended(self, finished: list[tuple[int, tuple[int, TradeWindowAggregate]]]) -> None:
+        """
+        Amended windows replace the emitted ones under the same key, as do the coarser and
+        hopping windows built from them
+        """
+        for handler in self.handlers:
+            for win in handler.take_amended():
+                self._amend(handler.window_size_ms, win, finished)
+
+    def _amend(
+        self,
+        window_size_ms: int,
+        win: tuple[int, TradeWindowAggregate],
+        finished: list[tuple[int, tuple[int, TradeWindowAggregate]]],
+    ) -> None:
+        if window_size_ms in self.emitted_sizes:
+            finished.append((window_size_ms, win))
+        for rollup in self.rollups.get(window_size_ms, ()):
+            coarse = rollup.amend_window(*win)
+            if coarse is not None:
+                self._amend(rollup.window_size_ms, coarse, finished)
+        for hopping in self.hopping.get(window_size_ms, ()):
+            for hop_win in hopping.amend_window(*win):
+                finished.append((hopping.window_size_ms, hop_win))
+
+    def _roll_up(
+        self,
+        window_size_ms: int,
+        win: tuple[int, TradeWindowAggregate],
+        finished: list[tuple[int, tuple[int, TradeWindowAggregate]]],
+    ) -> None:
+        if window_size_ms in self.emitted_sizes:
+            finished.append((window_size_ms, win))
+        for rollup in self.rollups.get(window_size_ms, ()):
+            coarse = rollup.handle_window(*win)
+            if coarse is not None:
+                self._roll_up(rollup.window_size_ms, coarse, finished)
+        for hopping in self.hopping.get(window_size_ms, ()):
+            for hop_win in hopping.handle_window(*win):
+                finished.append((hopping.window_size_ms, hop_win))
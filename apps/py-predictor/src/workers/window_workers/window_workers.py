@@ -1,40 +1,113 @@
 import asyncio
 import os
+import signal
 import time
 from collections.abc import Callable
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 from multiprocessing import Event, Process
+from multiprocessing.connection import Connection
 from multiprocessing.shared_memory import SharedMemory
 from multiprocessing.synchronize import Event as EventType
 
-from src.lib.rocks_db_log import RocksdbLog
-from src.lib.worker import ring_buffer
-
-from .messages import WindowKind, unpack_window_key
+import msgspec
+
+from src.lib.fixed_point import Scale
+from src.lib.json_state import load_json_state, save_json_state
+from src.lib.rocks_db_log import RocksdbLog, normalize_sub_index
+from src.lib.worker import ring_buffer, ring_metrics, ring_signal
+from src.lib.worker.ring_metrics import RingBufferMetrics
+from src.lib.worker.worker_metrics import WorkerMetrics
+
+from . import backfill
+from .control import AddSeries, RemoveSeries, WindowWorkersControl
+from .messages import (
+    CHECKPOINT_KEY_PREFIX,
+    CHECKPOINT_VALUE_FMT,
+    Platform,
+    WindowKeyParts,
+    WindowKind,
+    is_checkpoint_key,
+    pack_checkpoint_key,
+    pack_window_key,
+    unpack_window_key,
+)
 from .order import order_window_worker
+from .ring_sizing import RingUsage, choose_ring_size, ring_usage_decoder
+from .storage_writer import WindowStorageWriter
 from .trade import trade_window_worker
 
 IsStopped = Callable[[], bool]
 
 
+@dataclass
+class WorkerConfig:
+    platform: str
+    kind: WindowKind
+    symbols: list[str]
+    window_sizes_ms: list[int]
+    checkpoint_ms: dict[str, int | None]
+    hop_sizes_ms: dict[int, int] = field(default_factory=dict)
+    """window size -> hop for hopping windows, trade workers only"""
+    shard: trade_window_worker.Shard | None = None
+    """time shard of a split backfill, trade workers only (see split_backfill)"""
+    symbol_scales: dict[str, Scale] = field(default_factory=dict)
+    """fixed-point scale per symbol (DEFAULT_SCALE if missing), order workers only"""
+    ladder_symbols: list[str] = field(default_factory=list)
+    """symbols whose books are kept on a price ladder, order workers only"""
+
+
+def get_hop_sizes(
+    kind: WindowKind, window_sizes_ms: list[int], hop_sizes_ms: dict[int, int] | None
+) -> dict[int, int]:
+    if kind != WindowKind.trade or not hop_sizes_ms:
+        return {}
+    return {size: hop_sizes_ms[size] for size in window_sizes_ms if size in hop_sizes_ms}
+
+
+def get_symbol_scales(
+    kind: WindowKind, symbols: list[str], symbol_scales: dict[str, Scale] | None
+) -> dict[str, Scale]:
+    if kind != WindowKind.order or not symbol_scales:
+        return {}
+    return {symbol: symbol_scales[symbol] for symbol in symbols if symbol in symbol_scales}
+
+
+def get_ladder_symbols(
+    kind: WindowKind, symbols: list[str], ladder_symbols: set[str] | None
+) -> list[str]:
+    if kind != WindowKind.order or not ladder_symbols:
+        return []
+    return [symbol for symbol in symbols if symbol in ladder_symbols]
+
+
 @dataclass
 class WorkerProcess:
     id: str
-    proc: Process
+    proc: Process | None
+    """None for a worker re-attached from a previous coordinator run"""
     shm_data: SharedMemory
     shm_index: SharedMemory
+    channels: ring_signal.RingChannels
     mask: int
     reads: int
     done: bool
+    high_watermark: int = 0
+    """highest bytes_used seen while reading, persisted to size the ring of the next run"""
+    config: WorkerConfig | None = None
+    """None if the worker can not be restarted"""
+    started_at: float = 0.0
+    crashes: int = 0
+    """consecutive crashes, the restart backoff grows with it"""
+    restart_at: float | None = None
 
 
-@dataclass
-class WorkerConfig:
-    platform: str
-    kind: WindowKind
-    symbols: list[str]
-    window_sizes_ms: list[int]
-    checkpoint_ms: dict[str, int | None]
+SeriesKey = tuple[str, str, WindowKind]
+"""(platform, symbol, kind)"""
+
+
+def get_raw_storage_path(raw_storage_base_dir: str, platform: str, kind: WindowKind) -> str:
+    sub_dir = "trade" if kind == WindowKind.trade else "order_book"
+    return os.path.join(raw_storage_base_dir, platform, "unified", sub_dir)
 
 
 def get_checkpoint_key(platform: str, symbol: str, kind: str, window_size_ms: int) -> str:
@@ -43,28 +116,100 @@ def get_checkpoint_key(platform: str, symbol: str, kind: str, window_size_ms: in
 
 def get_worker_id(config: WorkerConfig) -> str:
     symbols_str = "_".join(sorted(config.symbols))
-    windows_str = "_".join(str(w) for w in sorted(config.window_sizes_ms))
-    return f"{config.platform}-{config.kind.name}-{symbols_str}-{windows_str}"
+    windows_str = "_".join(
+        f"{w}h{config.hop_sizes_ms[w]}" if w in config.hop_sizes_ms else str(w)
+        for w in sorted(config.window_sizes_ms)
+    )
+    worker_id = f"{config.platform}-{config.kind.name}-{symbols_str}-{windows_str}"
+    if config.shard is not None and config.shard.end_ms is not None:
+        # The last shard continues live in the ring of the unsplit worker
+        worker_id += f"-to{config.shard.end_ms}"
+    return worker_id
+
+
+def get_series_keys(config: WorkerConfig) -> set[bytes]:
+    """Window keys without window_end_ms of the series of config, see WindowStorageWriter"""
+    return {
+        pack_window_key(
+            WindowKeyParts(
+                window_end_ms=0,
+                symbol=symbol,
+                kind=config.kind,
+                window_size_ms=window_size_ms,
+                platform=Platform[config.platform],
+            )
+        )[8:]
+        for symbol in config.symbols
+        for window_size_ms in config.window_sizes_ms
+    }
+
+
+def split_backfill(
+    config: WorkerConfig, max_shards: int, raw_storage_base_dir: str
+) -> list[WorkerConfig]:
+    """
+    Time shards of the backfill of a trade worker of one symbol (see backfill), the last
+    one continues live. Just config for other workers and backfills too short to split.
+    """
+    if max_shards <= 1 or config.kind != WindowKind.trade or len(config.symbols) != 1:
+        return [config]
+
+    symbol = config.symbols[0]
+    checkpoint_ms = config.checkpoint_ms.get(symbol)
+    storage = RocksdbLog(
+        base_dir=get_raw_storage_path(raw_storage_base_dir, config.platform, config.kind),
+        db_name=symbol,
+        writable=False,
+    )
+    storage.init()
+    try:
+        boundaries = backfill.find_shard_boundaries(
+            storage, checkpoint_ms, max_shards, max(config.window_sizes_ms)
+        )
+    finally:
+        storage.close()
+    if not boundaries:
+        return [config]
+
+    # The first shard owns everything before its end, the others read from their start
+    return [
+        replace(
+            config,
+            checkpoint_ms={symbol: checkpoint_ms if start_ms == 0 else start_ms - 1},
+            shard=trade_window_worker.Shard(start_ms, end_ms),
+        )
+        for start_ms, end_ms in zip([0, *boundaries], [*boundaries, None], strict=True)
+    ]
 
 
 def create_trade_worker(
     config: WorkerConfig,
     shutdown_event: EventType,
+    shm_data: SharedMemory,
+    shm_index: SharedMemory,
+    mask: int,
+    raw_storage_base_dir: str,
+    lateness: trade_window_worker.Lateness | None = None,
 ) -> WorkerProcess:
     worker_id = get_worker_id(config)
 
-    shm_data, shm_index, size, mask = ring_buffer.init(shm_data_name=None, shm_index_name=None)
+    channels = ring_signal.create_channels()
     p = Process(
         target=trade_window_worker.run,
         args=(
             shm_data.name,
             shm_index.name,
-            f"/Users/e/taltech/loputoo/start/storage/internal-bridge/{config.platform}/unified/trade",
+            channels.not_empty_sender,
+            channels.not_full_receiver,
+            get_raw_storage_path(raw_storage_base_dir, config.platform, WindowKind.trade),
             config.platform,
             config.symbols,
             config.window_sizes_ms,
             config.checkpoint_ms,
             shutdown_event,
+            config.hop_sizes_ms,
+            lateness,
+            config.shard,
         ),
         name=worker_id,
     )
@@ -74,30 +219,40 @@ def create_trade_worker(
         proc=p,
         shm_data=shm_data,
         shm_index=shm_index,
+        channels=channels,
         mask=mask,
         reads=0,
         done=False,
+        config=config,
     )
 
 
 def create_order_worker(
     config: WorkerConfig,
     shutdown_event: EventType,
+    shm_data: SharedMemory,
+    shm_index: SharedMemory,
+    mask: int,
+    raw_storage_base_dir: str,
 ) -> WorkerProcess:
     worker_id = get_worker_id(config)
 
-    shm_data, shm_index, size, mask = ring_buffer.init(shm_data_name=None, shm_index_name=None)
+    channels = ring_signal.create_channels()
     p = Process(
         target=order_window_worker.run,
         args=(
             shm_data.name,
             shm_index.name,
-            f"/Users/e/taltech/loputoo/start/storage/internal-bridge/{config.platform}/unified/order_book",
+            channels.not_empty_sender,
+            channels.not_full_receiver,
+            get_raw_storage_path(raw_storage_base_dir, config.platform, WindowKind.order),
             config.platform,
             config.symbols,
             config.window_sizes_ms,
             config.checkpoint_ms,
             shutdown_event,
+            config.symbol_scales,
+            config.ladder_symbols,
         ),
         name=worker_id,
     )
@@ -107,24 +262,188 @@ def create_order_worker(
         proc=p,
         shm_data=shm_data,
         shm_index=shm_index,
+        channels=channels,
+        mask=mask,
+        reads=0,
+        done=False,
+        config=config,
+    )
+
+
+def reattach_worker(
+    worker_id: str,
+    shm_data: SharedMemory,
+    shm_index: SharedMemory,
+    mask: int,
+    config: WorkerConfig | None = None,
+) -> WorkerProcess:
+    """
+    Adopt a worker still running from a previous coordinator. It holds the pipes of the
+    old coordinator so wakeups fall back to the timeout on both sides.
+    """
+    return WorkerProcess(
+        id=worker_id,
+        proc=None,
+        shm_data=shm_data,
+        shm_index=shm_index,
+        channels=ring_signal.create_channels(),
         mask=mask,
         reads=0,
         done=False,
+        config=config,
+        started_at=time.monotonic(),
     )
 
 
-def merge_configs(target: WorkerConfig, source: WorkerConfig) -> WorkerConfig:
-    merged_symbols = list(set(target.symbols + source.symbols))
-    merged_window_sizes = list(set(target.window_sizes_ms + source.window_sizes_ms))
-    merged_checkpoint = {**target.checkpoint_ms, **source.checkpoint_ms}
+def start_worker_process(worker: WorkerProcess) -> None:
+    """Start the process, the worker's pipe ends then live in the worker only"""
+    if worker.proc is not None:
+        worker.proc.start()
+        ring_signal.close_child_ends(worker.channels)
+    worker.started_at = time.monotonic()
+
+
+def is_pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def is_worker_alive(worker: WorkerProcess) -> bool:
+    if worker.proc is not None:
+        return worker.proc.is_alive()
+    header = ring_buffer.read_header(worker.shm_index.buf)
+    return header is not None and is_pid_alive(header.producer_pid)
+
+
+def has_crashed(worker: WorkerProcess) -> bool:
+    """For a worker that is no longer alive, whether it exited without being asked to"""
+    if ring_buffer.is_stop_requested(worker.shm_index.buf):
+        return False
+    if worker.proc is not None:
+        return worker.proc.exitcode != 0
+    # Re-attached, exit code unknown - workers only return once stopped
+    return True
+
+
+def get_dir_size(path: str) -> int:
+    size = 0
+    for dir_path, _dir_names, file_names in os.walk(path):
+        for file_name in file_names:
+            try:
+                size += os.path.getsize(os.path.join(dir_path, file_name))
+            except OSError:
+                pass
+    return size
+
+
+def estimate_series_costs(
+    platform_symbols: list[tuple[str, str]], raw_storage_base_dir: str
+) -> dict[SeriesKey, float]:
+    """
+    Relative CPU cost of each series, estimated from the size of its raw RocksDB log.
+    Series without a log get the mean of the others.
+    """
+    costs: dict[SeriesKey, float] = {}
+    for platform, symbol in platform_symbols:
+        for kind in [WindowKind.trade, WindowKind.order]:
+            raw_storage_path = get_raw_storage_path(raw_storage_base_dir, platform, kind)
+            path = os.path.join(raw_storage_path, normalize_sub_index(symbol))
+            costs[(platform, symbol, kind)] = float(get_dir_size(path))
+
+    known = [cost for cost in costs.values() if cost > 0]
+    fallback = sum(known) / len(known) if known else 1.0
+    return {series: cost if cost > 0 else fallback for series, cost in costs.items()}
+
 
-    return WorkerConfig(
-        platform=target.platform,
-        kind=target.kind,
-        symbols=merged_symbols,
-        window_sizes_ms=merged_window_sizes,
-        checkpoint_ms=merged_checkpoint,
+series_costs_decoder = msgspec.json.Decoder(type=dict[str, float])
+
+
+def get_series_cost_key(series: SeriesKey) -> str:
+    platform, symbol, kind = series
+    return f"{platform}-{symbol}-{kind.name}"
+
+
+def plan_series_costs(
+    platform_symbols: list[tuple[str, str]], path: str, raw_storage_base_dir: str
+) -> dict[SeriesKey, float]:
+    """
+    Series costs kept in the JSON file at path once estimated. Raw logs grow between runs,
+    estimating again would regroup the symbols and with them the worker ids that rings and
+    ring usage are found by. Only series new to the file are estimated.
+    """
+    stored = load_json_state(path, series_costs_decoder, {})
+    series = [
+        (platform, symbol, kind)
+        for platform, symbol in sorted(set(platform_symbols))
+        for kind in [WindowKind.trade, WindowKind.order]
+    ]
+    missing = sorted(
+        {
+            (platform, symbol)
+            for platform, symbol, kind in series
+            if get_series_cost_key((platform, symbol, kind)) not in stored
+        }
     )
+    if missing:
+        for key, cost in estimate_series_costs(missing, raw_storage_base_dir).items():
+            stored.setdefault(get_series_cost_key(key), cost)
+        save_json_state(path, stored)
+    return {key: stored[get_series_cost_key(key)] for key in series}
+
+
+def get_symbols_checkpoint(
+    checkpoint: dict[str, int | None],
+    platform: str,
+    symbol: str,
+    kind: WindowKind,
+    window_sizes_ms: list[int],
+) -> int | None:
+    """A worker restarts all its windows of a symbol together, from the oldest checkpoint"""
+    values = [
+        checkpoint.get(get_checkpoint_key(platform, symbol, kind.name, window_size_ms))
+        for window_size_ms in window_sizes_ms
+    ]
+    if any(value is None for value in values):
+        return None
+    return min(value for value in values if value is not None)
+
+
+def allocate_workers(
+    group_costs: dict[tuple[str, WindowKind], float],
+    group_max_workers: dict[tuple[str, WindowKind], int],
+    num_workers: int,
+) -> dict[tuple[str, WindowKind], int]:
+    """One worker per (platform, kind) group, the rest go to the highest cost per worker"""
+    counts = {group: 1 for group in group_costs}
+    remaining = num_workers - len(counts)
+
+    while remaining > 0:
+        candidates = [group for group in counts if counts[group] < group_max_workers[group]]
+        if not candidates:
+            break
+        group = max(candidates, key=lambda g: (group_costs[g] / counts[g], g[0], g[1].value))
+        counts[group] += 1
+        remaining -= 1
+
+    return counts
+
+
+def split_evenly(items: list[int], parts: int) -> list[list[int]]:
+    size, extra = divmod(len(items), parts)
+    chunks: list[list[int]] = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
 
 
 def distribute_work_across_cores(
@@ -132,128 +451,386 @@ def distribute_work_across_cores(
     window_sizes_ms: list[int],
     checkpoint: dict[str, int | None],
     num_cores: int | None = None,
+    costs: dict[SeriesKey, float] | None = None,
+    hop_sizes_ms: dict[int, int] | None = None,
+    symbol_scales: dict[str, Scale] | None = None,
+    ladder_symbols: set[str] | None = None,
 ) -> list[WorkerConfig]:
+    """
+    Workers are split between (platform, kind) groups by their total cost, within a group
+    the symbols are bin-packed (longest processing time first) so every worker gets about
+    the same cost. A group with more workers than symbols splits the window sizes of its
+    most expensive symbols instead.
+
+    costs
+        relative cost per series (see estimate_series_costs), equal if not given
+    hop_sizes_ms
+        window size -> hop, those trade windows are hopping instead of tumbling
+    symbol_scales
+        fixed-point scale per symbol of the order books
+    ladder_symbols
+        symbols whose order books are kept on a price ladder
+    """
     if num_cores is None:
         num_cores = os.cpu_count() or 4
 
-    configs: list[WorkerConfig] = []
-    for platform, symbol in platform_symbols:
+    window_sizes = sorted(set(window_sizes_ms))
+
+    group_symbols: dict[tuple[str, WindowKind], list[str]] = {}
+    for platform, symbol in sorted(set(platform_symbols)):
         for kind in [WindowKind.trade, WindowKind.order]:
-            for window_size_ms in window_sizes_ms:
-                checkpoint_value = checkpoint.get(
-                    get_checkpoint_key(platform, symbol, kind.name, window_size_ms)
-                )
-                configs.append(
-                    WorkerConfig(
-                        platform=platform,
-                        kind=kind,
-                        symbols=[symbol],
-                        window_sizes_ms=[window_size_ms],
-                        checkpoint_ms={symbol: checkpoint_value},
-                    )
-                )
+            group_symbols.setdefault((platform, kind), []).append(symbol)
 
-    while len(configs) > num_cores:
-        groups: list[list[WorkerConfig]] = []
-        for platform in set(c.platform for c in configs):
-            for kind in [WindowKind.trade, WindowKind.order]:
-                platform_kind_group = [
-                    c for c in configs if c.platform == platform and c.kind == kind
-                ]
-                if len(platform_kind_group) >= 2:
-                    groups.append(platform_kind_group)
-
-        groups.sort(key=len, reverse=True)
-
-        merged = False
-        for group in groups:
-            target = group[0]
-            source = group[1]
-
-            configs.remove(target)
-            configs.remove(source)
-            configs.append(merge_configs(target, source))
-            merged = True
-            break
+    def cost_of(platform: str, symbol: str, kind: WindowKind) -> float:
+        return costs.get((platform, symbol, kind), 1.0) if costs is not None else 1.0
 
-        if not merged:
-            break
+    group_costs = {
+        group: sum(cost_of(group[0], symbol, group[1]) for symbol in symbols)
+        for group, symbols in group_symbols.items()
+    }
+    group_workers = allocate_workers(
+        group_costs,
+        {group: len(symbols) * len(window_sizes) for group, symbols in group_symbols.items()},
+        num_cores,
+    )
+
+    configs: list[WorkerConfig] = []
+    for (platform, kind), symbols in group_symbols.items():
+        workers_count = group_workers[(platform, kind)]
+        by_cost = sorted(symbols, key=lambda sym: (-cost_of(platform, sym, kind), sym))
+
+        # (symbols, window sizes) per worker
+        assignments: list[tuple[list[str], list[int]]] = []
+
+        if workers_count <= len(symbols):
+            bins: list[list[str]] = [[] for _ in range(workers_count)]
+            loads = [0.0] * workers_count
+            for symbol in by_cost:
+                i = min(range(workers_count), key=lambda b: (loads[b], b))
+                bins[i].append(symbol)
+                loads[i] += cost_of(platform, symbol, kind)
+            assignments = [(sorted(b), window_sizes) for b in bins]
+        else:
+            chunks = {symbol: 1 for symbol in symbols}
+            for _ in range(workers_count - len(symbols)):
+                splittable = [sym for sym in by_cost if chunks[sym] < len(window_sizes)]
+                if not splittable:
+                    break
+                symbol = max(splittable, key=lambda sym: cost_of(platform, sym, kind) / chunks[sym])
+                chunks[symbol] += 1
+            assignments = [
+                ([symbol], windows)
+                for symbol in by_cost
+                for windows in split_evenly(window_sizes, chunks[symbol])
+            ]
+
+        for worker_symbols, worker_window_sizes in assignments:
+            configs.append(
+                WorkerConfig(
+                    platform=platform,
+                    kind=kind,
+                    symbols=worker_symbols,
+                    window_sizes_ms=worker_window_sizes,
+                    checkpoint_ms={
+                        symbol: get_symbols_checkpoint(
+                            checkpoint, platform, symbol, kind, worker_window_sizes
+                        )
+                        for symbol in worker_symbols
+                    },
+                    hop_sizes_ms=get_hop_sizes(kind, worker_window_sizes, hop_sizes_ms),
+                    symbol_scales=get_symbol_scales(kind, worker_symbols, symbol_scales),
+                    ladder_symbols=get_ladder_symbols(kind, worker_symbols, ladder_symbols),
+                )
+            )
 
     return configs
 
 
-WindowEvent = tuple[bytes, bytes]
-OnWindowEvent = Callable[[WindowEvent], None]
+Series = tuple[str, str, int]
+"""(platform, symbol, window_size_ms), run for both window kinds"""
+
+
+def get_config_series(config: WorkerConfig) -> set[Series]:
+    return {
+        (config.platform, symbol, window_size_ms)
+        for symbol in config.symbols
+        for window_size_ms in config.window_sizes_ms
+    }
+
+
+def split_remaining_series(config: WorkerConfig, removed: set[Series]) -> list[WorkerConfig]:
+    """
+    Configs for what is left of config without the removed series, symbols with the same
+    remaining window sizes share a config
+    """
+    by_window_sizes: dict[tuple[int, ...], list[str]] = {}
+    for symbol in config.symbols:
+        window_sizes = tuple(
+            window_size_ms
+            for window_size_ms in config.window_sizes_ms
+            if (config.platform, symbol, window_size_ms) not in removed
+        )
+        if window_sizes:
+            by_window_sizes.setdefault(window_sizes, []).append(symbol)
+
+    return [
+        WorkerConfig(
+            platform=config.platform,
+            kind=config.kind,
+            symbols=symbols,
+            window_sizes_ms=list(window_sizes),
+            checkpoint_ms={},
+            hop_sizes_ms=get_hop_sizes(config.kind, list(window_sizes), config.hop_sizes_ms),
+            symbol_scales=get_symbol_scales(config.kind, symbols, config.symbol_scales),
+            ladder_symbols=get_ladder_symbols(config.kind, symbols, set(config.ladder_symbols)),
+        )
+        for window_sizes, symbols in by_window_sizes.items()
+    ]
+
+
+WindowEvent = tuple[memoryview, memoryview]
+"""
+(key, value) views into the worker's shared memory, only valid during the on_event call
+"""
+OnWindowEvents = Callable[[list[WindowEvent]], None]
+
+DRAIN_MAX_RECORDS = 1024
+DRAIN_MAX_BYTES = 2**20
+
+
+def record_ring_usage(worker: WorkerProcess, ring_usage: dict[str, RingUsage]) -> None:
+    ring_usage[worker.id] = RingUsage(
+        buf_size=worker.mask + 1,
+        high_watermark=worker.high_watermark,
+        full_stalls=ring_buffer.read_stats(worker.shm_index.buf).full_stalls,
+    )
+
+
+def release_worker(worker: WorkerProcess) -> None:
+    ring_buffer.unlink(worker.shm_data)
+    ring_buffer.unlink(worker.shm_index)
+    ring_signal.close_channels(worker.channels)
+
+
+def read_worker_ring(
+    worker: WorkerProcess,
+    on_events: OnWindowEvents,
+    metrics: RingBufferMetrics | None = None,
+) -> int:
+    """Hand one batch of the worker's ring to on_events and commit it, returns the count"""
+    peeked = ring_buffer.peek_many(
+        data_buf=worker.shm_data.buf,
+        index_buf=worker.shm_index.buf,
+        mask=worker.mask,
+        max_records=DRAIN_MAX_RECORDS,
+        max_bytes=DRAIN_MAX_BYTES,
+    )
+    if peeked is None:
+        return 0
+
+    offset, events = peeked
+    # Before on_events, storage writes must not count as time spent in the ring
+    publish_age_ns = ring_metrics.get_publish_age_ns(worker.shm_index.buf) if metrics else None
+    try:
+        on_events(events)
+    finally:
+        for key_view, value_view in events:
+            key_view.release()
+            value_view.release()
+
+    worker.high_watermark = max(worker.high_watermark, ring_buffer.bytes_used(worker.shm_index.buf))
+    if metrics is not None:
+        ring_metrics.observe_read(
+            metrics,
+            worker.id,
+            worker.shm_index.buf,
+            worker.mask + 1,
+            len(events),
+            publish_age_ns,
+        )
+
+    ring_buffer.commit(worker.shm_index.buf, worker.mask, offset)
+    if ring_signal.is_writer_parked(worker.shm_index.buf):
+        ring_signal.notify(worker.channels.not_full_sender)
+
+    worker.reads = worker.reads + len(events)
+    return len(events)
+
+
+RESTART_BACKOFF_S = 1.0
+RESTART_MAX_BACKOFF_S = 60.0
+RESTART_RESET_S = 300.0
+"""A worker that ran this long before crashing restarts after RESTART_BACKOFF_S again"""
+
+RestartWorker = Callable[[WorkerProcess], WorkerProcess]
+
 
+def get_restart_backoff(crashes: int) -> float:
+    return min(RESTART_MAX_BACKOFF_S, RESTART_BACKOFF_S * 2 ** max(0, crashes - 1))
 
-async def cleanup_finished_workers(
+
+def finish_worker(
+    worker: WorkerProcess,
+    workers: list[WorkerProcess],
+    metrics: RingBufferMetrics | None,
+    ring_usage: dict[str, RingUsage] | None,
+) -> None:
+    worker.done = True
+    if ring_usage is not None:
+        record_ring_usage(worker, ring_usage)
+    release_worker(worker)
+    workers.remove(worker)
+    if metrics is not None:
+        ring_metrics.forget_ring(metrics, worker.id)
+    print(
+        f"[MAIN] worker {worker.id} finished with {worker.reads} reads."
+        f" Workers left: {len(workers)}"
+    )
+
+
+async def supervise_workers(
     workers: list[WorkerProcess],
     is_stopped: IsStopped,
     check_interval: float = 1.0,
+    metrics: RingBufferMetrics | None = None,
+    ring_usage: dict[str, RingUsage] | None = None,
+    restart_worker: RestartWorker | None = None,
+    worker_metrics: WorkerMetrics | None = None,
+    on_finished: Callable[[WorkerProcess], None] | None = None,
 ):
-    while not is_stopped() and len(workers) > 0:
+    """
+    Removes workers that exited once their ring is drained. Crashed workers are restarted
+    by restart_worker (from their last checkpoint) after an exponential backoff.
+
+    on_finished
+        called for every removed worker, after its windows were handed to on_events
+    """
+    loop = asyncio.get_running_loop()
+
+    while not is_stopped():
         await asyncio.sleep(check_interval)
+        now = time.monotonic()
 
-        finished: list[WorkerProcess] = []
-        for worker in workers:
-            if not worker.proc.is_alive():
-                tup = ring_buffer.read(
-                    data_buf=worker.shm_data.buf, index_buf=worker.shm_index.buf, mask=worker.mask
-                )
-                if tup is None:
-                    finished.append(worker)
-
-        for worker in finished:
-            worker.done = True
-            worker.shm_data.close()
-            worker.shm_data.unlink()
-            worker.shm_index.close()
-            worker.shm_index.unlink()
-            workers.remove(worker)
+        for worker in list(workers):
+            if worker.restart_at is not None and restart_worker is not None:
+                if now < worker.restart_at or is_stopped():
+                    continue
+                try:
+                    restarted = restart_worker(worker)
+                except Exception as error:
+                    worker.crashes += 1
+                    worker.restart_at = now + get_restart_backoff(worker.crashes)
+                    print(f"[MAIN] Restarting worker {worker.id} failed: {error}")
+                    continue
+                workers[workers.index(worker)] = restarted
+                if metrics is not None:
+                    ring_metrics.forget_ring(metrics, worker.id)
+                if worker_metrics is not None:
+                    worker_metrics.restarts.labels(worker=worker.id).inc()
+                print(f"[MAIN] worker {worker.id} restarted after {worker.crashes} crash(es)")
+                continue
+
+            if is_worker_alive(worker) or not ring_buffer.is_empty(worker.shm_index.buf):
+                continue
+
+            loop.remove_reader(worker.channels.not_empty_receiver.fileno())
+
+            if restart_worker is None or worker.config is None or not has_crashed(worker):
+                finish_worker(worker, workers, metrics, ring_usage)
+                if on_finished is not None:
+                    on_finished(worker)
+                continue
+
+            if worker_metrics is not None:
+                worker_metrics.crashes.labels(worker=worker.id).inc()
+            if now - worker.started_at >= RESTART_RESET_S:
+                worker.crashes = 0
+            worker.crashes += 1
+            backoff = get_restart_backoff(worker.crashes)
+            worker.restart_at = now + backoff
+            exitcode = worker.proc.exitcode if worker.proc is not None else None
             print(
-                f"[MAIN] worker {worker.id} finished with {worker.reads} reads."
-                f" Workers left: {len(workers)}"
+                f"[MAIN] worker {worker.id} crashed (exit code {exitcode}),"
+                f" restarting in {backoff}s"
             )
 
 
 async def loop_worker_ring_buffers(
     workers: list[WorkerProcess],
-    on_event: OnWindowEvent,
+    on_events: OnWindowEvents,
     is_stopped: IsStopped,
+    metrics: RingBufferMetrics | None = None,
+    on_pass_end: Callable[[bool], None] | None = None,
 ):
+    """
+    on_pass_end
+        called after every pass over the rings with whether anything was read
+    """
     reads = 0
+    reads_reported = 0
+
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+
+    def on_not_empty(receiver: Connection):
+        if not ring_signal.clear(receiver):
+            # Worker is gone and the pipe stays readable, its ring is drained by polling
+            loop.remove_reader(receiver.fileno())
+        wakeup.set()
+
+    watched: dict[str, Connection] = {}
 
     start = time.time()
-    while not is_stopped() and len(workers) > 0:
+    while not is_stopped():
         read = False
 
         for worker in workers:
-            tup = ring_buffer.read(
-                data_buf=worker.shm_data.buf, index_buf=worker.shm_index.buf, mask=worker.mask
-            )
-            if tup is None:
+            # Restarted workers come with new channels
+            receiver = worker.channels.not_empty_receiver
+            if watched.get(worker.id) is not receiver:
+                watched[worker.id] = receiver
+                loop.add_reader(receiver.fileno(), on_not_empty, receiver)
+
+        for worker in workers:
+            count = read_worker_ring(worker, on_events, metrics)
+            if count == 0:
                 continue
             read = True
-            worker.reads = worker.reads + 1
-            reads = reads + 1
-
-            on_event(tup)
+            reads = reads + count
 
-            if reads % 10000 == 0:
+            if reads - reads_reported >= 10000:
+                reads_reported = reads
                 print(f"[MAIN] read/write {reads} in {time.time() - start}s")
 
+        if on_pass_end is not None:
+            on_pass_end(read)
+
         if not read:
-            await asyncio.sleep(0.5)
+            # Park on all rings and re-check so a publish racing with the park is not missed
+            wakeup.clear()
+            for worker in workers:
+                ring_signal.park_reader(worker.shm_index.buf)
 
+            if all(ring_buffer.is_empty(worker.shm_index.buf) for worker in workers):
+                try:
+                    await asyncio.wait_for(wakeup.wait(), ring_signal.WAKEUP_TIMEOUT_S)
+                except TimeoutError:
+                    pass
 
-async def run_all_window_workers(
+            for worker in workers:
+                ring_signal.unpark_reader(worker.shm_index.buf)
+
+
+def read_checkpoints(
     storage: RocksdbLog,
     platform_symbols: list[tuple[str, str]],
     window_sizes_ms: list[int],
-    num_cores: int | None = None,
-    is_shutting_down: IsStopped = lambda: False,
-):
-    reverse_iter = storage.iterate_from_end()
+) -> dict[str, int | None]:
+    """
+    Latest window_end_ms per series from the checkpoint rows at the start of the DB,
+    O(series). Series without a row (a DB written before checkpoint rows existed, or a
+    series stored only back then) are found by `scan_checkpoints`, which writes their rows.
+    """
     checkpoint: dict[str, int | None] = {
         get_checkpoint_key(platform, symbol, kind, window_size_ms): None
         for platform, symbol in platform_symbols
@@ -261,10 +838,66 @@ async def run_all_window_workers(
         for window_size_ms in window_sizes_ms
     }
 
+    with_rows: set[str] = set()
+    forward_iter = storage.iterate_from(CHECKPOINT_KEY_PREFIX)
+    try:
+        done = False
+        while not done and forward_iter.has_next():
+            for key_bytes, value_bytes in forward_iter.next_batch():
+                if not is_checkpoint_key(key_bytes):
+                    done = True
+                    break
+
+                key = unpack_window_key(key_bytes)
+                state_key = get_checkpoint_key(
+                    key.platform.name, key.symbol, key.kind.name, key.window_size_ms
+                )
+                if state_key in checkpoint:
+                    (window_end_ms,) = CHECKPOINT_VALUE_FMT.unpack(value_bytes)
+                    checkpoint[state_key] = window_end_ms or None
+                    with_rows.add(state_key)
+    finally:
+        forward_iter.close()
+
+    missing = {
+        get_checkpoint_key(platform, symbol, kind, window_size_ms): get_series_key_bytes(
+            platform, symbol, kind, window_size_ms
+        )
+        for platform, symbol in platform_symbols
+        for kind in [WindowKind.order.name, WindowKind.trade.name]
+        for window_size_ms in window_sizes_ms
+    }
+    for state_key in with_rows:
+        del missing[state_key]
+    if missing:
+        checkpoint.update(scan_checkpoints(storage, missing))
+
+    return checkpoint
+
+
+def get_series_key_bytes(platform: str, symbol: str, kind: str, window_size_ms: int) -> bytes:
+    """Window key without its leading window_end_ms, as in checkpoint rows"""
+    key = WindowKeyParts(0, symbol, WindowKind[kind], window_size_ms, Platform[platform])
+    return pack_window_key(key)[8:]
+
+
+def scan_checkpoints(storage: RocksdbLog, series: dict[str, bytes]) -> dict[str, int | None]:
+    """
+    Walk the windows backwards until every series (checkpoint key -> series key bytes) has
+    been seen. Series not found by a full walk get a row of 0 (no windows) so the next
+    start does not walk again.
+    """
+    checkpoint: dict[str, int | None] = dict.fromkeys(series)
+    rows: dict[bytes, int] = {}
+    complete = False
+    reverse_iter = storage.iterate_from_end()
+
     try:
         while reverse_iter.has_next() and any(v is None for v in checkpoint.values()):
             data = reverse_iter.next_batch()
-            for key_bytes, value_bytes in data:
+            for key_bytes, _value_bytes in data:
+                if is_checkpoint_key(key_bytes):
+                    continue
                 key = unpack_window_key(key_bytes)
 
                 state_key = get_checkpoint_key(
@@ -277,12 +910,191 @@ async def run_all_window_workers(
                     continue
 
                 checkpoint[state_key] = key.window_end_ms
+                rows[key_bytes[8:]] = key.window_end_ms
+        complete = True
 
     except Exception as error:
         print(error)
     finally:
         reverse_iter.close()
 
+    if complete:
+        for state_key, window_end_ms in checkpoint.items():
+            if window_end_ms is None:
+                rows[series[state_key]] = 0
+
+    if rows:
+        storage.put_batch(
+            [
+                (pack_checkpoint_key(series_key), CHECKPOINT_VALUE_FMT.pack(window_end_ms))
+                for series_key, window_end_ms in rows.items()
+            ]
+        )
+        print(f"[MAIN] Wrote {len(rows)} checkpoint rows from a scan")
+
+    return checkpoint
+
+
+def release_leftover_ring(worker_id: str) -> bool:
+    """
+    Stop the producer of a ring left behind by an earlier coordinator and remove the ring
+    without reading it. False if there is no such ring.
+    """
+    try:
+        shm_data, shm_index, _size, mask = ring_buffer.attach(*ring_buffer.segment_names(worker_id))
+    except (FileNotFoundError, ValueError):
+        return False
+
+    worker = reattach_worker(worker_id, shm_data, shm_index, mask)
+    stop_worker(worker)
+    release_worker(worker)
+    return True
+
+
+def stop_worker(worker: WorkerProcess, timeout: float = 5) -> None:
+    ring_buffer.request_stop(worker.shm_index.buf)
+
+    if worker.proc is not None:
+        worker.proc.join(timeout=timeout)
+        if worker.proc.is_alive():
+            worker.proc.terminate()
+        return
+
+    header = ring_buffer.read_header(worker.shm_index.buf)
+    pid = header.producer_pid if header is not None else 0
+    deadline = time.time() + timeout
+    while is_pid_alive(pid) and time.time() < deadline:
+        time.sleep(0.1)
+    if is_pid_alive(pid):
+        os.kill(pid, signal.SIGTERM)
+
+
+async def run_all_window_workers(
+    storage: RocksdbLog,
+    platform_symbols: list[tuple[str, str]],
+    window_sizes_ms: list[int],
+    raw_storage_base_dir: str,
+    num_cores: int | None = None,
+    is_shutting_down: IsStopped = lambda: False,
+    metrics: RingBufferMetrics | None = None,
+    ring_usage_path: str | None = None,
+    series_costs: dict[SeriesKey, float] | None = None,
+    series_costs_path: str | None = None,
+    threaded_writes: bool = True,
+    worker_metrics: WorkerMetrics | None = None,
+    control: WindowWorkersControl | None = None,
+    hop_sizes_ms: dict[int, int] | None = None,
+    trade_lateness: trade_window_worker.Lateness | None = None,
+    backfill_shards: int = 1,
+    symbol_scales: dict[str, Scale] | None = None,
+    ladder_symbols: set[str] | None = None,
+):
+    """
+    raw_storage_base_dir
+        root of the raw trade and order book logs, <platform>/unified/{trade,order_book}
+    ring_usage_path
+        JSON file with the ring usage of the previous run, rings are sized from it. Rings
+        of earlier runs it lists that are no longer planned are stopped and removed.
+    series_costs
+        relative cost per series for distributing work, estimated from raw log sizes if None
+    series_costs_path
+        JSON file keeping the estimated series costs across runs, see plan_series_costs
+    threaded_writes
+        write batches to storage on a dedicated thread, see WindowStorageWriter
+    worker_metrics
+        crashes and restarts of workers, crashed workers are restarted either way
+    control
+        add and remove series while running, the coordinator then runs until shutdown even
+        without workers (otherwise it returns once all workers finished)
+    hop_sizes_ms
+        window size -> hop, those trade windows are hopping (a 30s window every 1s) instead
+        of tumbling. Keys stay (window start, window size) so a hopping window replaces the
+        tumbling windows of its size.
+    trade_lateness
+        how long trade windows wait for out of order trades (one window by default) and
+        whether later trades amend closed windows, see trade_window_worker.WindowHandler
+    backfill_shards
+        trade workers of a single symbol split a backfill of at least
+        backfill.MIN_SHARD_SPAN_MS into up to this many time shards, each in its own worker.
+        Checkpoints of the symbol stay put until all shards finished.
+    symbol_scales
+        fixed-point scale of the order book prices and quantities per symbol, for symbols
+        that do not fit fixed_point.DEFAULT_SCALE
+    ladder_symbols
+        symbols whose order books are kept on a price ladder (deep books updated near the
+        touch), see order_book_manager._LadderSideBook
+    """
+    storage_writer = WindowStorageWriter(storage, threaded=threaded_writes)
+    handle_worker_data = storage_writer.add
+
+    if series_costs is None and series_costs_path:
+        series_costs = plan_series_costs(platform_symbols, series_costs_path, raw_storage_base_dir)
+    elif series_costs is None:
+        series_costs = estimate_series_costs(platform_symbols, raw_storage_base_dir)
+
+    # Worker ids do not depend on checkpoints, plan first to find the rings (named by
+    # worker id) a previous coordinator may have left behind
+    planned_configs = distribute_work_across_cores(
+        platform_symbols=platform_symbols,
+        window_sizes_ms=window_sizes_ms,
+        checkpoint={},
+        num_cores=num_cores,
+        costs=series_costs,
+        hop_sizes_ms=hop_sizes_ms,
+    )
+
+    ring_usage = load_json_state(ring_usage_path, ring_usage_decoder, {}) if ring_usage_path else {}
+
+    def remember_ring(worker_id: str, buf_size: int) -> None:
+        """Listed in the ring usage once created, so a later run can remove it if unplanned"""
+        if worker_id in ring_usage or not ring_usage_path:
+            return
+        ring_usage[worker_id] = RingUsage(buf_size=buf_size, high_watermark=0, full_stalls=0)
+        save_json_state(ring_usage_path, ring_usage)
+
+    planned_ids = {get_worker_id(config) for config in planned_configs}
+    for worker_id in sorted(ring_usage.keys() - planned_ids):
+        # Nothing reads these rings anymore, windows they still hold are recomputed from the
+        # checkpoints by the planned workers
+        if release_leftover_ring(worker_id):
+            print(f"[MAIN] Removed ring of worker {worker_id}, no longer planned")
+        del ring_usage[worker_id]
+
+    workers: list[WorkerProcess] = []
+    fresh_rings: dict[str, tuple[SharedMemory, SharedMemory, int]] = {}
+    for config in planned_configs:
+        worker_id = get_worker_id(config)
+        buf_size = choose_ring_size(
+            config.kind,
+            len(config.symbols) * len(config.window_sizes_ms),
+            ring_usage.get(worker_id),
+        )
+        shm_data, shm_index, size, mask, resumed = ring_buffer.open_named(worker_id, buf_size)
+        remember_ring(worker_id, size)
+
+        if resumed:
+            worker = reattach_worker(worker_id, shm_data, shm_index, mask, config)
+            if is_worker_alive(worker):
+                print(f"[MAIN] Re-attaching to running worker {worker_id}")
+                workers.append(worker)
+                continue
+
+            # Producer is gone, store what it already published before reading checkpoints
+            while read_worker_ring(worker, handle_worker_data, metrics) > 0:
+                pass
+            print(f"[MAIN] Drained {worker.reads} windows left behind by worker {worker_id}")
+            ring_signal.close_channels(worker.channels)
+            ring_buffer.reset(shm_index.buf)
+
+            if size != buf_size:
+                ring_buffer.unlink(shm_data)
+                ring_buffer.unlink(shm_index)
+                shm_data, shm_index, size, mask, _ = ring_buffer.open_named(worker_id, buf_size)
+
+        fresh_rings[worker_id] = (shm_data, shm_index, mask)
+
+    storage_writer.sync()  # Drained windows move the checkpoints
+    checkpoint = read_checkpoints(storage, platform_symbols, window_sizes_ms)
     print(checkpoint)
 
     shutdown_event = Event()
@@ -292,65 +1104,274 @@ async def run_all_window_workers(
         window_sizes_ms=window_sizes_ms,
         checkpoint=checkpoint,
         num_cores=num_cores,
+        costs=series_costs,
+        hop_sizes_ms=hop_sizes_ms,
+        symbol_scales=symbol_scales,
+        ladder_symbols=ladder_symbols,
     )
 
     print("worker_configs", [get_worker_id(w) for w in worker_configs])
-    print(f"[MAIN] Creating {len(worker_configs)} workers for {num_cores or os.cpu_count()} cores")
+    print(f"[MAIN] Creating {len(fresh_rings)} workers for {num_cores or os.cpu_count()} cores")
 
-    workers: list[WorkerProcess] = []
+    backfill_holds: list[tuple[set[bytes], set[str]]] = []
+    """(held series, ids of the shard workers they wait for)"""
+
+    def finish_backfill_shard(worker: WorkerProcess) -> None:
+        for series, shard_ids in backfill_holds:
+            shard_ids.discard(worker.id)
+            if not shard_ids:
+                storage_writer.release(series)
+                print(f"[MAIN] Backfill shards done, releasing {len(series)} checkpoints")
+        backfill_holds[:] = [hold for hold in backfill_holds if hold[1]]
+
+    started: list[WorkerProcess] = []
+    shard_configs: list[WorkerConfig] = []
     for config in worker_configs:
+        worker_id = get_worker_id(config)
+        if worker_id not in fresh_rings:
+            continue
+        shm_data, shm_index, mask = fresh_rings[worker_id]
+        print(f"[MAIN] Ring buffer of {mask + 1} bytes for worker {worker_id}")
         if config.kind == WindowKind.trade:
-            workers.append(create_trade_worker(config, shutdown_event))
+            shards = split_backfill(config, backfill_shards, raw_storage_base_dir)
+            if len(shards) > 1:
+                series = get_series_keys(config)
+                storage_writer.hold(series)
+                backfill_holds.append((series, {get_worker_id(shard) for shard in shards[:-1]}))
+                shard_configs.extend(shards[:-1])
+                config = shards[-1]
+                print(f"[MAIN] Backfill of worker {worker_id} split into {len(shards)} shards")
+            started.append(
+                create_trade_worker(
+                    config,
+                    shutdown_event,
+                    shm_data,
+                    shm_index,
+                    mask,
+                    raw_storage_base_dir,
+                    trade_lateness,
+                )
+            )
         else:
-            workers.append(create_order_worker(config, shutdown_event))
+            started.append(
+                create_order_worker(
+                    config, shutdown_event, shm_data, shm_index, mask, raw_storage_base_dir
+                )
+            )
 
-    for w in workers:
+    for w in started:
         print(f"[MAIN] Starting worker {w.id}")
-        w.proc.start()
-
-    def write_to_storage(tup: WindowEvent):
-        key_bytes, value_bytes = tup
-        try:
-            unpack_window_key(key_bytes)
-        except Exception as error:
-            print("len(key_bytes), len(value_bytes)", len(key_bytes), len(value_bytes))
-            print(error)
-            raise Exception("Failed to parse key")
-        storage.put(key=key_bytes, value=value_bytes)
+        start_worker_process(w)
+    workers.extend(started)
+
+    def with_checkpoints(config: WorkerConfig) -> WorkerConfig:
+        shard = config.shard
+        if shard is not None and shard.end_ms is not None:
+            return config  # Backfill shards restart from the start of their range
+        storage_writer.sync()  # Windows drained from the worker move the checkpoints
+        worker_symbols = [(config.platform, symbol) for symbol in config.symbols]
+        series_checkpoint = read_checkpoints(storage, worker_symbols, config.window_sizes_ms)
+        checkpoint_ms: dict[str, int | None] = {}
+        for symbol in config.symbols:
+            symbol_checkpoint = get_symbols_checkpoint(
+                series_checkpoint, config.platform, symbol, config.kind, config.window_sizes_ms
+            )
+            if shard is not None:
+                # The live shard of a split backfill, checkpoints are held until the other
+                # shards finish and never go back past its start once released
+                symbol_checkpoint = max(symbol_checkpoint or 0, shard.start_ms - 1)
+            checkpoint_ms[symbol] = symbol_checkpoint
+        return replace(config, checkpoint_ms=checkpoint_ms)
+
+    def spawn_worker(
+        config: WorkerConfig, shm_data: SharedMemory, shm_index: SharedMemory, mask: int
+    ) -> WorkerProcess:
+        if config.kind == WindowKind.trade:
+            worker = create_trade_worker(
+                config,
+                shutdown_event,
+                shm_data,
+                shm_index,
+                mask,
+                raw_storage_base_dir,
+                trade_lateness,
+            )
+        else:
+            worker = create_order_worker(
+                config, shutdown_event, shm_data, shm_index, mask, raw_storage_base_dir
+            )
+        start_worker_process(worker)
+        return worker
+
+    def restart_worker(worker: WorkerProcess) -> WorkerProcess:
+        """Same ring, new process from the checkpoints of just this worker's series"""
+        assert worker.config is not None
+        config = with_checkpoints(worker.config)
+
+        ring_signal.close_channels(worker.channels)
+        ring_buffer.reset(worker.shm_index.buf)
+
+        restarted = spawn_worker(config, worker.shm_data, worker.shm_index, worker.mask)
+        restarted.crashes = worker.crashes
+        restarted.high_watermark = worker.high_watermark
+        restarted.reads = worker.reads
+        return restarted
+
+    active_series: set[Series] = set()
+    for config in planned_configs:
+        active_series |= get_config_series(config)
+
+    def start_worker(config: WorkerConfig) -> WorkerProcess:
+        """New worker in a new ring, backfilling from the checkpoints of its series"""
+        worker_id = get_worker_id(config)
+        buf_size = choose_ring_size(
+            config.kind,
+            len(config.symbols) * len(config.window_sizes_ms),
+            ring_usage.get(worker_id),
+        )
+        shm_data, shm_index, _size, mask, resumed = ring_buffer.open_named(worker_id, buf_size)
+        if resumed:
+            # Left behind by an older coordinator running a different configuration
+            ring_buffer.unlink(shm_data)
+            ring_buffer.unlink(shm_index)
+            shm_data, shm_index, _size, mask, _ = ring_buffer.open_named(worker_id, buf_size)
+        remember_ring(worker_id, mask + 1)
+
+        worker = spawn_worker(with_checkpoints(config), shm_data, shm_index, mask)
+        workers.append(worker)
+        print(f"[MAIN] Started worker {worker.id}")
+        return worker
+
+    for config in shard_configs:
+        start_worker(config)
+
+    async def retire_worker(worker: WorkerProcess) -> None:
+        # Out of the list first so neither the read loop nor the supervisor touches it
+        workers.remove(worker)
+        await asyncio.to_thread(stop_worker, worker)
+        asyncio.get_running_loop().remove_reader(worker.channels.not_empty_receiver.fileno())
+        while read_worker_ring(worker, handle_worker_data, metrics) > 0:
+            pass
+        finish_backfill_shard(worker)
+        worker.done = True
+        record_ring_usage(worker, ring_usage)
+        release_worker(worker)
+        if metrics is not None:
+            ring_metrics.forget_ring(metrics, worker.id)
+        print(f"[MAIN] Retired worker {worker.id} after {worker.reads} reads")
+
+    def add_series(command: AddSeries) -> list[str]:
+        window_sizes = [
+            window_size_ms
+            for window_size_ms in command.window_sizes_ms
+            if (command.platform, command.symbol, window_size_ms) not in active_series
+        ]
+        if not window_sizes:
+            return []
+
+        started_ids: list[str] = []
+        for kind in [WindowKind.trade, WindowKind.order]:
+            config = WorkerConfig(
+                platform=command.platform,
+                kind=kind,
+                symbols=[command.symbol],
+                window_sizes_ms=window_sizes,
+                checkpoint_ms={},
+                hop_sizes_ms=get_hop_sizes(kind, window_sizes, hop_sizes_ms),
+                symbol_scales=get_symbol_scales(kind, [command.symbol], symbol_scales),
+                ladder_symbols=get_ladder_symbols(kind, [command.symbol], ladder_symbols),
+            )
+            started_ids.append(start_worker(config).id)
+            active_series.update(get_config_series(config))
+        return started_ids
+
+    async def remove_series(command: RemoveSeries) -> list[str]:
+        removed = {
+            (command.platform, command.symbol, window_size_ms)
+            for window_size_ms in command.window_sizes_ms
+        }
+        affected = [
+            worker
+            for worker in workers
+            if worker.config is not None and get_config_series(worker.config) & removed
+        ]
+
+        for worker in affected:
+            await retire_worker(worker)
+            assert worker.config is not None
+            for config in split_remaining_series(worker.config, removed):
+                start_worker(config)
+
+        active_series.difference_update(removed)
+        return [worker.id for worker in affected]
+
+    async def run_control(control: WindowWorkersControl) -> None:
+        while not is_shutting_down():
+            try:
+                command = await asyncio.wait_for(
+                    control.commands.get(), ring_signal.WAKEUP_TIMEOUT_S
+                )
+            except TimeoutError:
+                continue
 
-    def handle_worker_data(tup: WindowEvent):
-        write_to_storage(tup)
+            try:
+                if isinstance(command, AddSeries):
+                    command.result.set_result(add_series(command))
+                else:
+                    command.result.set_result(await remove_series(command))
+            except Exception as error:
+                print(f"[MAIN] Control command {command} failed: {error}")
+                command.result.set_exception(error)
+
+    def is_stopped() -> bool:
+        return is_shutting_down() or (control is None and len(workers) == 0)
+
+    tasks = [
+        loop_worker_ring_buffers(
+            workers,
+            on_events=handle_worker_data,
+            is_stopped=is_stopped,
+            metrics=metrics,
+            on_pass_end=lambda read: storage_writer.flush_if_due(idle=not read),
+        ),
+        supervise_workers(
+            workers,
+            is_stopped=is_stopped,
+            metrics=metrics,
+            ring_usage=ring_usage,
+            restart_worker=restart_worker,
+            worker_metrics=worker_metrics,
+            on_finished=finish_backfill_shard,
+        ),
+    ]
+    if control is not None:
+        tasks.append(run_control(control))
 
     try:
-        await asyncio.gather(
-            loop_worker_ring_buffers(
-                workers,
-                on_event=handle_worker_data,
-                is_stopped=is_shutting_down,
-            ),
-            cleanup_finished_workers(
-                workers,
-                is_stopped=is_shutting_down,
-            ),
-        )
+        await asyncio.gather(*tasks)
     finally:
         shutdown_event.set()
 
+        loop = asyncio.get_running_loop()
         for w in workers:
             if w.done:
                 continue
-            w.proc.join(timeout=5)
-            if w.proc.is_alive():
-                w.proc.terminate()
-            w.shm_data.close()
-            w.shm_data.unlink()
-            w.shm_index.close()
-            w.shm_index.unlink()
+            stop_worker(w)
+            loop.remove_reader(w.channels.not_empty_receiver.fileno())
+            record_ring_usage(w, ring_usage)
+            release_worker(w)
+
+        if ring_usage_path:
+            save_json_state(ring_usage_path, ring_usage)
+
+        storage_writer.close()
 
 
 if __name__ == "__main__":
+    storage_base_dir = "/Users/e/taltech/loputoo/start/storage/py-predictor/dev"
+    raw_storage_base_dir = "/Users/e/taltech/loputoo/start/storage/internal-bridge"
     storage = RocksdbLog(
-        base_dir="/Users/e/taltech/loputoo/start/storage/py-predictor/dev",
+        base_dir=storage_base_dir,
         db_name="windows",
         writable=True,
         compression=False,
@@ -376,5 +1397,8 @@ if __name__ == "__main__":
             storage=storage,
             platform_symbols=platform_symbols,
             window_sizes_ms=window_sizes_ms,
+            raw_storage_base_dir=raw_storage_base_dir,
+            ring_usage_path=os.path.join(storage_base_dir, "ring_usage.json"),
+            series_costs_path=os.path.join(storage_base_dir, "series_costs.json"),
         )
     )
@@ -0,0 +1,396 @@
+"""
+IPC benchmark suite: N producers -> one consumer (the main process, like the window
+workers coordinator), ring buffer per producer vs a shared multiprocessing.Queue.
+
+Every record carries its send time (time.monotonic_ns) in the first 8 bytes of the key,
+the consumer reports throughput and p50/p99/p999 end-to-end latency.
+
+    PYTHONPATH=. python test/benchmark_ipc_suite.py --producers 1,4 --payloads trade,order \\
+        --patterns steady,burst --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from array import array
+from dataclasses import asdict, dataclass
+from itertools import product
+from multiprocessing import Event, Process, Queue
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.synchronize import Event as EventType
+from queue import Empty
+
+import numpy as np
+from benchmark_rink_buffer_vs_ipc import create_mock_trade_aggregate
+
+from src.lib.worker import ring_buffer
+from src.workers.window_workers.order.messages import OrderBookAccumulator, ob_acc_encoder
+from src.workers.window_workers.trade.messages import trade_window_aggregate_encoder
+
+BATCH_SIZE = 256
+DRAIN_MAX_RECORDS = 1024
+DRAIN_MAX_BYTES = 2**20
+
+
+@dataclass
+class BenchmarkCase:
+    transport: str
+    """ring | queue"""
+    producers: int
+    payload: str
+    """trade | order | bytes:<size>"""
+    pattern: str
+    """steady (rate per producer) | burst (burst_size back-to-back, then idle)"""
+    messages: int
+    """per producer"""
+    rate: int
+    burst_size: int
+    burst_interval_s: float
+    rocksdb_dir: str | None
+
+
+@dataclass
+class BenchmarkResult:
+    case: BenchmarkCase
+    payload_bytes: int
+    elapsed_s: float
+    throughput_msg_s: float
+    throughput_mb_s: float
+    latency_us: dict[str, float]
+
+
+def create_mock_order_accumulator(idx: int) -> OrderBookAccumulator:
+    return OrderBookAccumulator(
+        sw=30000.0,
+        sw_mid=1800000000.0 + idx,
+        sw_micro=1800000100.0 + idx,
+        spread_min=0.01,
+        spread_max=0.5 + (idx % 10) * 0.01,
+        sw_spread=3000.0,
+        n_w=30000.0,
+        mean_mid=60000.0 + idx,
+        M2_mid=12.5 + idx % 7,
+        sw_bid=150000.0,
+        sw_ask=160000.0,
+        sw_imb=-0.03,
+        sw_bid_best_sz=1.25,
+        sw_ask_best_sz=1.75,
+        n_updates=300 + idx % 50,
+        n_mid_up=120,
+        n_mid_down=118,
+        n_spread_widen=40,
+        n_spread_tighten=41,
+        t_first=1735000000000 + idx * 1000,
+        t_last=1735000030000 + idx * 1000,
+        close_mid=60000.0 + idx,
+        close_spread=0.01,
+        close_bb=59999.99 + idx,
+        close_ba=60000.01 + idx,
+        close_bq0=1.5,
+        close_aq0=2.5,
+        close_best_imb=-0.25,
+    )
+
+
+def create_payload(payload: str, idx: int) -> bytes:
+    if payload == "trade":
+        return trade_window_aggregate_encoder.encode(create_mock_trade_aggregate(idx))
+    if payload == "order":
+        return ob_acc_encoder.encode(create_mock_order_accumulator(idx))
+    if payload.startswith("bytes:"):
+        return bytes(int(payload.split(":", 1)[1]))
+    raise ValueError(f"Unknown payload {payload}")
+
+
+def send_times(case: BenchmarkCase):
+    """Yields the monotonic_ns a message is due, relative to the first message"""
+    if case.pattern == "steady":
+        interval_ns = int(1e9 / case.rate)
+        for i in range(case.messages):
+            yield i * interval_ns
+    elif case.pattern == "burst":
+        interval_ns = int(case.burst_interval_s * 1e9)
+        for i in range(case.messages):
+            yield (i // case.burst_size) * interval_ns
+    else:
+        raise ValueError(f"Unknown pattern {case.pattern}")
+
+
+def produce(case: BenchmarkCase, producer_id: int, start_event: EventType, put_batch):
+    # Payloads are prepared up front so encode cost does not count as IPC latency
+    payloads = [create_payload(case.payload, i) for i in range(min(case.messages, 1024))]
+    tag = producer_id.to_bytes(8, "big")
+
+    start_event.wait()
+    start_ns = time.monotonic_ns()
+
+    batch: list[tuple[bytes, bytes]] = []
+    for i, due_ns in enumerate(send_times(case)):
+        now_ns = time.monotonic_ns()
+        if start_ns + due_ns > now_ns:
+            if batch:
+                put_batch(batch)
+                batch = []
+            time.sleep((start_ns + due_ns - now_ns) / 1e9)
+            now_ns = time.monotonic_ns()
+
+        batch.append((now_ns.to_bytes(8, "big") + tag, payloads[i % len(payloads)]))
+        if len(batch) >= BATCH_SIZE:
+            put_batch(batch)
+            batch = []
+
+    if batch:
+        put_batch(batch)
+
+
+def ring_producer(
+    case: BenchmarkCase,
+    producer_id: int,
+    shm_data_name: str,
+    shm_index_name: str,
+    mask: int,
+    start_event: EventType,
+):
+    shm_data = SharedMemory(name=shm_data_name)
+    shm_index = SharedMemory(name=shm_index_name)
+    data_buf = shm_data.buf
+    index_buf = shm_index.buf
+
+    def put_batch(batch: list[tuple[bytes, bytes]]):
+        while batch:
+            written = ring_buffer.write_many(data_buf, index_buf, mask, batch)
+            if written == 0:
+                time.sleep(0.00005)
+            del batch[:written]
+
+    produce(case, producer_id, start_event, put_batch)
+
+    shm_data.close()
+    shm_index.close()
+
+
+def queue_producer(case: BenchmarkCase, producer_id: int, queue: Queue, start_event: EventType):
+    def put_batch(batch: list[tuple[bytes, bytes]]):
+        for record in batch:
+            queue.put(record)
+
+    produce(case, producer_id, start_event, put_batch)
+
+
+def open_storage(case: BenchmarkCase):
+    if case.rocksdb_dir is None:
+        return None
+
+    from src.lib.rocks_db_log import RocksdbLog
+
+    storage = RocksdbLog(
+        base_dir=case.rocksdb_dir, db_name="benchmark", writable=True, compression=False
+    )
+    storage.init()
+    return storage
+
+
+def run_ring(case: BenchmarkCase, latencies: array) -> float:
+    storage = open_storage(case)
+    start_event = Event()
+    rings = [
+        ring_buffer.init(shm_data_name=None, shm_index_name=None) for _ in range(case.producers)
+    ]
+    procs = [
+        Process(
+            target=ring_producer,
+            args=(case, i, shm_data.name, shm_index.name, mask, start_event),
+        )
+        for i, (shm_data, shm_index, _size, mask) in enumerate(rings)
+    ]
+    for p in procs:
+        p.start()
+
+    # Process start up is not measured
+    start = time.perf_counter()
+    start_event.set()
+    expected = case.messages * case.producers
+    while len(latencies) < expected:
+        read = False
+        for shm_data, shm_index, _size, mask in rings:
+            peeked = ring_buffer.peek_many(
+                shm_data.buf, shm_index.buf, mask, DRAIN_MAX_RECORDS, DRAIN_MAX_BYTES
+            )
+            if peeked is None:
+                continue
+            read = True
+
+            offset, events = peeked
+            now_ns = time.monotonic_ns()
+            for key_view, value_view in events:
+                latencies.append(now_ns - int.from_bytes(key_view[:8], "big"))
+                if storage is not None:
+                    storage.put(key=key_view, value=value_view)
+                key_view.release()
+                value_view.release()
+            ring_buffer.commit(shm_index.buf, mask, offset)
+
+        if not read:
+            time.sleep(0.00005)
+    elapsed = time.perf_counter() - start
+
+    for p in procs:
+        p.join()
+    for shm_data, shm_index, _size, _mask in rings:
+        shm_data.close()
+        shm_data.unlink()
+        shm_index.close()
+        shm_index.unlink()
+    if storage is not None:
+        storage.close()
+
+    return elapsed
+
+
+def run_queue(case: BenchmarkCase, latencies: array) -> float:
+    storage = open_storage(case)
+    start_event = Event()
+    queue: Queue = Queue(maxsize=10_000)
+    procs = [
+        Process(target=queue_producer, args=(case, i, queue, start_event))
+        for i in range(case.producers)
+    ]
+    for p in procs:
+        p.start()
+
+    # Process start up is not measured
+    start = time.perf_counter()
+    start_event.set()
+    expected = case.messages * case.producers
+    while len(latencies) < expected:
+        try:
+            key, value = queue.get(timeout=5)
+        except Empty:
+            print("   Queue consumer timed out")
+            break
+        latencies.append(time.monotonic_ns() - int.from_bytes(key[:8], "big"))
+        if storage is not None:
+            storage.put(key=key, value=value)
+    elapsed = time.perf_counter() - start
+
+    for p in procs:
+        p.join()
+    queue.close()
+    queue.join_thread()
+    if storage is not None:
+        storage.close()
+
+    return elapsed
+
+
+def run_case(case: BenchmarkCase) -> BenchmarkResult:
+    latencies = array("q")
+    if case.transport == "ring":
+        elapsed = run_ring(case, latencies)
+    elif case.transport == "queue":
+        elapsed = run_queue(case, latencies)
+    else:
+        raise ValueError(f"Unknown transport {case.transport}")
+
+    payload_bytes = len(create_payload(case.payload, 0))
+    latencies_us = np.frombuffer(latencies, dtype=np.int64) / 1000
+    p50, p99, p999 = np.percentile(latencies_us, [50, 99, 99.9])
+
+    return BenchmarkResult(
+        case=case,
+        payload_bytes=payload_bytes,
+        elapsed_s=elapsed,
+        throughput_msg_s=len(latencies) / elapsed,
+        throughput_mb_s=len(latencies) * (payload_bytes + 16) / elapsed / 2**20,
+        latency_us={
+            "p50": float(p50),
+            "p99": float(p99),
+            "p999": float(p999),
+            "max": float(latencies_us.max()),
+        },
+    )
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--transports", default="ring,queue", help="ring,queue")
+    parser.add_argument("--producers", default="1,2,4", help="producer counts")
+    parser.add_argument("--payloads", default="trade,order", help="trade,order,bytes:<size>")
+    parser.add_argument("--patterns", default="steady,burst", help="steady,burst")
+    parser.add_argument("--messages", type=int, default=100_000, help="per producer")
+    parser.add_argument("--rate", type=int, default=50_000, help="steady msg/s per producer")
+    parser.add_argument("--burst-size", type=int, default=10_000)
+    parser.add_argument("--burst-interval", type=float, default=0.2, help="seconds")
+    parser.add_argument("--rocksdb", default=None, help="consumer writes to RocksDB in dir")
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    return parser.parse_args(argv)
+
+
+def run_benchmarks(argv: list[str]) -> list[BenchmarkResult]:
+    args = parse_args(argv)
+
+    cases = [
+        BenchmarkCase(
+            transport=transport,
+            producers=int(producers),
+            payload=payload,
+            pattern=pattern,
+            messages=args.messages,
+            rate=args.rate,
+            burst_size=args.burst_size,
+            burst_interval_s=args.burst_interval,
+            rocksdb_dir=args.rocksdb,
+        )
+        for producers, payload, pattern, transport in product(
+            args.producers.split(","),
+            args.payloads.split(","),
+            args.patterns.split(","),
+            args.transports.split(","),
+        )
+    ]
+
+    results: list[BenchmarkResult] = []
+    for case in cases:
+        print(
+            f"{case.transport:>5} producers={case.producers} payload={case.payload}"
+            f" pattern={case.pattern} messages={case.messages * case.producers:,}"
+        )
+        result = run_case(case)
+        results.append(result)
+        print(
+            f"   {result.throughput_msg_s:,.0f} msg/s {result.throughput_mb_s:.1f} MB/s"
+            f" p50={result.latency_us['p50']:.1f}us p99={result.latency_us['p99']:.1f}us"
+            f" p999={result.latency_us['p999']:.1f}us"
+        )
+
+    if args.output:
+        report = {
+            "git_commit": git_commit(),
+            "timestamp": time.time(),
+            "python": sys.version,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "results": [asdict(result) for result in results],
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    return results
+
+
+if __name__ == "__main__":
+    run_benchmarks(sys.argv[1:])
@@ -0,0 +1,113 @@
+"""
+Order book engine benchmark: OrderBookManager.apply_one per engine (Decimal, integer
+ticks, price ladder) on a synthetic Binance-like depth stream.
+
+The stream is a snapshot of --depth levels per side followed by diff updates of
+--update-levels levels per side (a third of them deletes), mostly near a drifting touch.
+Every engine replays the same records, the results report microseconds per apply_one and
+the speedup over the Decimal engine.
+
+    PYTHONPATH=. python test/benchmark_order_book.py --update-levels 10,30,100
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from src.workers.window_workers.order.messages import OrderBook
+from src.workers.window_workers.order.order_book_manager import OrderBookManager
+
+ENGINES = {
+    "decimal": lambda: OrderBookManager(decimal=True),
+    "ticks": lambda: OrderBookManager(),
+    "ladder": lambda: OrderBookManager(ladder=True),
+}
+
+
+def price_str(cents: int) -> str:
+    return f"{cents // 100}.{cents % 100:02d}"
+
+
+def quantity_str(rng: random.Random) -> str:
+    return f"{rng.randint(1, 500_000_000) / 1e8:.8f}"
+
+
+def make_depth_stream(
+    depth: int, updates: int, update_levels: int, seed: int = 1
+) -> list[OrderBook]:
+    rng = random.Random(seed)
+    touch = 6_500_000
+    """best bid in cents"""
+
+    def book(type_: str, bids: list, asks: list, time_ms: int) -> OrderBook:
+        return OrderBook(
+            type=type_, symbol="btc_usdt", bids=bids, asks=asks, time=time_ms, platform="binance"
+        )
+
+    records = [
+        book(
+            "snapshot",
+            [(price_str(touch - i), quantity_str(rng)) for i in range(depth)],
+            [(price_str(touch + 1 + i), quantity_str(rng)) for i in range(depth)],
+            0,
+        )
+    ]
+
+    def side_levels(best: int, direction: int) -> list[tuple[str, str]]:
+        levels = []
+        for _ in range(update_levels):
+            # Most updates land near the touch, some anywhere in the depth
+            distance = int(rng.expovariate(1 / 20)) if rng.random() < 0.9 else rng.randrange(depth)
+            quantity = "0.00000000" if rng.random() < 1 / 3 else quantity_str(rng)
+            levels.append((price_str(best + direction * distance), quantity))
+        return levels
+
+    for i in range(1, updates + 1):
+        touch += rng.randint(-3, 3)
+        records.append(book("update", side_levels(touch, -1), side_levels(touch + 1, 1), i * 100))
+    return records
+
+
+def run_engine(engine: str, records: list[OrderBook]) -> float:
+    """Microseconds per apply_one of the updates"""
+    mgr = ENGINES[engine]()
+    mgr.apply_one(records[0])
+    updates = records[1:]
+
+    start = time.perf_counter_ns()
+    for record in updates:
+        mgr.apply_one(record)
+    return (time.perf_counter_ns() - start) / len(updates) / 1000
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--engines", default="decimal,ticks,ladder", help="decimal,ticks,ladder")
+    parser.add_argument("--depth", type=int, default=1000, help="snapshot levels per side")
+    parser.add_argument("--updates", type=int, default=20_000)
+    parser.add_argument("--update-levels", default="10,30,100", help="levels per side")
+    parser.add_argument("--repeat", type=int, default=3, help="best of")
+    return parser.parse_args(argv)
+
+
+def run_benchmarks(argv: list[str]) -> dict[tuple[int, str], float]:
+    args = parse_args(argv)
+    engines = args.engines.split(",")
+
+    results: dict[tuple[int, str], float] = {}
+    for update_levels in map(int, args.update_levels.split(",")):
+        records = make_depth_stream(args.depth, args.updates, update_levels)
+        print(f"depth={args.depth} updates={args.updates:,} update_levels={update_levels}")
+        for engine in engines:
+            us = min(run_engine(engine, records) for _ in range(args.repeat))
+            results[(update_levels, engine)] = us
+            baseline = results.get((update_levels, "decimal"))
+            speedup = f" {baseline / us:.1f}x vs decimal" if baseline else ""
+            print(f"   {engine:>7} {us:8.1f} us/apply_one{speedup}")
+
+    return results
+
+
+if __name__ == "__main__":
+    run_benchmarks(sys.argv[1:])
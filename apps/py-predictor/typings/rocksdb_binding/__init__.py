@@ -38,7 +38,8 @@ class RocksDb:
     ) -> "RocksDb": ...
     def try_catch_up_with_primary(self) -> None: ...
     def close(self) -> None: ...
-    def put(self, key: bytes, value: bytes) -> None: ...
+    def put(self, key: bytes | memoryview, value: bytes | memoryview) -> None: ...
+    def put_batch(self, items: list[tuple[bytes | memoryview, bytes | memoryview]]) -> None: ...
     def iterate_from(
         self, start_key: bytes | None = None, batch_size: int | None = None
     ) -> SegmentedLogIterator: ...
@@ -357,6 +357,18 @@ impl CoreRocksDb {
         Ok(())
     }
 
+    pub fn put_batch(&self, items: &[(&[u8], &[u8])]) -> CoreResult<()> {
+        let db = self.get_db()?;
+        let mut batch = WriteBatch::default();
+
+        for (key, value) in items {
+            batch.put(key, value);
+        }
+
+        db.write(batch).map_err(|e| e.to_string())?;
+        Ok(())
+    }
+
     pub fn iterate_from(
         &self,
         start_key: Option<&[u8]>,
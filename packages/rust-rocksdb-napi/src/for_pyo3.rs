@@ -1,7 +1,20 @@
+use pyo3::buffer::PyBuffer;
 use pyo3::prelude::*;
 
 use crate::core::{CoreSegmentedLog, CoreRocksDb};
 
+/// Borrow the bytes behind any object exposing the buffer protocol (bytes, memoryview, ...)
+/// without copying them into a Python `bytes` first.
+fn buffer_as_slice(buffer: &PyBuffer<u8>) -> PyResult<&[u8]> {
+    if !buffer.is_c_contiguous() {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "Buffer must be C-contiguous",
+        ));
+    }
+    // SAFETY: the buffer is contiguous and its memory stays exported while `buffer` is alive
+    Ok(unsafe { std::slice::from_raw_parts(buffer.buf_ptr() as *const u8, buffer.len_bytes()) })
+}
+
 #[pyclass]
 pub struct SegmentedLog {
     inner: CoreSegmentedLog,
@@ -153,9 +166,19 @@ impl RocksDb {
             .map_err(|e| pyo3::exceptions::PyRuntimeError::new_err(e))
     }
 
-    pub fn put(&self, key: &[u8], value: &[u8]) -> PyResult<()> {
+    pub fn put(&self, key: PyBuffer<u8>, value: PyBuffer<u8>) -> PyResult<()> {
         self.inner
-            .put(key, value)
+            .put(buffer_as_slice(&key)?, buffer_as_slice(&value)?)
+            .map_err(|e| pyo3::exceptions::PyRuntimeError::new_err(e))
+    }
+
+    /// Writes all pairs as one atomic write batch, the GIL is released during the write
+    pub fn put_batch(&self, py: Python<'_>, items: Vec<(PyBuffer<u8>, PyBuffer<u8>)>) -> PyResult<()> {
+        let mut pairs: Vec<(&[u8], &[u8])> = Vec::with_capacity(items.len());
+        for (key, value) in &items {
+            pairs.push((buffer_as_slice(key)?, buffer_as_slice(value)?));
+        }
+        py.detach(|| self.inner.put_batch(&pairs))
             .map_err(|e| pyo3::exceptions::PyRuntimeError::new_err(e))
     }
 